@@ -1,84 +1,576 @@
 """
 Database backup utility module
 Handles backing up the database to the Documents/BeevyApp/backup folder
+
+Two formats live there:
+- full copies (beevy.db.bak.<timestamp>), made by backup_database
+- incremental snapshots: the database is split into fixed size chunks, every
+  chunk is stored once gzip compressed under chunks/ by its SHA-256, and each
+  snapshot is only a manifest listing its chunks (snapshots/beevy.db.snap.<timestamp>.json)
+- media of a snapshot: every uploaded file is stored once under blobs/ by its
+  SHA-256 and listed in snapshots/<snapshot>.media.json
 """
+import gzip
+import hashlib
+import json
 import os
 import shutil
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
+BACKUP_PAGES_PER_STEP = 1024   # ~4 MB per step with the default 4 KB page size
+BACKUP_STEP_SLEEP = 0.05       # seconds between steps, writers get the lock in between
+BACKUP_MAX_RESTARTS = 3        # after this many restarts copy the rest in one step
+METRICS_SUFFIX = '.json'       # metrics are stored next to each backup as <backup>.json
+
+# SQLite rewrites pages in place, so fixed page aligned chunks (64 pages of the
+# largest 64 KB page size) keep unchanged parts of the file byte-identical.
+SNAPSHOT_CHUNK_SIZE = 256 * 1024
+SNAPSHOT_PREFIX = 'beevy.db.snap.'
+CHUNK_GC_GRACE = 3600          # seconds; recently used chunks may belong to a snapshot being written
+MEDIA_MANIFEST_SUFFIX = '.media.json'
+# hashlib releases the GIL while hashing, so threads hash files in parallel
+MEDIA_HASH_WORKERS = min(8, os.cpu_count() or 1)
+
 def get_backup_dir():
     """Get the backup directory path, creating it if it doesn't exist"""
     backup_dir = Path.home() / "Documents" / "BeevyApp" / "backup"
     backup_dir.mkdir(parents=True, exist_ok=True)
     return backup_dir
 
-def backup_database(db_path='beevy.db', backup_name=None):
+def _backup_files(backup_dir):
+    """Backup files in the directory, newest first (without metrics and unfinished copies)"""
+    return sorted(
+        (b for b in backup_dir.glob('beevy.db.bak.*')
+         if not b.name.endswith((METRICS_SUFFIX, '.partial'))),
+        reverse=True
+    )
+
+def read_backup_metrics(backup_path):
+    """Metrics recorded by backup_database, None for older backups without them"""
+    metrics_path = Path(str(backup_path) + METRICS_SUFFIX)
+    try:
+        with open(metrics_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def format_backup_metrics(metrics):
+    """One line summary of backup metrics for logs"""
+    return (f"{metrics['bytes'] / (1024*1024):.2f} MB, {metrics['pages']} pages "
+            f"in {metrics['duration_s']:.2f}s ({metrics['pages_per_s']:.0f} pages/s, "
+            f"{metrics['mb_per_s']:.2f} MB/s), integrity {metrics['integrity']}")
+
+class _BackupRestarting(Exception):
+    """Writes keep restarting a step-wise backup"""
+
+def _online_copy(db_path, target_path, pages, sleep):
+    """
+    Copy a live database with the SQLite backup API and check the copy.
+
+    A write from another connection restarts the copy, so after
+    BACKUP_MAX_RESTARTS restarts it is redone in a single step (in WAL mode that
+    only holds a read snapshot and still does not block writers).
+    Returns dict with pages, steps, restarts and the integrity_check result.
+    """
+    steps = restarts = 0
+    last_remaining = None
+
+    def progress(status, remaining, total):
+        nonlocal steps, restarts, last_remaining
+        steps += 1
+        if last_remaining is not None and remaining > last_remaining:
+            restarts += 1
+            if restarts > BACKUP_MAX_RESTARTS:
+                raise _BackupRestarting()
+        last_remaining = remaining
+
+    source = sqlite3.connect(db_path)
+    target = sqlite3.connect(str(target_path))
+    try:
+        try:
+            source.backup(target, pages=pages, progress=progress, sleep=sleep)
+        except _BackupRestarting:
+            source.backup(target, pages=-1)
+        page_count = target.execute("PRAGMA page_count").fetchone()[0]
+        integrity = target.execute("PRAGMA integrity_check").fetchone()[0]
+    finally:
+        target.close()
+        source.close()
+    return {'pages': page_count, 'steps': steps, 'restarts': restarts, 'integrity': integrity}
+
+def backup_database(db_path='beevy.db', backup_name=None, pages=BACKUP_PAGES_PER_STEP, sleep=BACKUP_STEP_SLEEP):
     """
     Backup the database to Documents/BeevyApp/backup/
-    
+
+    Uses the SQLite online backup API, so the copy is consistent even while the
+    app keeps writing. The database is copied `pages` pages at a time with
+    `sleep` seconds in between, so request threads are not locked out for the
+    whole copy (see _online_copy). The copy is checked with PRAGMA
+    integrity_check and only then renamed to its final name; metrics are stored next to it (see read_backup_metrics).
+
     Args:
         db_path: Path to the database file (default: beevy.db)
         backup_name: Custom backup filename (default: beevy.db.bak.{timestamp})
-    
+        pages: Pages copied per step (-1 copies everything in one step)
+        sleep: Seconds to sleep between steps
+
     Returns:
         Tuple of (success: bool, backup_path: str, message: str)
     """
+    partial_path = None
     try:
         # Check if database exists
         if not os.path.exists(db_path):
             return False, None, f"Database file not found: {db_path}"
-        
+
         # Get backup directory
         backup_dir = get_backup_dir()
-        
+
         # Generate backup filename if not provided
         if backup_name is None:
             ts = datetime.now().strftime('%Y%m%d%H%M%S')
             backup_name = f'beevy.db.bak.{ts}'
-        
+
         backup_path = backup_dir / backup_name
-        
+        partial_path = backup_dir / (backup_name + '.partial')
+
         # Create backup
-        shutil.copy2(db_path, str(backup_path))
-        
-        message = f"Database backed up to: {backup_path}"
+        started = time.perf_counter()
+        copy = _online_copy(db_path, partial_path, pages, sleep)
+        duration = time.perf_counter() - started
+
+        if copy['integrity'] != 'ok':
+            partial_path.unlink()
+            return False, None, f"Backup failed integrity check: {copy['integrity']}"
+
+        os.replace(partial_path, backup_path)
+        size = backup_path.stat().st_size
+        metrics = {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'duration_s': round(duration, 3),
+            'bytes': size,
+            'pages': copy['pages'],
+            'steps': copy['steps'],
+            'restarts': copy['restarts'],
+            'pages_per_s': round(copy['pages'] / duration, 1) if duration else None,
+            'mb_per_s': round(size / (1024*1024) / duration, 2) if duration else None,
+            'integrity': copy['integrity'],
+        }
+        with open(str(backup_path) + METRICS_SUFFIX, 'w', encoding='utf-8') as f:
+            json.dump(metrics, f)
+
+        message = f"Database backed up to: {backup_path} ({format_backup_metrics(metrics)})"
         return True, str(backup_path), message
-    
+
     except Exception as e:
+        if partial_path is not None and partial_path.exists():
+            partial_path.unlink()
         return False, None, f"Backup failed: {str(e)}"
 
 def get_backups_list():
-    """Get a list of all backups in the backup directory"""
+    """Get a list of all backups in the backup directory, with metrics where recorded"""
     try:
         backup_dir = get_backup_dir()
-        backups = sorted(backup_dir.glob('beevy.db.bak.*'), reverse=True)
-        return [{'name': b.name, 'path': str(b), 'size_mb': b.stat().st_size / (1024*1024)} 
-                for b in backups]
-    except Exception as e:
+        return [{'name': b.name, 'path': str(b), 'size_mb': b.stat().st_size / (1024*1024),
+                 'metrics': read_backup_metrics(b)}
+                for b in _backup_files(backup_dir)]
+    except OSError as e:
+        print(f"✗ Could not list backups: {str(e)}", file=sys.stderr)
         return []
 
 def cleanup_old_backups(keep_count=10):
     """
     Remove old backups, keeping only the most recent ones
-    
+
     Args:
         keep_count: Number of backups to keep (default: 10)
-    
+
     Returns:
         Tuple of (removed_count: int, message: str)
     """
     try:
         backup_dir = get_backup_dir()
-        backups = sorted(backup_dir.glob('beevy.db.bak.*'), reverse=True)
-        
+        backups = _backup_files(backup_dir)
+
         removed_count = 0
         for backup_file in backups[keep_count:]:
             backup_file.unlink()
+            Path(str(backup_file) + METRICS_SUFFIX).unlink(missing_ok=True)
             removed_count += 1
-        
+
         message = f"Cleaned up {removed_count} old backups (keeping {keep_count})"
         return removed_count, message
-    
+
     except Exception as e:
         return 0, f"Cleanup failed: {str(e)}"
+
+# ===== Incremental snapshots =====
+
+def get_snapshot_dirs():
+    """Manifest and chunk store directories, created if missing"""
+    backup_dir = get_backup_dir()
+    snapshot_dir = backup_dir / "snapshots"
+    chunk_dir = backup_dir / "chunks"
+    snapshot_dir.mkdir(exist_ok=True)
+    chunk_dir.mkdir(exist_ok=True)
+    return snapshot_dir, chunk_dir
+
+def get_blob_dir():
+    """Media blob store directory, created if missing"""
+    blob_dir = get_backup_dir() / "blobs"
+    blob_dir.mkdir(exist_ok=True)
+    return blob_dir
+
+def _chunk_path(chunk_dir, digest):
+    """Chunks are spread over 256 subfolders by the first byte of their hash"""
+    return chunk_dir / digest[:2] / f"{digest}.gz"
+
+def _write_atomic(path, data):
+    """Write bytes under a temporary name and rename, so readers never see half a file"""
+    partial = path.with_name(path.name + '.partial')
+    with open(partial, 'wb') as f:
+        f.write(data)
+    os.replace(partial, path)
+
+def _store_chunks(file_path, chunk_dir, chunk_size=SNAPSHOT_CHUNK_SIZE):
+    """
+    Split a file into chunks and store the ones the store does not have yet.
+
+    Returns (chunk digests in file order, sha256 of the whole file, size,
+    number of new chunks, compressed bytes written).
+    """
+    digests, whole = [], hashlib.sha256()
+    size = new_chunks = new_bytes = 0
+    with open(file_path, 'rb') as f:
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            whole.update(data)
+            size += len(data)
+            digest = hashlib.sha256(data).hexdigest()
+            digests.append(digest)
+
+            path = _chunk_path(chunk_dir, digest)
+            if path.exists():
+                # mark as in use so a concurrent gc_chunks leaves it alone
+                os.utime(path)
+                continue
+            path.parent.mkdir(exist_ok=True)
+            compressed = gzip.compress(data, compresslevel=6, mtime=0)
+            _write_atomic(path, compressed)
+            new_chunks += 1
+            new_bytes += len(compressed)
+    return digests, whole.hexdigest(), size, new_chunks, new_bytes
+
+def snapshot_database(db_path='beevy.db', snapshot_name=None, pages=BACKUP_PAGES_PER_STEP, sleep=BACKUP_STEP_SLEEP,
+                      media_root=None):
+    """
+    Take an incremental snapshot of the database
+
+    The database is copied with the online backup API (see _online_copy), split
+    into SNAPSHOT_CHUNK_SIZE chunks and only chunks missing from the store are
+    compressed and written. The snapshot itself is a small JSON manifest, so a
+    daily snapshot of a mostly unchanged database costs a few chunks.
+
+    With media_root the upload tree is captured right after the database (see
+    snapshot_media), so every file the database copy points at is included.
+
+    Args:
+        db_path: Path to the database file (default: beevy.db)
+        snapshot_name: Custom snapshot name (default: beevy.db.snap.{timestamp})
+        pages: Pages copied per step (-1 copies everything in one step)
+        sleep: Seconds to sleep between steps
+        media_root: Upload folder to snapshot with the database (default: none)
+
+    Returns:
+        Tuple of (success: bool, manifest_path: str, message: str)
+    """
+    copy_path = None
+    try:
+        if not os.path.exists(db_path):
+            return False, None, f"Database file not found: {db_path}"
+
+        snapshot_dir, chunk_dir = get_snapshot_dirs()
+        if snapshot_name is None:
+            snapshot_name = SNAPSHOT_PREFIX + datetime.now().strftime('%Y%m%d%H%M%S')
+        manifest_path = snapshot_dir / (snapshot_name + '.json')
+        copy_path = snapshot_dir / (snapshot_name + '.db.partial')
+
+        started = time.perf_counter()
+        copy = _online_copy(db_path, copy_path, pages, sleep)
+        if copy['integrity'] != 'ok':
+            return False, None, f"Snapshot failed integrity check: {copy['integrity']}"
+        digests, sha256, size, new_chunks, new_bytes = _store_chunks(copy_path, chunk_dir)
+        media = snapshot_media(media_root, snapshot_name) if media_root is not None else None
+        duration = time.perf_counter() - started
+
+        manifest = {
+            'name': snapshot_name,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'size': size,
+            'sha256': sha256,
+            'chunk_size': SNAPSHOT_CHUNK_SIZE,
+            'chunks': digests,
+            'new_chunks': new_chunks,
+            'new_bytes': new_bytes,
+            'duration_s': round(duration, 3),
+            'pages': copy['pages'],
+            'integrity': copy['integrity'],
+            'media': media,
+        }
+        # the database manifest is written last, a snapshot is only listed once it is complete
+        _write_atomic(manifest_path, json.dumps(manifest).encode('utf-8'))
+
+        message = (f"Snapshot {snapshot_name}: {size / (1024*1024):.2f} MB in {len(digests)} chunks, "
+                   f"{new_chunks} new ({new_bytes / (1024*1024):.2f} MB stored)")
+        if media is not None:
+            message += (f", media {media['files']} files, {media['new_files']} new "
+                        f"({media['new_bytes'] / (1024*1024):.2f} MB stored, {media['hashed']} hashed)")
+        message += f" in {duration:.2f}s"
+        return True, str(manifest_path), message
+
+    except Exception as e:
+        return False, None, f"Snapshot failed: {str(e)}"
+    finally:
+        if copy_path is not None and copy_path.exists():
+            copy_path.unlink()
+
+def read_snapshot_manifest(snapshot_name):
+    """Manifest of a snapshot by name"""
+    snapshot_dir, _ = get_snapshot_dirs()
+    with open(snapshot_dir / (snapshot_name + '.json'), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def get_snapshots_list():
+    """Names of all snapshots, newest first"""
+    snapshot_dir, _ = get_snapshot_dirs()
+    return sorted((p.name[:-len('.json')] for p in snapshot_dir.glob('*.json')
+                   if not p.name.endswith(MEDIA_MANIFEST_SUFFIX)), reverse=True)
+
+def restore_snapshot(snapshot_name, dest_path):
+    """
+    Rebuild a snapshot into dest_path
+
+    Chunks are decompressed and written one at a time, so memory use stays at
+    one chunk and only the chunks of this snapshot are read. Every chunk and the
+    whole file are checked against the manifest before dest_path is replaced.
+
+    Returns:
+        Tuple of (success: bool, dest_path: str, message: str)
+    """
+    dest_path = Path(dest_path)
+    partial_path = dest_path.with_name(dest_path.name + '.partial')
+    try:
+        manifest = read_snapshot_manifest(snapshot_name)
+        _, chunk_dir = get_snapshot_dirs()
+
+        started = time.perf_counter()
+        whole = hashlib.sha256()
+        with open(partial_path, 'wb') as out:
+            for digest in manifest['chunks']:
+                with open(_chunk_path(chunk_dir, digest), 'rb') as f:
+                    data = gzip.decompress(f.read())
+                if hashlib.sha256(data).hexdigest() != digest:
+                    raise ValueError(f"chunk {digest} is corrupted")
+                whole.update(data)
+                out.write(data)
+        if whole.hexdigest() != manifest['sha256']:
+            raise ValueError("restored file does not match the snapshot checksum")
+        os.replace(partial_path, dest_path)
+        duration = time.perf_counter() - started
+
+        size_mb = manifest['size'] / (1024*1024)
+        speed = f", {size_mb / duration:.1f} MB/s" if duration else ""
+        return True, str(dest_path), f"Restored {snapshot_name} to {dest_path} ({size_mb:.2f} MB in {duration:.2f}s{speed})"
+
+    except Exception as e:
+        if partial_path.exists():
+            partial_path.unlink()
+        return False, None, f"Restore failed: {str(e)}"
+
+def _snapshot_time(snapshot_name):
+    """Timestamp encoded in a snapshot name, None for custom names"""
+    try:
+        return datetime.strptime(snapshot_name[len(SNAPSHOT_PREFIX):], '%Y%m%d%H%M%S')
+    except ValueError:
+        return None
+
+def prune_snapshots(keep_daily=7, keep_weekly=8):
+    """
+    Remove old snapshot manifests, then the chunks and blobs no snapshot uses anymore
+
+    Keeps the newest snapshot of each of the last `keep_daily` days that have
+    one and the newest snapshot of each of the last `keep_weekly` ISO weeks.
+    Snapshots with custom names are never removed.
+
+    Returns:
+        Tuple of (removed_count: int, message: str)
+    """
+    try:
+        snapshot_dir, _ = get_snapshot_dirs()
+        keep, days, weeks = set(), [], []
+        for name in get_snapshots_list():  # newest first
+            taken = _snapshot_time(name)
+            if taken is None:
+                keep.add(name)
+                continue
+            day, week = taken.date(), taken.isocalendar()[:2]
+            if day not in days and len(days) < keep_daily:
+                days.append(day)
+                keep.add(name)
+            if week not in weeks and len(weeks) < keep_weekly:
+                weeks.append(week)
+                keep.add(name)
+
+        removed = [name for name in get_snapshots_list() if name not in keep]
+        for name in removed:
+            (snapshot_dir / (name + '.json')).unlink()
+            (snapshot_dir / (name + MEDIA_MANIFEST_SUFFIX)).unlink(missing_ok=True)
+
+        chunks_removed, freed = gc_chunks()
+        message = (f"Pruned {len(removed)} snapshots (keeping {len(keep)}), "
+                   f"removed {chunks_removed} chunks and blobs ({freed / (1024*1024):.2f} MB)")
+        return len(removed), message
+
+    except Exception as e:
+        return 0, f"Prune failed: {str(e)}"
+
+def gc_chunks(grace=CHUNK_GC_GRACE):
+    """
+    Delete chunks and media blobs that no snapshot manifest references
+
+    Files touched in the last `grace` seconds are kept, they may belong to a
+    snapshot whose manifest is not written yet.
+
+    Returns:
+        Tuple of (removed_count: int, freed_bytes: int)
+    """
+    snapshot_dir, chunk_dir = get_snapshot_dirs()
+    referenced = set()
+    for name in get_snapshots_list():
+        referenced.update(read_snapshot_manifest(name)['chunks'])
+    for path in snapshot_dir.glob('*' + MEDIA_MANIFEST_SUFFIX):
+        with open(path, 'r', encoding='utf-8') as f:
+            referenced.update(entry[0] for entry in json.load(f)['files'].values())
+
+    cutoff = time.time() - grace
+    removed = freed = 0
+    stored = [(path, path.name[:-len('.gz')]) for path in chunk_dir.glob('*/*.gz')]
+    stored += [(path, path.name) for path in get_blob_dir().glob('*/*') if not path.name.endswith('.partial')]
+    for path, digest in stored:
+        if digest in referenced:
+            continue
+        stat = path.stat()
+        if stat.st_mtime > cutoff:
+            continue
+        path.unlink()
+        removed += 1
+        freed += stat.st_size
+    return removed, freed
+
+
+# ===== Media =====
+
+def _latest_media_files(snapshot_dir):
+    """Files of the newest media manifest, used to skip hashing unchanged files"""
+    manifests = sorted(snapshot_dir.glob('*' + MEDIA_MANIFEST_SUFFIX), reverse=True)
+    if not manifests:
+        return {}
+    with open(manifests[0], 'r', encoding='utf-8') as f:
+        return json.load(f)['files']
+
+def _store_media_file(path, blob_dir):
+    """Hash a file and copy it into the blob store unless the blob exists. Returns (digest, new bytes)"""
+    with open(path, 'rb') as f:
+        digest = hashlib.file_digest(f, 'sha256').hexdigest()
+    blob = blob_dir / digest[:2] / digest
+    if blob.exists():
+        os.utime(blob)
+        return digest, 0
+    blob.parent.mkdir(exist_ok=True)
+    partial = blob.with_name(digest + '.partial')
+    shutil.copyfile(path, partial)
+    os.replace(partial, blob)
+    return digest, blob.stat().st_size
+
+def snapshot_media(media_root, snapshot_name, workers=MEDIA_HASH_WORKERS):
+    """
+    Capture an upload tree as content-addressed blobs
+
+    Files whose size and modification time match the previous media manifest
+    reuse its hash; the rest are hashed and stored by `workers` threads. Uploads
+    are never rewritten in place (new uploads get new names), so size and
+    mtime are enough to tell an unchanged file. The manifest maps each path
+    relative to media_root to [sha256, size, mtime_ns].
+
+    Returns dict with files, hashed, new_files and new_bytes counts.
+    """
+    snapshot_dir, _ = get_snapshot_dirs()
+    blob_dir = get_blob_dir()
+    previous = _latest_media_files(snapshot_dir)
+    root = Path(media_root)
+
+    files, to_hash = {}, []
+    for path in sorted(p for p in root.rglob('*') if p.is_file()):
+        rel = path.relative_to(root).as_posix()
+        stat = path.stat()
+        known = previous.get(rel)
+        if known and known[1:] == [stat.st_size, stat.st_mtime_ns] \
+                and (blob_dir / known[0][:2] / known[0]).exists():
+            files[rel] = known
+        else:
+            files[rel] = [None, stat.st_size, stat.st_mtime_ns]
+            to_hash.append((rel, path))
+
+    new_files = new_bytes = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(lambda item: _store_media_file(item[1], blob_dir), to_hash)
+        for (rel, _), (digest, written) in zip(to_hash, results):
+            files[rel][0] = digest
+            if written:
+                new_files += 1
+                new_bytes += written
+
+    _write_atomic(snapshot_dir / (snapshot_name + MEDIA_MANIFEST_SUFFIX),
+                  json.dumps({'name': snapshot_name, 'files': files}).encode('utf-8'))
+    return {'files': len(files), 'hashed': len(to_hash), 'new_files': new_files, 'new_bytes': new_bytes}
+
+def restore_media(snapshot_name, dest_root):
+    """
+    Restore the upload tree of a snapshot into dest_root
+
+    Files already present with the right content are left alone, so restoring
+    into the live upload folder only copies what is missing or different.
+    Files not in the snapshot are not deleted.
+
+    Returns:
+        Tuple of (success: bool, restored_count: int, message: str)
+    """
+    try:
+        snapshot_dir, _ = get_snapshot_dirs()
+        blob_dir = get_blob_dir()
+        with open(snapshot_dir / (snapshot_name + MEDIA_MANIFEST_SUFFIX), 'r', encoding='utf-8') as f:
+            files = json.load(f)['files']
+
+        restored = 0
+        for rel, (digest, size, _) in files.items():
+            dest = Path(dest_root) / rel
+            if dest.exists() and dest.stat().st_size == size:
+                with open(dest, 'rb') as f:
+                    if hashlib.file_digest(f, 'sha256').hexdigest() == digest:
+                        continue
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            partial = dest.with_name(dest.name + '.partial')
+            shutil.copyfile(blob_dir / digest[:2] / digest, partial)
+            os.replace(partial, dest)
+            restored += 1
+        return True, restored, f"Restored {restored} of {len(files)} media files to {dest_root}"
+
+    except Exception as e:
+        return False, 0, f"Media restore failed: {str(e)}"
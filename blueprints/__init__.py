@@ -0,0 +1,11 @@
+"""
+Route blueprints of the Beevy app, registered by create_app() in app.py
+"""
+from blueprints import auth, draw, main, media, settings, shop
+
+BLUEPRINTS = (main.bp, auth.bp, draw.bp, settings.bp, shop.bp, media.bp)
+
+
+def register_blueprints(app):
+    for blueprint in BLUEPRINTS:
+        app.register_blueprint(blueprint)
@@ -0,0 +1,218 @@
+"""
+Auth blueprint: login, registration and account recovery
+"""
+from datetime import datetime
+
+import bcrypt
+from flask import Blueprint, redirect, render_template, request, session, url_for
+
+from blueprints.common import flash_translated, refresh_profile
+from db_utils import get_db
+
+bp = Blueprint('auth', __name__)
+
+LOGIN_SQL = "SELECT password,username,id, deleted FROM users WHERE email=? OR username=?"
+USERNAME_TAKEN_SQL = "SELECT username FROM users WHERE username=?"
+EMAIL_TAKEN_SQL = "SELECT email FROM users WHERE email=?"
+
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    login_errors = []
+    # Only flash if they are visiting GET /login
+    if 'username' in session and request.method == 'GET':
+        flash_translated("flash.already_logged_in", "info")
+        return redirect(url_for("main.userPage", username=session['username']))
+    if request.method == 'POST':
+        #bere input ze stranky
+        usEm = request.form['username']
+        password = request.form['password']
+        #heslo ze starnky => bytes
+        user_bytes = password.encode('utf-8')
+        try:
+            conn = get_db()
+            cursor = conn.cursor()
+
+            #hleda heslo bud pro username ci email
+            cursor.execute(LOGIN_SQL,(usEm, usEm))
+            #vysledek se popripadne ulozi sem
+            result = cursor.fetchone()
+            db_pass, username, id, deleted = result
+
+            cursor.execute("SELECT language FROM preferences WHERE user_id = ?", (id,)) 
+            row = cursor.fetchone()
+
+            if row:
+                session["user_language"] = row[0]
+            
+            
+            #a kdyz to najde heslo k danému username ci email tak ho zkontroluje
+            if result:
+                if isinstance(db_pass, str): #chexks if its a string
+                    db_pass = db_pass.encode('utf-8') #converts the string to bytes
+                    
+                #kdyz je spravne posle uzivatele na userPage
+                if deleted:
+                    flash_translated("flash.account_deleted", "info")
+                    return redirect(request.url)
+                if bcrypt.checkpw(user_bytes, db_pass):
+                    session.permanent = True
+                    session['username'] = username
+                    refresh_profile(id)
+                    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    cursor.execute("UPDATE users SET last_login_at=? WHERE id=?",(now,id))
+                    conn.commit()
+                    #print("Rows updated:", cursor.rowcount)
+                    flash_translated("flash.login_success", "success")
+                    return redirect(url_for("main.userPage", username=session['username']))
+                else:
+                    flash_translated("flash.invalid_credentials", "error")
+            else:
+                flash_translated("flash.invalid_credentials", "error")
+            return redirect(request.url,page="login")
+        except Exception as e:
+            flash_translated("flash.error_occurred", "error", e=str(e))
+            return redirect(url_for("main.index"))
+    else:
+        return render_template("login.html", page="login")
+    
+    
+@bp.route('/register', methods = ['GET','POST'])
+def register():
+    # Only flash if they are visiting GET /login
+    if 'username' in session and request.method == 'GET':
+        flash_translated("flash.already_registered", "info")
+        return redirect(url_for("main.userPage", username=session['username']))
+    #bere input ze stranky
+    if request.method == 'POST':
+        #form data
+        username = request.form['username']
+        password = request.form['password']
+        name = request.form['name'].capitalize()
+        surname = request.form['surname'].capitalize()
+        email = request.form['email']
+        dob = request.form['dob']
+
+        if len(username)>20:
+            flash_translated("flash.username_too_long", "error")
+            return render_template("register.html")
+        #hash hesla
+        hash = None if not password else bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        
+        #zapsani do db pokud user neexistuje (username ci email)
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute(USERNAME_TAKEN_SQL, (username,))
+        existing_user = cursor.fetchone()
+        cursor.execute(EMAIL_TAKEN_SQL, (email,))
+        existing_email = cursor.fetchone()
+
+        #vypisuje chyby (kdyz uz username/email je pouzit)
+        if not existing_email and not existing_user:
+            cursor.execute("INSERT INTO users (username, password, name, surname, email, dob) VALUES (?, ?, ?, ?, ?, ?)", (username, hash, name, surname, email, dob))
+            user_id = cursor.lastrowid
+            # create default preferences for new user
+            cursor.execute("INSERT INTO preferences (user_id, language, theme, default_brush_size, notifications) VALUES (?,?,?,?,?)", (user_id, 'en', 'bee', 30, 1))
+            conn.commit()
+            flash_translated("flash.registration_success", "success")
+            return redirect(url_for("auth.login", page="login"))
+        if existing_user:
+            #print('username in use')
+            flash_translated("flash.username_taken", "error")
+            a = 1
+        if existing_email:
+            #print('email in use')
+            flash_translated("flash.email_in_use", "error")
+            a = 1
+        #kdyz nejsou zadne chyby tak input ze stranky zapise do db
+        if a==1:
+            return redirect(url_for("auth.register", page="register"))
+    return render_template("register.html", page="register")        
+
+@bp.route("/recover", methods=["GET", "POST"])
+def recover_account():
+    if request.method == "POST":
+        #form data
+        email = request.form.get("email")
+        new_username = request.form.get("username")
+        password = request.form.get("password")
+
+        if not email or not password:
+            flash_translated("flash.enter_credentials", "error")
+            return render_template("recover.html")
+
+        conn = get_db()
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT id, password, deleted, recovery_username
+            FROM users 
+            WHERE email = ?
+        """, (email,))
+        user = cursor.fetchone()
+
+        if not user:
+            flash_translated("flash.if_account_exists", "info")
+            return render_template("recover.html")
+
+        user_id, password_hash, deleted, recovery_username = user
+        if not bcrypt.checkpw(password.encode("utf-8"), password_hash.encode("utf-8")):
+            flash_translated("flash.invalid_credentials", "error")
+            return render_template("recover.html")
+        
+        if deleted == 0:
+            flash_translated("flash.account_already_active", "info")
+            return redirect(url_for("auth.login"))
+        
+        #check old username
+        if not new_username:
+            cursor.execute(
+                "SELECT id FROM users WHERE username = ?",
+                (recovery_username,)
+            )
+            taken = cursor.fetchone()
+
+            if taken:
+                flash_translated("flash.username_in_use", "error")
+                return render_template(
+                    "recover.html",
+                    ask_username=True,
+                    email=email
+                )
+
+            # old username is free → restore
+            cursor.execute("""
+                UPDATE users
+                SET deleted = 0,
+                    deleted_at = NULL,
+                    username = recovery_username
+                WHERE id = ?
+            """, (user_id,))
+            conn.commit()
+
+        #user provided a new username
+        else:
+            cursor.execute(
+                "SELECT id FROM users WHERE username = ?",
+                (new_username,)
+            )
+            if cursor.fetchone():
+                flash_translated("flash.username_in_use", "error")
+                return render_template(
+                    "recover.html",
+                    ask_username=True,
+                    email=email
+                )
+
+            cursor.execute("""
+                UPDATE users
+                SET username = ?,
+                    deleted = 0,
+                    deleted_at = NULL
+                WHERE id = ?
+            """, (new_username, user_id))
+            conn.commit()
+
+        flash_translated("flash.account_recovery_help", "success")
+        return redirect(url_for("auth.login"))
+
+    return render_template("recover.html")
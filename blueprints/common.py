@@ -0,0 +1,140 @@
+"""
+Helpers shared by the blueprints: access decorators, translated flashes,
+the cached session profile and the art lookup used by the shop and media pages
+"""
+from functools import wraps
+import secrets
+import sqlite3
+import string
+
+from flask import flash as flask_flash, redirect, session, url_for
+
+from db_utils import get_db
+from translations import translations
+
+
+def generate_deleted_username(length=8):
+    """
+    Generates a unique placeholder username for deleted users.
+    Example: Deleted_User_A1B2C3D4
+    """
+    chars = string.ascii_uppercase + string.digits  # A-Z + 0-9
+    random_part = ''.join(secrets.choice(chars) for _ in range(length))
+    return f"Deleted_User_{random_part}"
+def get_unique_deleted_username(cursor):
+    while True:
+        username = generate_deleted_username()
+        cursor.execute("SELECT 1 FROM users WHERE username=?", (username,))
+        if not cursor.fetchone():
+            return username
+
+def flash_translated(message_key, category="info", **kwargs):
+    user_language = session.get('user_language', 'en')
+    translated = translations.get(message_key, language=user_language, default=message_key)
+    if kwargs:
+        translated = translated.format(**kwargs)
+    flask_flash(translated, category)
+
+ART_VIEW_SQL = """
+    SELECT art.*,
+           author.bee_points AS author_points,
+           author.username AS author_username,
+           ao.id IS NOT NULL AS owns,
+           ao.source AS owned_source,
+           art.author_id IS NOT NULL AND art.author_id IS ? AS is_author,
+           CASE WHEN ao.id IS NULL THEN NULL
+                ELSE COALESCE(NULLIF(ao.source, ''), art.original_path) END AS owned_image,
+           COALESCE(NULLIF(ao.source, ''), NULLIF(art.original_path, ''),
+                    NULLIF(art.preview_path, ''), NULLIF(art.thumbnail_path, '')) AS owner_image,
+           COALESCE(NULLIF(art.preview_path, ''), NULLIF(art.original_path, ''),
+                    NULLIF(art.thumbnail_path, '')) AS public_image
+    FROM art
+    LEFT JOIN users AS author ON author.id = art.author_id
+    LEFT JOIN art_ownership AS ao ON ao.art_id = art.id AND ao.owner_id = ?
+    WHERE art.id = ?
+"""
+
+def resolve_art_view(art_id, user_id):
+    """
+    Loads everything the art pages need in one statement.
+    Returns a sqlite3.Row: art.* (same positions as before, templates index into it),
+    author_points, author_username, owns, owned_source, is_author and the image paths:
+      owned_image  - owner copy or original (only when owns), shown on the detail pages
+      owner_image  - owner copy, original, preview or thumbnail, served to owners/authors
+      public_image - preview, original or thumbnail, served to everyone else
+    """
+    cursor = get_db().cursor()
+    cursor.row_factory = sqlite3.Row
+    cursor.execute(ART_VIEW_SQL, (user_id, user_id, art_id))
+    return cursor.fetchone()
+
+#creates @login_required for furher use
+def login_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if 'username' not in session:
+            flash_translated("flash.login_first", "error")
+            return redirect(url_for("auth.login"))
+        return f(*args, **kwargs)
+    return decorated
+
+#creates @no_trespass for controlling if user doesnt invade to others sites
+def no_trespass(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        username = kwargs.get('username')
+        if session.get('username') != username:
+            flash_translated("flash.trespass", "error")
+            return redirect(url_for("main.index"))
+        return f(*args, **kwargs)
+    return decorated
+
+# bump when the shape of the cached session profile changes
+PROFILE_VERSION = 2
+
+USER_ID_SQL = "SELECT id FROM users WHERE username=?"
+# per-user counter, bumped by every write the cached profile depends on
+USER_PROFILE_VERSION_SQL = "SELECT profile_version FROM users WHERE id=?"
+BUMP_PROFILE_VERSION_SQL = "UPDATE users SET profile_version = profile_version + 1 WHERE id=?"
+
+PROFILE_SQL = """
+    SELECT users.username, users.avatar_path, preferences.theme, preferences.language, preferences.default_brush_size,
+           users.profile_version
+    FROM users
+    LEFT JOIN preferences ON preferences.user_id = users.id
+    WHERE users.id = ?
+"""
+
+def load_profile(user_id):
+    """Reads the small per-user profile that every page needs (avatar, theme, language, brush)."""
+    cursor = get_db().cursor()
+    cursor.execute(PROFILE_SQL, (user_id,))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    return {
+        "v": PROFILE_VERSION,
+        "username": row[0],
+        "avatar": row[1],
+        "theme": row[2] or 'bee',
+        "language": row[3] or 'en',
+        "brush": row[4] if row[4] is not None else 30,
+        "version": row[5],
+    }
+
+def bump_profile_version(cursor, user_id):
+    """Marks the cached profiles of user_id stale on every device, call before the settings commit."""
+    cursor.execute(BUMP_PROFILE_VERSION_SQL, (user_id,))
+
+def refresh_profile(user_id):
+    """Stores user id and a fresh profile in the session (login + after settings changes)."""
+    profile = load_profile(user_id)
+    if not profile:
+        session.pop('user_id', None)
+        session.pop('profile', None)
+        return None
+    session['user_id'] = user_id
+    session['username'] = profile['username']
+    session['profile'] = profile
+    session['user_language'] = profile['language']
+    return profile
@@ -0,0 +1,290 @@
+"""
+Draw blueprint: drawing room pages and the Socket.IO drawing events
+"""
+import uuid
+
+import bcrypt
+from flask import Blueprint, abort, current_app, g, redirect, render_template, request, session, url_for
+from flask_socketio import emit, join_room
+
+from blueprints.common import flash_translated, login_required
+from db_utils import get_db
+from extensions import socketio
+from draw_codec import CODEC, decode_op, decode_ops, op_seq, split_ops
+from room_broadcast import binary_room, get_broadcaster
+from room_store import get_room_log, get_room_store, load_room, record_event
+
+bp = Blueprint('draw', __name__)
+
+# draw.js flushes a stroke every 40 ms, a real one has a few dozen points
+MAX_STROKE_POINTS = 1000
+# ops per draw_history message, the next chunk goes out when the client acks this one
+HISTORY_CHUNK = 250
+# rooms remembered in the session cookie, the oldest one needs its password again
+MAX_VERIFIED_ROOMS = 50
+
+ROOM_PASSWORD_SQL = "SELECT name, password, is_public FROM rooms WHERE room_ID =?"
+ROOM_TYPE_SQL = "SELECT is_public FROM rooms WHERE room_ID =?"
+
+# rooms each connected sid joined and may page the history of (sid -> set)
+joined_rooms = {}
+# rooms each connected sid may draw in, decided once in join_room (sid -> set)
+drawable_rooms = {}
+# rooms each connected sid receives packed ops in, the codec it joined with (sid -> set)
+binary_rooms = {}
+
+def verify_room(room_ID):
+    """Remember in the session that the user may draw in the room (public, password entered or own room)"""
+    rooms = [room for room in session.get('verified_rooms', []) if room != room_ID]
+    rooms.append(room_ID)
+    session['verified_rooms'] = rooms[-MAX_VERIFIED_ROOMS:]
+
+@bp.route('/join/<room_ID>', methods=['GET','POST'])
+@login_required
+def join_room_page(room_ID):
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute(ROOM_PASSWORD_SQL,(room_ID,))
+    room = cursor.fetchone()
+    if not room:
+        flash_translated("flash.room_not_found", "error")
+        return redirect(url_for("draw.join"))
+    room_name, password_hash, room_type = room
+    if room_type == 1:
+        verify_room(room_ID)
+        return redirect(url_for('draw.draw', room_ID=room_ID, page="draw"))
+    if request.method == 'POST':
+        entered_password = request.form['password']
+        if password_hash and bcrypt.checkpw(entered_password.encode('utf-8'), password_hash.encode('utf-8')):
+            verify_room(room_ID)
+            return redirect(url_for('draw.draw', room_ID=room_ID, page="draw"))
+        else:
+            return render_template('roomPassword.html', error="Wrong password!", room_ID=room_ID)
+    return render_template('roomPassword.html', room_ID=room_ID)
+
+@bp.route('/draw/<room_ID>')
+@login_required
+def draw(room_ID):
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute(ROOM_TYPE_SQL,(room_ID,))
+    result = cursor.fetchone()
+    brush = (session['profile']['brush'],) if g.user_id else None
+    
+    if not result:
+        flash_translated("flash.room_not_found", "error")
+        return redirect(url_for("draw.join"))
+
+    room_type = result[0]
+    if room_type == 0 and room_ID not in session.get('verified_rooms', []):
+        return redirect(url_for('draw.join_room_page', room_ID=room_ID))
+    if room_type == 1 and room_ID not in session.get('verified_rooms', []):
+        verify_room(room_ID)
+    return render_template('draw.html',room_ID=room_ID, page="draw", brush=brush,
+                           websocket_only=current_app.config['SOCKETIO_WEBSOCKET_ONLY'])
+
+@bp.route('/create',methods=['GET','POST'])
+@login_required
+def create():
+    if request.method == 'POST':
+    #input ze stranky 
+        name = request.form['name']
+        password = request.form['password']
+        
+
+        if not password:
+            is_public = True
+        else:
+            is_public = False
+    #hash hesla
+        hash = None if not password else bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    #generuje room_ID
+        room_ID = str(uuid.uuid4())
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO rooms (name, password, room_ID, is_public, user_id) VALUES (?, ?, ?, ?, ?)", (name, hash, room_ID, is_public, g.user_id))
+        conn.commit()
+        #print(f"Room created: {name} / {room_ID}")
+        verify_room(room_ID)  # autor nezadava heslo do sve mistnosti
+        return redirect(url_for("draw.draw", room_ID=room_ID))
+    return render_template("drawCreate.html")
+
+@bp.route('/join', methods=['GET'])
+@login_required
+def join():
+    return render_template('drawJoin.html')
+
+#vypisuje vytvorene public rooms linky
+@bp.route('/join/public')
+@login_required
+def public():
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT r.name, r.room_ID, u.deleted
+        FROM rooms r
+        JOIN users u ON r.user_id = u.id AND r.is_public = TRUE
+    """)
+    rooms = cursor.fetchall()
+    return render_template("drawJoinPublic.html", rooms=rooms)
+
+#vypisuje vytvorene private rooms jako linky
+@bp.route('/join/private')
+@login_required
+def private():
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT r.name, r.room_ID, u.deleted
+        FROM rooms r
+        JOIN users u ON r.user_id = u.id AND r.is_public = FALSE
+    """)
+    rooms = cursor.fetchall()
+    return render_template("drawjoinPrivate.html", roomsP=rooms)
+
+@bp.route('/option')
+@login_required
+def option():
+    return render_template('drawOption.html')
+
+#kolik pameti drzi mistnosti v tomto workeru (viz RoomEvictor v room_store.py)
+#ukazuje ID vsech mistnosti, proto jen s BEEVY_ROOM_USAGE=1 (pro provozovatele)
+@bp.route('/rooms/usage')
+@login_required
+def rooms_usage():
+    if not current_app.config['ROOM_USAGE']:
+        abort(404)
+    rooms = [dict(info, room=room, idle=round(info['idle'], 1)) for room, info in get_room_store().usage().items()]
+    rooms.sort(key=lambda info: info['bytes'], reverse=True)
+    return {
+        'bytes': sum(info['bytes'] for info in rooms),
+        'budget': current_app.config['ROOM_MEMORY_BUDGET'],
+        'rooms': rooms,
+    }
+
+@socketio.on('join_room')
+def handle_join(data):
+    room = data['room']
+    # klient s draw_codec.js dostava tahy binarne (mensi zpravy), ostatni v JSONu
+    binary = data.get('codec') == CODEC and current_app.config['DRAW_BINARY']
+    join_room(binary_room(room) if binary else room)
+    #print(f"Client joined room {room}")
+    store = get_room_store()
+    load_room(store, get_room_log(), room)
+    store.join(room, request.sid)
+    joined_rooms.setdefault(request.sid, set()).add(room)
+    # opravneni kreslit se rozhodne jednou tady, ne u kazdeho tahu
+    if room in session.get('verified_rooms', []):
+        drawable_rooms.setdefault(request.sid, set()).add(room)
+    if binary:
+        binary_rooms.setdefault(request.sid, set()).add(room)
+        emit('codec', CODEC, to=request.sid)
+    since = data.get('since')
+    if since is None:
+        send_history(store, room, binary)
+        return
+    # reconnect: the client has drawn everything up to `since`, send only what it missed
+    target = store.last_seq(room)
+    if isinstance(since, int) and 0 < since <= target:
+        send_history_after(store, room, since, target, binary)
+    else:
+        send_history(store, room, binary, restart=True)  # not this room's numbering (e.g. server restart)
+
+def history_chunk(ops, target, binary):
+    """
+    draw_history payload: a run of ops with its sequence range. The replay
+    covers the room up to `target`; while `more` is set the client acks
+    with history_ack to get the next chunk.
+    """
+    ops = [op for op in ops if op_seq(op) <= target]
+    return {
+        'from': op_seq(ops[0]) if ops else None,
+        'to': op_seq(ops[-1]) if ops else None,
+        'target': target,
+        'more': len(ops) == HISTORY_CHUNK and op_seq(ops[-1]) < target,
+        'ops': b''.join(ops) if binary else decode_ops(ops),
+    }
+
+def send_history(store, room, binary, restart=False):
+    """
+    Start the replay of the room for the current sid: snapshot (if any) and
+    the first chunk. With `restart` the client is told to clear its canvas
+    even when the room has no snapshot.
+    """
+    # target first: anything numbered after it reaches the client live
+    target = store.last_seq(room)
+    # nikdy se necte cela historie, jen prvni chunk; dalsi prijdou po potvrzeni klienta
+    snapshot, ops = store.state(room, HISTORY_CHUNK)
+    chunk = history_chunk(ops, target, binary)
+    if snapshot is not None or restart:
+        # starsi tahy jsou uz vykreslene v obrazku, posila se jen zbytek
+        emit('draw_snapshot', {'image': snapshot, 'history': chunk}, to=request.sid)
+    else:
+        emit('draw_history', chunk, to=request.sid)
+
+def send_history_after(store, room, after, target, binary):
+    """Send the chunk after seq `after`, or start over when those ops were compacted or cleared"""
+    ops = store.ops_after(room, after, HISTORY_CHUNK)
+    if ops is None:
+        send_history(store, room, binary, restart=True)
+    else:
+        emit('draw_history', history_chunk(ops, target, binary), to=request.sid)
+
+@socketio.on('history_ack')
+def handle_history_ack(data):
+    """The client has drawn a chunk up to data['to'], send the next one"""
+    try:
+        room, after, target = data['room'], int(data['to']), int(data['target'])
+    except (KeyError, TypeError, ValueError):
+        return
+    if room not in joined_rooms.get(request.sid, ()):
+        return  # only the history of a room this sid joined
+    binary = data.get('codec') == CODEC and current_app.config['DRAW_BINARY']
+    send_history_after(get_room_store(), room, after, target, binary)
+
+@socketio.on('disconnect')
+def handle_disconnect(*args):
+    joined_rooms.pop(request.sid, None)
+    drawable_rooms.pop(request.sid, None)
+    binary_rooms.pop(request.sid, None)
+    get_room_store().leave_all(request.sid)
+
+def valid_stroke(data):
+    """stroke event: a flat [x0, y0, x1, y1, ...] list of at least two and at most MAX_STROKE_POINTS points"""
+    points = data.get('points')
+    return (isinstance(points, list) and 4 <= len(points) <= 2 * MAX_STROKE_POINTS
+            and len(points) % 2 == 0)
+
+def read_draw_event(data):
+    """The draw event of a 'draw' message, JSON or one packed op in data['op']. None if malformed."""
+    if not isinstance(data.get('op'), bytes):
+        return data
+    try:
+        ops = split_ops(data['op'])
+    except ValueError:
+        return None
+    return decode_op(ops[0]) if len(ops) == 1 else None
+
+@socketio.on('draw')
+def handle_draw(data):
+    """Store and broadcast a draw event. Acks the sender with the event's seq (None when ignored)."""
+    room = data['room']
+    if room not in drawable_rooms.get(request.sid, ()):
+        return  # ignore unauthorized draw events (or before join_room)
+    event = read_draw_event(data)
+    if event is None or (event.get('type') == 'stroke' and not valid_stroke(event)):
+        return
+
+    try:
+        op = record_event(get_room_store(), room, event, get_room_log())
+    except ValueError:
+        return  # not something the canvas can draw
+    broadcaster = get_broadcaster()
+    if broadcaster is not None:
+        # the batch of the others' events goes back in the codec this sid joined with
+        broadcaster.publish(room, request.sid, event, op, room in binary_rooms.get(request.sid, ()))
+    else:
+        emit('draw', event, to=room, skip_sid=request.sid)
+        emit('draw', op, to=binary_room(room), skip_sid=request.sid)
+    # odesilatel svuj tah zpet nedostane, seq se mu vrati v ack (lastSeq pro reconnect)
+    return event['seq']
@@ -0,0 +1,120 @@
+"""
+Main blueprint: per request user loading, the template translation helper,
+the landing page, health check and user pages
+"""
+from flask import Blueprint, g, render_template, session
+
+from blueprints.common import (
+    PROFILE_VERSION, USER_ID_SQL, USER_PROFILE_VERSION_SQL, flash_translated, refresh_profile,
+)
+from db_utils import get_db
+from translations import translations
+
+bp = Blueprint('main', __name__)
+
+USER_PAGE_SQL = """
+    SELECT id, username, bio, avatar_path, bee_points
+    FROM users
+    WHERE username = ?
+"""
+USER_SELLING_SQL = """
+    SELECT id, title, price, thumbnail_path
+    FROM art
+    WHERE author_id = ?
+"""
+USER_OWNED_SQL = """
+    SELECT art.id, art.title, art.thumbnail_path, art_ownership.source
+    FROM art
+    JOIN art_ownership ON art.id = art_ownership.art_id
+    WHERE art_ownership.owner_id = ?
+"""
+
+#nejprve nacte user badge pred vsim ostatnim
+@bp.before_app_request
+def load_logged_in_user():
+    g.avatar_path = None
+    g.user_theme = 'bee'
+    g.user_id = None
+    g.trans = translations
+
+    username = session.get('username')
+    if username:
+        profile = session.get('profile')
+        user_id = session.get('user_id')
+        cursor = get_db().cursor()
+        if not profile or profile.get('v') != PROFILE_VERSION or profile.get('username') != username or not user_id:
+            # session from before the profile was cached (or username changed) -> lookup by name
+            cursor.execute(USER_ID_SQL, (username,))
+            row = cursor.fetchone()
+            profile = refresh_profile(row[0]) if row else None
+        else:
+            # settings saved on another device bump the version -> reload the profile
+            cursor.execute(USER_PROFILE_VERSION_SQL, (user_id,))
+            row = cursor.fetchone()
+            if not row or row[0] != profile.get('version'):
+                profile = refresh_profile(user_id)
+        if profile:
+            g.user_id = session['user_id']
+            g.avatar_path = profile['avatar']
+            g.user_theme = profile['theme']
+
+    g.user_language = session.get("user_language", "en")
+        
+@bp.app_context_processor
+def inject_t():
+    def t(key, **kwargs):
+        text = translations.get(key, g.user_language, default=key)
+        if kwargs:
+            text = text.format(**kwargs)
+        return text
+    return dict(t=t)
+
+
+#hlavni stranka..
+@bp.route('/')
+def index():
+    return render_template("index.html", page="index")
+
+
+@bp.route('/health')
+def health():
+    return {"status": "ok"}, 200
+
+#userpage
+@bp.route('/<username>')
+def userPage(username):
+    viewer = session.get('username')
+    is_owner = viewer == username
+    conn = get_db()
+    cursor = conn.cursor()
+
+    # fetch user
+    cursor.execute(USER_PAGE_SQL, (username,))
+    user = cursor.fetchone()
+
+    if not user:
+        flash_translated("flash.user_not_found", "error")
+        return "", 404
+    #if username == "SpiderKate":
+     #   cursor.execute("UPDATE users SET bee_points=? WHERE id=?",(1000000,user[0]))
+      #  conn.commit()
+
+    # fetch selling art
+    cursor.execute(USER_SELLING_SQL, (user[0],))
+    selling = cursor.fetchall()
+
+    # fetch owned art ONLY if owner
+    owned = []
+    if is_owner:
+        cursor.execute(USER_OWNED_SQL, (user[0],))
+        
+        owned = cursor.fetchall()
+        #print(f"Art: {owned}")
+
+    return render_template(
+        'userPage.html',
+        user=user,
+        selling=selling,
+        owned=owned,
+        is_owner=is_owner
+    )
@@ -0,0 +1,330 @@
+"""
+Media blueprint: uploaded image processing (watermark, PNG metadata) and the
+routes that serve artwork files. Pillow is imported inside the functions that
+need it, so workers that only render pages never load it.
+"""
+from datetime import datetime
+import os
+import uuid
+
+from flask import Blueprint, abort, g, send_from_directory
+from werkzeug.utils import secure_filename
+
+from blueprints.common import login_required, resolve_art_view
+from db_utils import get_db
+
+bp = Blueprint('media', __name__)
+
+STATIC_ROOT = "static"
+CANVAS_UPLOAD_FOLDER = "uploads/canvas"  # drawing room snapshots, written by room_log.py
+AVATAR_UPLOAD_FOLDER = "uploads/avatar"
+UPLOAD_FOLDER = "uploads/shop"
+THUMB_FOLDER = "thumbs"
+EX_FOLDER = "examples"
+ORIG_FOLDER = "original"
+ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg"}
+MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB per file
+
+def save_uploaded_file(file, subfolder):
+    filename = f"{uuid.uuid4().hex}_{secure_filename(file.filename)}"
+
+    relative_path = os.path.join(subfolder, filename).replace("\\", "/")
+    full_path = os.path.join(STATIC_ROOT, relative_path)
+
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    file.save(full_path)
+
+    return relative_path
+
+def watermark_text_with_metadata(src_path, dest_path, text, metadata: dict):
+    """Draws a tiled, rotated watermark that remains visible on both light and dark images.
+    The watermark text is drawn with a dark outline and a lighter semi-transparent fill, repeated
+    across the image at a lower opacity but higher coverage so it's always noticeable.
+    """
+    from PIL import Image, ImageDraw, ImageFont
+    from PIL.PngImagePlugin import PngInfo
+
+    img = Image.open(src_path).convert("RGBA")
+    w, h = img.size
+
+    # build a watermark layer we can tile and rotate
+    watermark = Image.new("RGBA", img.size, (0, 0, 0, 0))
+
+    # choose a slightly larger font so watermark is more prominent but lower opacity
+    font_size = max(img.size) // 20
+    try:
+        font = ImageFont.truetype("arial.ttf", font_size)
+    except Exception:
+        font = ImageFont.load_default()
+
+    # make a single text tile that we will rotate and tile across the watermark layer
+    # measure text size
+    tmp = Image.new("RGBA", (w, h), (0, 0, 0, 0))
+    tmp_draw = ImageDraw.Draw(tmp)
+    text_bbox = tmp_draw.textbbox((0, 0), text, font=font)
+    tw = text_bbox[2] - text_bbox[0]
+    th = text_bbox[3] - text_bbox[1]
+
+    # create text image slightly padded to allow outline
+    pad = max(6, font_size // 6)
+    tile_w = tw + pad * 2
+    tile_h = th + pad * 2
+    text_img = Image.new("RGBA", (tile_w, tile_h), (0, 0, 0, 0))
+    tile_draw = ImageDraw.Draw(text_img)
+
+    # outline (dark) and main fill (light) with semi-transparent alpha
+    outline_alpha = 70  # stronger outline for contrast
+    fill_alpha = 30      # softer main text fill
+    outline_color = (0, 0, 0, outline_alpha)
+    fill_color = (255, 255, 255, fill_alpha)
+
+    x0, y0 = pad, pad
+    # draw outline by drawing the text multiple times around center
+    offsets = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+    for ox, oy in offsets:
+        tile_draw.text((x0 + ox, y0 + oy), text, font=font, fill=outline_color)
+    # draw main text on top
+    tile_draw.text((x0, y0), text, font=font, fill=fill_color)
+
+    # rotate the tile for diagonal coverage
+    angle = -25
+    rotated_tile = text_img.rotate(angle, expand=1)
+
+    # tile rotated_tile across watermark layer with spacing roughly half tile width
+    spacing_x = max(40, rotated_tile.width // 2)
+    spacing_y = max(40, rotated_tile.height // 2)
+
+    for yy in range(-rotated_tile.height, h + rotated_tile.height, spacing_y):
+        for xx in range(-rotated_tile.width, w + rotated_tile.width, spacing_x):
+            watermark.alpha_composite(rotated_tile, dest=(xx, yy))
+
+    # optionally reduce overall watermark opacity a bit more to keep it subtle
+    combined = Image.alpha_composite(img, watermark)
+
+    # ensure metadata saved in PNG
+    pnginfo = PngInfo()
+    for k, v in metadata.items():
+        pnginfo.add_text(k, str(v))
+
+    # save as PNG to preserve text chunks
+    combined.convert("RGB").save(dest_path, format="PNG", pnginfo=pnginfo)
+
+#contrls if the files ave the right extension
+def allowed_file(filename):
+    return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
+
+#valideates the image if they are the right type
+def validate_image(file):
+    """Validuje, zda je soubor obrázek s povolenou příponou"""
+    if not allowed_file(file.filename):
+        return False
+    from PIL import Image
+    try:
+        file.seek(0)  # ujistíme se, že čteme od začátku
+        img = Image.open(file)
+        img.verify()
+        file.seek(0)  # pointer zpátky na začátek pro další použití
+        return True
+    except Exception as e:
+        print("Image validation error:", e)
+        return False
+
+#adds metadata to the image for better image security
+def add_metadata(image_path, author, upload_date, creation_date=None):
+    """
+    Adds metadata to a PNG image.
+    image_path: path to the saved image
+    author: str, artwork author
+    upload_date: datetime object, when uploaded to Beevy
+    creation_date: datetime object, when artwork was created
+    """
+    from PIL import Image, PngImagePlugin
+    try:
+        img = Image.open(image_path)
+        meta = PngImagePlugin.PngInfo()
+        meta.add_text("Author", author)
+        meta.add_text("Uploaded on Beevy", upload_date.strftime("%Y-%m-%d %H:%M:%S"))
+        if creation_date:
+            meta.add_text("Original creation date", creation_date.strftime("%Y-%m-%d %H:%M:%S"))
+        meta.add_text("Downloaded from Beevy", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        img.save(image_path, pnginfo=meta)
+    except Exception as e:
+        print(f"Failed to add metadata to {image_path}: {e}")
+
+def send_static_path(rel_path):
+    """Sends a file stored under STATIC_ROOT, refusing paths that escape it."""
+    if not rel_path:
+        abort(404)
+
+    file_path = os.path.join(STATIC_ROOT, rel_path)
+    real_path = os.path.realpath(file_path)
+
+    if not real_path.startswith(os.path.realpath(STATIC_ROOT)):
+        abort(403)
+    if not os.path.exists(real_path):
+        abort(404)
+
+    return send_from_directory(
+        STATIC_ROOT,
+        os.path.relpath(real_path, STATIC_ROOT)
+    )
+
+#outputs the stored metadata
+def read_png_metadata(file_path):
+    """Reads metadata from a PNG file."""
+    from PIL import Image
+    try:
+        img = Image.open(file_path)
+        metadata = img.info  # returns dict of PNG text chunks
+        return {
+            "Author": metadata.get("Author"),
+            "Uploaded on Beevy": metadata.get("Uploaded on Beevy"),
+            "Original creation date": metadata.get("Original creation date"),
+            "Downloaded from Beevy": metadata.get("Downloaded from Beevy")
+        }
+    except Exception as e:
+        print(f"Failed to read metadata from {file_path}: {e}")
+        return {}
+
+def process_uploaded_image(file, username, prefix="", save_original=True, author_name=None):
+    """Saves an original PNG (optional), creates a watermarked PNG with metadata.
+    Returns tuple (watermarked_rel_path, original_rel_path_or_None).
+    """
+    from PIL import Image
+    from PIL.PngImagePlugin import PngInfo
+
+    filename = secure_filename(file.filename)
+    base_name = os.path.splitext(filename)[0]
+    file.seek(0)
+
+    thumb_folder = os.path.join(UPLOAD_FOLDER, THUMB_FOLDER)
+    example_folder = os.path.join(UPLOAD_FOLDER, EX_FOLDER)
+    original_folder = os.path.join(UPLOAD_FOLDER, ORIG_FOLDER)
+
+    for folder in (thumb_folder, example_folder, original_folder):
+        os.makedirs(os.path.join(STATIC_ROOT, folder), exist_ok=True)
+
+    original_rel_path = None
+    full_original_path = None
+
+    if save_original:
+        original_rel_path = os.path.join(
+            original_folder,
+            f"{uuid.uuid4().hex}_{base_name}.png"
+        ).replace("\\", "/")
+        full_original_path = os.path.join(STATIC_ROOT, original_rel_path)
+
+        img = Image.open(file)
+        img = img.convert("RGBA")
+        meta = PngInfo()
+        # resolve author name if not provided
+        if not author_name:
+            try:
+                cursor = get_db().cursor()
+                cursor.execute("SELECT name, surname FROM users WHERE username = ?", (username,))
+                ur = cursor.fetchone()
+                if ur:
+                    author_name = f"{ur[0]} {ur[1]} - {username}"
+                else:
+                    author_name = username
+            except Exception:
+                author_name = username
+
+        meta.add_text("Author", author_name)
+        meta.add_text("Uploaded on Beevy", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        img.save(full_original_path, pnginfo=meta, format="PNG")
+        file.seek(0)
+
+    target_folder = thumb_folder if prefix == "thumb" else example_folder
+
+    watermarked_rel_path = os.path.join(
+        target_folder,
+        f"{prefix}_{uuid.uuid4().hex}_{base_name}.png"
+    ).replace("\\", "/")
+
+    full_watermarked_path = os.path.join(STATIC_ROOT, watermarked_rel_path)
+
+    metadata = {
+        "Author": author_name if author_name else username,
+        "Uploaded on Beevy": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "Downloaded from Beevy": "Beevy",
+        "Preview": "True" if prefix != "original" else "False"
+    }
+
+    watermark_text_with_metadata(
+        full_original_path if full_original_path else file,
+        full_watermarked_path,
+        username,
+        metadata
+    )
+
+    return watermarked_rel_path, original_rel_path
+
+DOWNLOAD_SQL = """
+    SELECT COALESCE(NULLIF(ao.source, ''), art.original_path) as path, ao.can_download
+    FROM art_ownership ao
+    LEFT JOIN art ON ao.art_id = art.id
+    WHERE ao.art_id = ? AND ao.owner_id = ?
+"""
+
+@bp.route("/download/<int:art_id>")
+@login_required
+def download_art(art_id):
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute(DOWNLOAD_SQL, (art_id, g.user_id))
+    row = cursor.fetchone()
+
+    if not row or not row[1]:
+        abort(403)
+
+    file_rel_path = row[0].replace("\\", "/")
+    file_dir = os.path.dirname(file_rel_path)
+    file_name = os.path.basename(file_rel_path)
+    full_dir = os.path.join(STATIC_ROOT, file_dir)
+
+    if not os.path.exists(os.path.join(full_dir, file_name)):
+        abort(404)
+
+
+    # Clean download name
+    download_name = f"beevyDownload{art_id:04d}.png"
+    # Optional: read metadata
+    metadata = read_png_metadata(os.path.join(full_dir, file_name))
+    print("Metadata:", metadata)
+
+    return send_from_directory(full_dir, file_name, as_attachment=True,download_name=download_name)
+
+@bp.route("/preview/<int:art_id>")
+@login_required
+def preview_art(art_id):
+    """Serve a preview image. If the current user owns the art, prefer their owner-specific source or original; otherwise serve the public preview."""
+    item = resolve_art_view(art_id, g.user_id)
+
+    if not item:
+        abort(404)
+
+    # Access rules: inactive art only visible to owner/author
+    if not item["is_active"] and not item["owns"] and not item["is_author"]:
+        abort(404)
+
+    # Owners get their copy (or the original), everyone else the public preview
+    chosen_rel = item["owner_image"] if item["owns"] else item["public_image"]
+    return send_static_path(chosen_rel)
+
+@bp.route('/owned/<int:art_id>/preview')
+@login_required
+def owned_preview(art_id):
+    """Owner-only preview — ensures only owners/authors can access owner copies."""
+    if not g.user_id:
+        abort(403)
+
+    item = resolve_art_view(art_id, g.user_id)
+    if not item:
+        abort(404)
+
+    if not item["owns"] and not item["is_author"]:
+        abort(403)
+
+    # Prefer owner-specific source, then original, then preview, then thumbnail
+    return send_static_path(item["owner_image"])
@@ -0,0 +1,279 @@
+"""
+Settings blueprint: profile, preferences, account, security, logout and account deletion
+"""
+from datetime import datetime
+
+import bcrypt
+from flask import Blueprint, redirect, render_template, request, session, url_for
+
+from blueprints.common import (
+    USER_ID_SQL, bump_profile_version, flash_translated, get_unique_deleted_username, login_required, no_trespass,
+    refresh_profile,
+)
+from blueprints.media import AVATAR_UPLOAD_FOLDER, save_uploaded_file
+from db_utils import get_db
+
+bp = Blueprint('settings', __name__)
+
+PREFERENCES_SQL = "SELECT language, theme, default_brush_size, notifications FROM preferences WHERE user_id = ?"
+DELETE_ACCOUNT_SQL = "SELECT id, password FROM users WHERE username = ? AND deleted = 0;"
+
+#settings...
+@bp.route('/<username>/settings')
+@login_required
+@no_trespass
+def settings(username):
+    return render_template("settings.html")
+
+@bp.route("/<username>/settings/profile", methods=["GET", "POST"])
+@login_required
+@no_trespass
+def settingsProfile(username):
+
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute(
+            "SELECT id, username, bio, avatar_path FROM users WHERE username=?",
+            (username,)
+        )
+        
+        user = cursor.fetchone()
+        if not user:
+            flash_translated("flash.user_not_found", "error")
+            return "", 404
+
+        if request.method == "POST":
+            new_username = request.form.get("username")
+            new_bio = request.form.get("bio")
+            avatar = request.files.get("avatar")
+
+            cursor.execute("SELECT username FROM users WHERE username = ?", (new_username,))
+            db_user = cursor.fetchone()
+            if db_user and username!=new_username:
+                flash_translated("flash.username_taken", "error")
+                return render_template("settingsProfile.html", user = user)
+
+            avatar_path = user[3]  # default: keep old avatar
+
+            if avatar and avatar.filename:
+                # Save avatar in AVATAR_UPLOAD_FOLDER
+                avatar_path = save_uploaded_file(avatar, AVATAR_UPLOAD_FOLDER)
+
+            cursor.execute(
+                """
+                UPDATE users
+                SET username = ?, bio = ?, avatar_path = ?
+                WHERE id = ?
+                """,
+                (new_username, new_bio, avatar_path, user[0])
+            )
+            bump_profile_version(cursor, user[0])
+            conn.commit()
+            # Update session username if changed
+            session["username"] = new_username
+            refresh_profile(user[0])
+            flash_translated("flash.settings_saved", "success")
+            return redirect(url_for("settings.settingsProfile", username=new_username))
+    except Exception as e:
+        flash_translated("flash.error_occurred", "error", e=str(e))
+        return redirect(url_for("main.index"))    
+    return render_template("settingsProfile.html", user=user)
+
+@bp.route("/<username>/settings/preferences", methods=["GET", "POST"])
+@login_required
+@no_trespass
+def settingsPreferences(username):
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        # get basic user info
+        cursor.execute(USER_ID_SQL, (username,))
+        user_id = cursor.fetchone()[0]
+        
+
+        if not user_id:
+            flash_translated("flash.user_not_found", "error")
+            return "", 404
+        
+    # get preferences (create defaults if missing)
+        cursor.execute(PREFERENCES_SQL, (user_id,))
+        prefs = cursor.fetchone()
+        if not prefs:
+            prefs = ('en', 'bee', 30, 1)
+            cursor.execute(
+                "INSERT INTO preferences (user_id, language, theme, default_brush_size, notifications) VALUES (?,?,?,?,?)",
+                (user_id, prefs[0], prefs[1], prefs[2], prefs[3])
+            )
+            conn.commit()
+        
+        # assemble tuple expected by template: (id, language, theme, default_brush_size, notifications)
+        user = (user_id, prefs[0], prefs[1], prefs[2], prefs[3])
+
+        if request.method == "POST":
+            new_language = request.form.get("language")
+            new_theme = request.form.get("theme")
+            new_brush = int(request.form.get("brush") or prefs[2])
+            new_not = 1 if request.form.get("not") else 0  # handle checkbox
+
+            # update or insert preferences
+            cursor.execute("SELECT 1 FROM preferences WHERE user_id = ?", (user_id,))
+            if cursor.fetchone():
+                cursor.execute(
+                    "UPDATE preferences SET language = ?, theme = ?, default_brush_size = ?, notifications = ? WHERE user_id = ?",
+                    (new_language, new_theme, new_brush, new_not, user_id)
+                )
+            else:
+                cursor.execute(
+                    "INSERT INTO preferences (user_id, language, theme, default_brush_size, notifications) VALUES (?,?,?,?,?)",
+                    (user_id, new_language, new_theme, new_brush, new_not)
+                )
+            bump_profile_version(cursor, user_id)
+            conn.commit()
+            refresh_profile(user_id)
+            flash_translated("flash.settings_saved", "success")
+            return redirect(url_for("settings.settingsPreferences", username=username))
+    except Exception as e:
+        flash_translated("flash.error_occurred", "error", e=str(e))
+        return redirect(url_for("main.index"))
+    return render_template("settingsPreferences.html", user=user)
+
+@bp.route("/<username>/settings/account", methods=["GET","POST"])
+@login_required
+@no_trespass
+def settingsAccount(username):
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        # get basic user info
+        cursor.execute("SELECT id, email FROM users WHERE username=?", (username,))
+        user_row = cursor.fetchone()
+
+        if not user_row:
+            flash_translated("flash.user_not_found", "error")
+            return "", 404
+
+        user_id, email = user_row
+        
+        # assemble tuple expected by template: (id, email)
+        user = (user_id, email)
+
+        if request.method == "POST":
+            new_email = request.form.get("email")
+
+            # update users email
+            cursor.execute(
+                "UPDATE users SET email = ? WHERE id = ?",
+                (new_email, user_id)
+            )
+            flash_translated("flash.settings_saved", "success")
+            return redirect(url_for("settings.settingsAccount", username=username))
+    except Exception as e:
+        flash_translated("flash.error_occurred", "error", e=str(e))
+        return redirect(url_for("main.index"))
+    return render_template("settingsAccount.html", user=user)
+    
+@bp.route("/<username>/settings/security", methods=["GET","POST"])
+@login_required
+@no_trespass
+def settingsSecurity(username):
+    error = []
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, username, email, password, last_login_at FROM users WHERE username=?",(username,))
+    user = cursor.fetchone()
+    if not user:
+        flash_translated("flash.user_not_found", "error")
+        return "", 404
+
+    if request.method == "POST":
+        curPassword = request.form.get('curPassword')
+        newPassword = request.form.get('newPassword')
+        newPassword2 = request.form.get('newPassword2')
+        a=0
+        if not newPassword:
+            flash_translated("flash.password_empty", "error")
+            a=1
+        if not bcrypt.checkpw(curPassword.encode('utf-8'),user[3].encode('utf-8')):
+            flash_translated("flash.password_incorrect", "error")
+            a=1
+        if (newPassword!=newPassword2):
+            flash_translated("flash.passwords_mismatch", "error")
+            a=1
+
+        if a==1:
+            return render_template("settingsSecurity.html", user=user)
+        
+        newHash = bcrypt.hashpw(newPassword.encode('utf-8'),bcrypt.gensalt()).decode('utf-8')
+
+        cursor.execute("UPDATE users SET password=? WHERE id=?",(newHash,user[0]))
+        conn.commit()
+        flash_translated("flash.settings_saved", "success")
+
+        return render_template("settingsSecurity.html", user=user)
+    return render_template("settingsSecurity.html", user=user)
+
+@bp.route('/<username>/settings/logout',methods=["GET","POST"])
+@login_required
+@no_trespass
+def settingsLogout(username):
+    if request.method == "POST":
+        session.clear()
+        flash_translated("flash.logout_success", "success")
+        return redirect(url_for("main.index"))
+    return render_template("settingsLogout.html")
+
+@bp.route("/<username>/settings/delete", methods=["GET", "POST"])
+@login_required
+@no_trespass
+def settingsDelete(username):
+
+    if request.method == "POST":
+        # DELETE confirmation
+        if request.form.get("confirm") != "DELETE":
+            flash_translated("flash.must_type_delete", "info")
+            return render_template("settingsDelete.html")
+
+        password = request.form.get("password")
+
+        conn = get_db()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute(DELETE_ACCOUNT_SQL, (username,))
+            recUsername = username
+            user = cursor.fetchone()
+
+            if not user:
+                flash_translated("flash.user_not_found", "error")
+                return redirect(url_for("main.index"))
+
+            user_id, password_hash = user
+
+            # bcrypt check
+            if not bcrypt.checkpw(password.encode("utf-8"),password_hash.encode("utf-8")):
+                flash_translated("flash.wrong_password", "error")
+                return redirect(request.url)
+
+            # soft delete
+            deleted_username = get_unique_deleted_username(cursor)
+            deleted_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            cursor.execute("UPDATE users SET deleted=1, deleted_at=?, username=?, recovery_username = ? WHERE id=?",(deleted_at, deleted_username, recUsername, user_id))
+            # deactivate rooms
+            cursor.execute("UPDATE rooms SET is_active=0 WHERE user_id=?",(user_id,))
+
+            # deactivate art
+            cursor.execute("UPDATE art SET is_active=0 WHERE author_id=?",(user_id,))
+            conn.commit()
+            
+            session.clear()
+            flash_translated("flash.account_deactivated", "success")
+            return redirect(url_for("main.index"))
+
+        except Exception as e:
+            conn.rollback()
+            flash_translated("flash.error_occurred", "error", e=str(e))
+
+    return render_template("settingsDelete.html")
@@ -0,0 +1,750 @@
+"""
+Shop blueprint: shop feed and search, artwork detail, purchases,
+owned artworks and creating or editing artworks
+"""
+from datetime import datetime
+import os
+import secrets
+import shutil
+import sqlite3
+import sys
+import uuid
+
+import bcrypt
+from flask import Blueprint, abort, g, redirect, render_template, request, session, url_for
+
+from blueprints.common import (
+    flash_translated, get_unique_deleted_username, login_required, no_trespass, resolve_art_view,
+)
+from blueprints.media import (
+    ALLOWED_EXTENSIONS, EX_FOLDER, MAX_FILE_SIZE, ORIG_FOLDER, STATIC_ROOT, THUMB_FOLDER, UPLOAD_FOLDER,
+    allowed_file, process_uploaded_image, validate_image,
+)
+from db_utils import get_db
+from search_utils import FacetCache, SORTS, SEARCH_PAGE_SIZE, WINDOW_SORTS, search_art
+
+bp = Blueprint('shop', __name__)
+
+# purchase_art status -> flash message
+PURCHASE_FLASH = {
+    "purchased": ("flash.artwork_purchased", "success"),
+    "already_owned": ("flash.already_owned", "info"),
+    "insufficient": ("flash.insufficient_points", "error"),
+    "own_art": ("flash.artwork_cannot_buy_own", "error"),
+    "not_found": ("flash.artwork_not_found", "error"),
+    "failed": ("flash.purchase_failed", "error"),
+}
+
+# the ownership row only goes in when the buyer does not own the artwork yet
+PURCHASE_OWNERSHIP_SQL = """
+    INSERT INTO art_ownership (art_id, owner_id, acquired_at)
+    SELECT ?, ?, ?
+    WHERE NOT EXISTS (SELECT 1 FROM art_ownership WHERE art_id = ? AND owner_id = ?)
+"""
+
+def purchase_art(conn, buyer_id, art_id):
+    """
+    Buys art_id for buyer_id as one BEGIN IMMEDIATE transaction:
+    conditional debit (never below zero), ownership insert, author credit.
+    The write lock is taken up front, so parallel clicks queue up instead of
+    double spending; the unique (art_id, owner_id) index is the last guard.
+    Returns a PURCHASE_FLASH key.
+    """
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        cursor.execute("SELECT price, author_id FROM art WHERE id = ?", (art_id,))
+        art = cursor.fetchone()
+        if not art:
+            conn.rollback()
+            return "not_found"
+        price, author_id = art
+        if author_id == buyer_id:
+            conn.rollback()
+            return "own_art"
+
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        cursor.execute(PURCHASE_OWNERSHIP_SQL, (art_id, buyer_id, now, art_id, buyer_id))
+        if cursor.rowcount != 1:
+            conn.rollback()
+            return "already_owned"
+
+        cursor.execute(
+            "UPDATE users SET bee_points = bee_points - ? WHERE id = ? AND bee_points >= ?",
+            (price, buyer_id, price)
+        )
+        if cursor.rowcount != 1:
+            conn.rollback()
+            return "insufficient"
+
+        if author_id:
+            cursor.execute("UPDATE users SET bee_points = bee_points + ? WHERE id = ?", (price, author_id))
+
+        conn.commit()
+        return "purchased"
+    except sqlite3.IntegrityError:
+        conn.rollback()
+        return "already_owned"
+    except Exception:
+        conn.rollback()
+        raise
+
+SHOP_PAGE_SIZE = 15
+
+
+def shop_seed():
+    """Per-session shuffle seed, a new one per login keeps the shop feeling fresh"""
+    if 'shop_seed' not in session:
+        session['shop_seed'] = secrets.randbits(32)
+    return session['shop_seed']
+
+
+# shuffle_key values are in [0, SHOP_KEY_RANGE), see migrations/005_shop_shuffle.sql
+SHOP_KEY_RANGE = 2 ** 31
+
+SHOP_PAGE_SQL = """
+    SELECT art.id, art.title, art.price, art.thumbnail_path, users.username, users.deleted, art.shuffle_key
+    FROM art
+    JOIN users ON art.author_id = users.id
+    WHERE art.is_active = 1 AND users.deleted = 0
+      AND (art.shuffle_key, art.id) > (?, ?) AND art.shuffle_key < ?
+    ORDER BY art.shuffle_key, art.id
+    LIMIT ?
+"""
+
+
+def parse_shop_cursor(cursor):
+    """'<pivot>.<phase>.<last key>.<last id>' -> (pivot, phase, last key, last id), None for the first page"""
+    try:
+        pivot, phase, last_key, last_id = (int(part) for part in cursor.split("."))
+    except (AttributeError, ValueError):
+        return None
+    if phase not in (0, 1) or not 0 <= pivot < SHOP_KEY_RANGE or last_key < 0 or last_id < 0:
+        return None
+    return pivot, phase, last_key, last_id
+
+
+def load_shop_page(seed, cursor=None, limit=SHOP_PAGE_SIZE):
+    """
+    One page of the shop, keyset paginated over (art.shuffle_key, art.id).
+
+    Every artwork has a random shuffle_key stored at insert, so the feed order
+    is not tied to upload order. The seed picks a pivot key, the feed walks the
+    keys from the pivot up (phase 0) and then wraps around to the keys below it
+    (phase 1): a different start per session, stable between requests, and each
+    page costs the same no matter how big the catalogue is.
+    Returns (items, next cursor or None).
+    """
+    cursor_db = get_db().cursor()
+    position = parse_shop_cursor(cursor)
+    if position is None:
+        pivot = seed * 2654435761 % SHOP_KEY_RANGE  # spread nearby seeds over the key range
+        position = (pivot, 0, pivot, -1)
+    pivot, phase, last_key, last_id = position
+
+    found = []  # (phase, row)
+    while len(found) <= limit and phase < 2:
+        upper = SHOP_KEY_RANGE if phase == 0 else pivot
+        rows = cursor_db.execute(SHOP_PAGE_SQL, (last_key, last_id, upper, limit + 1 - len(found))).fetchall()
+        found.extend((phase, row) for row in rows)
+        phase, last_key, last_id = phase + 1, -1, -1  # wrap around
+
+    next_cursor = None
+    if len(found) > limit:
+        found = found[:limit]
+        last_phase, last_row = found[-1]
+        next_cursor = f"{pivot}.{last_phase}.{last_row[6]}.{last_row[0]}"
+    return [row for _, row in found], next_cursor
+
+
+@bp.route('/shop')
+@login_required
+def shop():
+    items, next_cursor = load_shop_page(shop_seed(), request.args.get('cursor'))
+    return render_template("shop.html", items=items, next_cursor=next_cursor)
+
+
+@bp.route('/shop/feed')
+@login_required
+def shop_feed():
+    """JSON variant of the shop page for infinite scroll"""
+    items, next_cursor = load_shop_page(shop_seed(), request.args.get('cursor'))
+    return {
+        "items": [
+            {
+                "id": item[0],
+                "title": item[1],
+                "price": item[2],
+                "artist": item[4],
+                "url": url_for('shop.art_detail', art_id=item[0]),
+                "thumbnail": url_for('static', filename=item[3]),
+            }
+            for item in items
+        ],
+        "next": next_cursor,
+    }
+
+MAX_SEARCH_PAGE = 50
+facet_cache = FacetCache()
+
+
+@bp.route('/shop/search')
+@login_required
+def shop_search():
+    search = {
+        "q": request.args.get('q', '').strip(),
+        "type": request.args.get('type') or None,
+        "min_price": request.args.get('min_price', type=int),
+        "max_price": request.args.get('max_price', type=int),
+        "author": request.args.get('author', '').strip() or None,
+        "sort": request.args.get('sort', ''),
+    }
+    if search["sort"] not in (WINDOW_SORTS if search["q"] else SORTS):
+        search["sort"] = "relevance" if search["q"] else "newest"
+    page = min(max(request.args.get('page', 1, type=int), 1), MAX_SEARCH_PAGE)
+
+    conn = get_db()
+    items = search_art(
+        conn, search["q"], search["type"], search["min_price"], search["max_price"], search["author"],
+        sort=search["sort"], offset=(page - 1) * SEARCH_PAGE_SIZE,
+    )
+    facets = facet_cache.get(conn)
+
+    next_page_url = None
+    if len(items) == SEARCH_PAGE_SIZE and page < MAX_SEARCH_PAGE:
+        args = {key: value for key, value in search.items() if value not in (None, "")}
+        next_page_url = url_for('shop.shop_search', page=page + 1, **args)
+
+    return render_template("shop.html", items=items, search=search, facets=facets, next_page_url=next_page_url)
+
+
+@bp.route('/shop/<int:art_id>')
+@login_required
+def art_detail(art_id):
+
+    # Artwork, author and the viewer's ownership in one query (author may be NULL after deletion)
+    item = resolve_art_view(art_id, g.user_id)
+
+    if not item:
+        return "Item not found", 404
+
+    # Prepare examples list
+    examples_list = item["examples_path"].split(",") if item["examples_path"] else []
+
+    is_active = bool(item["is_active"])
+    owns = bool(item["owns"])
+    is_author = bool(item["is_author"])
+
+    # If item is inactive (deleted from shop) only allow owners or authors to view it
+    if not is_active and not owns and not is_author:
+        abort(404)
+
+    # If the current user owns this art (and is not the author), redirect to owned view
+    if owns and not is_author:
+        return redirect(url_for('shop.owned_view', art_id=art_id))
+
+    return render_template("art_detail.html", item=item, examples_list=examples_list, owns=owns, owned_image=item["owned_image"], is_author=is_author, is_active=is_active)
+
+@bp.route('/owned/<int:art_id>', methods=['GET'])
+@login_required
+def owned_view(art_id):
+    """Owner-only view showing artwork details, thumbnail, examples, download and remove ownership button."""
+    if not g.user_id:
+        abort(403)
+
+    item = resolve_art_view(art_id, g.user_id)
+    if not item:
+        abort(404)
+
+    # Verify ownership
+    owns = bool(item["owns"])
+    is_author = bool(item["is_author"])
+    if not owns and not is_author:
+        abort(403)
+
+    # Prepare examples list
+    examples_list = item["examples_path"].split(",") if item["examples_path"] else []
+
+    return render_template("owned_detail.html", item=item, examples_list=examples_list, owns=owns, owned_image=item["owned_image"], is_author=is_author, is_active=bool(item["is_active"]))
+
+@bp.route('/owned/<int:art_id>/remove', methods=['POST'])
+@login_required
+def remove_ownership(art_id):
+    """Remove the current user's ownership of an artwork.
+    - If there are other owners, only remove the ownership record and delete the owner's copy.
+    - If the user was the only owner and the art is inactive, also delete the art row and any remaining files.
+    """
+    conn = get_db()
+    cursor = conn.cursor()
+
+    # get current user id
+    user_id = g.user_id
+    if not user_id:
+        abort(403)
+
+    # verify ownership
+    cursor.execute("SELECT id, source FROM art_ownership WHERE art_id = ? AND owner_id = ?", (art_id, user_id))
+    ownership = cursor.fetchone()
+    if not ownership:
+        flash_translated("flash.not_owner", "error")
+        return redirect(url_for('main.userPage', username=session.get('username')))
+
+    ownership_id, source_rel = ownership
+
+    # count owners
+    cursor.execute("SELECT COUNT(*) FROM art_ownership WHERE art_id = ?", (art_id,))
+    owners_count = cursor.fetchone()[0]
+
+    # get art info
+    cursor.execute("SELECT thumbnail_path, preview_path, original_path, examples_path, is_active FROM art WHERE id = ?", (art_id,))
+    art_row = cursor.fetchone()
+    if not art_row:
+        # nothing to do
+        cursor.execute("DELETE FROM art_ownership WHERE id = ?", (ownership_id,))
+        conn.commit()
+        flash_translated("flash.ownership_removed", "success")
+        return redirect(url_for('main.userPage', username=session.get('username')))
+
+    thumb_rel, preview_rel, orig_rel, examples_rel, is_active = art_row
+
+    # remove owner's copy file if present
+    if source_rel:
+        full = os.path.join(STATIC_ROOT, source_rel)
+        try:
+            if os.path.exists(full):
+                os.remove(full)
+        except Exception as e:
+            print("Failed to remove owner file:", e)
+
+    # delete ownership record
+    cursor.execute("DELETE FROM art_ownership WHERE id = ?", (ownership_id,))
+
+    # if this was the only owner and art is inactive => delete art and its files
+    if owners_count <= 1 and not is_active:
+        # delete any remaining stored files
+        for rel in (thumb_rel, preview_rel, orig_rel):
+            if rel:
+                full = os.path.join(STATIC_ROOT, rel)
+                try:
+                    if os.path.exists(full):
+                        os.remove(full)
+                except Exception:
+                    pass
+        if examples_rel:
+            for ex in examples_rel.split(','):
+                full = os.path.join(STATIC_ROOT, ex)
+                try:
+                    if os.path.exists(full):
+                        os.remove(full)
+                except Exception:
+                    pass
+        # delete art row
+        cursor.execute("DELETE FROM art WHERE id = ?", (art_id,))
+        conn.commit()
+        flash_translated("flash.ownership_removed_cleanup", "success")
+        return redirect(url_for('main.userPage', username=session.get('username')))
+
+    conn.commit()
+    flash_translated("flash.ownership_removed", "success")
+    return redirect(url_for('main.userPage', username=session.get('username')))
+
+@bp.route("/<username>/<int:art_id>/edit", methods=["GET", "POST"])
+@login_required
+@no_trespass
+def editArt(username, art_id):
+    conn = get_db()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        SELECT art.*, users.password
+        FROM art
+        JOIN users ON art.author_id = users.id
+        WHERE art.id = ?
+    """, (art_id,))
+    item = cursor.fetchone()
+
+    if not item:
+        abort(404)
+
+    examples_list = item[10].split(",") if item[10] else []
+
+    if request.method == "POST":
+
+        confirm_delete = request.form.get("confirmDelete")
+        confirm_hide = request.form.get("confirmHide")
+        confirm_show = request.form.get("confirmShow")
+        password = request.form.get("password")
+
+        # === DELETE ARTWORK ===
+        if confirm_delete == "DELETE":
+            if not password:
+                flash_translated("flash.password_required", "error")
+                return redirect(request.url)
+
+            if not bcrypt.checkpw(password.encode(), item[-1].encode()):
+                flash_translated("flash.wrong_password", "error")
+                return redirect(request.url)
+
+            try:
+                # Determine owners for this artwork
+                cursor.execute("SELECT id, owner_id FROM art_ownership WHERE art_id = ?", (art_id,))
+                owners = cursor.fetchall()
+
+                thumb_rel = item[7]
+                preview_rel = item[8]
+                original_rel = item[9]
+                examples_rel = item[10] or ""
+
+                def rel_to_full(rel):
+                    if not rel:
+                        return None
+                    return os.path.join(STATIC_ROOT, rel)
+
+                # If no owners, remove all files and DB row
+                if not owners:
+                    for rel in (thumb_rel, preview_rel, original_rel):
+                        if rel:
+                            full = rel_to_full(rel)
+                            try:
+                                if os.path.exists(full):
+                                    os.remove(full)
+                            except Exception:
+                                pass
+                    if examples_rel:
+                        for ex in examples_rel.split(","):
+                            full = rel_to_full(ex)
+                            try:
+                                if os.path.exists(full):
+                                    os.remove(full)
+                            except Exception:
+                                pass
+                    cursor.execute("DELETE FROM art WHERE id = ?", (art_id,))
+                    conn.commit()
+                    flash_translated("flash.artwork_deleted", "success")
+                    return redirect(url_for("shop.shop"))
+
+                #TODO: Owners exist: copy original (or best available) for each owner and update art_ownership.source
+                owned_dir = os.path.join(STATIC_ROOT, UPLOAD_FOLDER, "owned")
+                os.makedirs(owned_dir, exist_ok=True)
+
+                src_rel = original_rel or preview_rel or thumb_rel
+                src_full = rel_to_full(src_rel)
+
+                for ownership_id, owner_id in owners:
+                    try:
+                        if src_full and os.path.exists(src_full):
+                            dest_filename = f"{uuid.uuid4().hex}_{os.path.basename(src_rel)}"
+                            dest_rel = os.path.join(UPLOAD_FOLDER, "owned", dest_filename).replace("\\", "/")
+                            dest_full = os.path.join(STATIC_ROOT, dest_rel)
+                            # ensure parent dir exists
+                            os.makedirs(os.path.dirname(dest_full), exist_ok=True)
+                            shutil.copy2(src_full, dest_full)
+                            cursor.execute("UPDATE art_ownership SET source = ? WHERE id = ?", (dest_rel, ownership_id))
+                    except Exception as e:
+                        print("Failed to create owner copy:", e)
+
+                # Remove public files and anonymize/hide the art from the shop
+                for rel in (thumb_rel, preview_rel, original_rel):
+                    if rel:
+                        full = rel_to_full(rel)
+                        try:
+                            if os.path.exists(full):
+                                os.remove(full)
+                        except Exception:
+                            pass
+                if examples_rel:
+                    for ex in examples_rel.split(","):
+                        full = rel_to_full(ex)
+                        try:
+                            if os.path.exists(full):
+                                os.remove(full)
+                        except Exception:
+                            pass
+
+                deleted_username = get_unique_deleted_username(cursor)
+                cursor.execute("""
+                    UPDATE art SET author_id = NULL, is_active = 0, thumbnail_path = '', preview_path = '', original_path = ''
+                    WHERE id = ?
+                """, (art_id,))
+                conn.commit()
+                flash_translated("flash.artwork_deleted_shop", "success")
+                return redirect(url_for("shop.shop"))
+            except Exception as e:
+                # Rollback and surface an error instead of 500
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+                print("Delete artwork failed:", e)
+                flash_translated("flash.delete_failed", "error")
+                return redirect(request.url)
+
+        # === HIDE ARTWORK ===
+        if confirm_hide == "HIDE":
+            cursor.execute("""
+                UPDATE art SET is_active = 0 WHERE id = ?
+            """, (art_id,))
+            conn.commit()
+
+            flash_translated("flash.artwork_hidden", "success")
+            return redirect(url_for("shop.shop"))
+        
+        if confirm_show == "SHOW":
+            cursor.execute("""
+                UPDATE art SET is_active = 1 WHERE id = ?
+            """, (art_id,))
+            conn.commit()
+
+            flash_translated("flash.artwork_unhidden", "success")
+            return redirect(url_for("shop.shop"))
+
+        # === NORMAL EDIT ===
+        new_title = request.form.get("title")
+        new_description = request.form.get("description")
+        new_slots = request.form.get("slots") or None
+
+        thumb_file = request.files.get("thumbnail")
+        examples_files = request.files.getlist("examples")
+
+        # Resolve author display name for metadata
+        cursor.execute("SELECT id, name, surname FROM users WHERE id = ?", (g.user_id,))
+        user_row = cursor.fetchone()
+        author_name = f"{user_row[1]} {user_row[2]} - {session['username']}" if user_row else session['username']
+
+        thumbnail_path = item[7]
+        examples_path = item[10]
+        original_path = item[9]
+
+        # thumbnail upload
+        if thumb_file and thumb_file.filename:
+            # --- size check ---
+            try:
+                thumb_file.stream.seek(0, os.SEEK_END)
+                size = thumb_file.stream.tell()
+                thumb_file.stream.seek(0)
+            except Exception:
+                size = None
+
+            if size and size > MAX_FILE_SIZE:
+                flash_translated("flash.thumbnail_too_large", "error")
+                return redirect(request.url)
+
+            # --- extension/type check ---
+            if not allowed_file(thumb_file.filename):
+                flash_translated("flash.invalid_thumbnail", "error")
+                return redirect(request.url)
+
+            if not validate_image(thumb_file):
+                flash_translated("flash.invalid_thumbnail", "error")
+                return redirect(request.url)
+
+            # save with watermark + metadata
+            thumb_watermarked, thumb_original = process_uploaded_image(thumb_file, session['username'], prefix="thumb", author_name=author_name)
+            thumbnail_path = thumb_watermarked
+            original_path = thumb_original
+
+        # example images
+        if examples_files and examples_files[0].filename:
+            new_examples = []
+            for ex in examples_files:
+                if not validate_image(ex):
+                    flash_translated("flash.invalid_example_file", "error", filename=ex.filename)
+                    return redirect(request.url)
+
+                # size check
+                try:
+                    ex.stream.seek(0, os.SEEK_END)
+                    ex_size = ex.stream.tell()
+                    ex.stream.seek(0)
+                except Exception:
+                    ex_size = None
+
+                if ex_size and ex_size > MAX_FILE_SIZE:
+                    flash_translated("flash.ex_file_too_large", "error", ex=ex)
+                    return redirect(request.url)
+
+                ex_wm, ex_original = process_uploaded_image(ex, session['username'], prefix="example", author_name=author_name)
+                new_examples.append(ex_wm)
+
+            examples_path = ",".join(new_examples)
+
+        cursor.execute("""
+            UPDATE art
+            SET title = ?, description = ?, slots = ?, thumbnail_path = ?, examples_path = ?, original_path = ?
+            WHERE id = ?
+        """, (
+            new_title,
+            new_description,
+            new_slots,
+            thumbnail_path,
+            examples_path,
+            original_path,
+            art_id
+        ))
+        conn.commit()
+
+        flash_translated("flash.artwork_updated", "success")
+        return redirect(request.url)
+
+    return render_template(
+        "artEdit.html",
+        item=item,
+        examples_list=examples_list,
+        username=username,
+        max_file_size=MAX_FILE_SIZE,
+        allowed_extensions=list(ALLOWED_EXTENSIONS)
+    )
+
+@bp.route("/shop/<int:art_id>/buy", methods=["GET", "POST"])
+@login_required
+#TODO: comms chat
+#TODO: comms safe delivery  author to buyer
+def buy_art(art_id):
+
+    conn = get_db()
+    cursor = conn.cursor()
+
+    # Buyer's points, artwork and current ownership in one read
+    cursor.execute("""
+        SELECT art.price, art.author_id, art.title, buyer.bee_points,
+               EXISTS (SELECT 1 FROM art_ownership WHERE art_id = art.id AND owner_id = buyer.id)
+        FROM art, users AS buyer
+        WHERE art.id = ? AND buyer.id = ?
+    """, (art_id, g.user_id))
+    row = cursor.fetchone()
+    if not row:
+        flash_translated("flash.artwork_not_found", "error")
+        return redirect(url_for("shop.shop"))
+    price, author_id, title, user_points, owns = row
+
+    # Prevent author buying own art
+    if g.user_id == author_id:
+        flash_translated("flash.artwork_cannot_buy_own", "error")
+        return redirect(url_for("shop.art_detail", art_id=art_id))
+
+    if owns:
+        flash_translated("flash.already_owned", "info")
+        return redirect(url_for("shop.art_detail", art_id=art_id))
+
+    # GET -> show confirmation
+    if request.method == "GET":
+        if user_points < price:
+            flash_translated("flash.insufficient_points", "error")
+            return redirect(url_for("shop.art_detail", art_id=art_id))
+        return render_template(
+            "buy_confirm.html",
+            art_id=art_id,
+            title=title,
+            price=price,
+            user_points=user_points
+        )
+
+    # POST -> everything is re-checked inside the purchase transaction
+    try:
+        status = purchase_art(conn, g.user_id, art_id)
+    except sqlite3.Error as e:
+        print("Purchase failed:", e, file=sys.stderr)
+        status = "failed"
+
+    flash_key, category = PURCHASE_FLASH[status]
+    flash_translated(flash_key, category)
+    if status == "not_found":
+        return redirect(url_for("shop.shop"))
+    return redirect(url_for("shop.art_detail", art_id=art_id, owns=status in ("purchased", "already_owned")))
+
+@bp.route("/create_art", methods=["GET", "POST"])
+@login_required
+#TODO rozdelit for kids or not
+#TODO zmensit resolution for thumnail, preview
+def create_art():
+    if request.method == "POST":
+        username = session["username"]
+        
+        # --- Form data ---
+        title = request.form.get("title")
+        description = request.form.get("description")
+        price = int(request.form.get("price", 0))
+        thumb_file = request.files.get("thumb")
+        art_type = request.form.get("type")
+        if art_type == "commission":
+            tat = request.form.get("tat")
+            slots = request.form.get("slots")
+            examples_files = request.files.getlist("examples")
+        else:
+            tat = 1
+            slots = None
+            examples_files = []
+
+        if not thumb_file or not thumb_file.filename:
+            flash_translated("flash.thumbnail_required", "error")
+            return redirect(request.url)
+
+        if not validate_image(thumb_file):
+            flash_translated("flash.invalid_thumbnail", "error")
+            return redirect(request.url)
+
+        os.makedirs(os.path.join(STATIC_ROOT, UPLOAD_FOLDER), exist_ok=True)
+        os.makedirs(os.path.join(STATIC_ROOT, UPLOAD_FOLDER, THUMB_FOLDER), exist_ok=True)
+        os.makedirs(os.path.join(STATIC_ROOT, UPLOAD_FOLDER, EX_FOLDER), exist_ok=True)
+        os.makedirs(os.path.join(STATIC_ROOT, UPLOAD_FOLDER, ORIG_FOLDER), exist_ok=True)
+
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, name, surname FROM users WHERE id = ?", (g.user_id,))
+        user_row = cursor.fetchone()
+        if not user_row:
+            flash_translated("flash.user_not_found", "error")
+            return redirect(url_for("main.index"))
+        user_id = user_row[0]
+        author_name = f"{user_row[1]} {user_row[2]} - {username}"
+
+        # --- Helper to save + watermark + add metadata ---
+        def process_image(file, username, prefix="", save_original=True):
+            # thin wrapper used by create_art for backwards compatibility
+            return process_uploaded_image(file, username, prefix=prefix, save_original=save_original, author_name=author_name) 
+
+
+
+        # Thumbnail
+        thumb_watermarked, original_path = process_image(thumb_file, username, prefix="thumb")
+
+        # Example images
+        examples_paths = []
+        for ex in examples_files:
+            if ex.filename:
+                if not validate_image(ex):
+                    flash_translated("flash.invalid_example_file", "error", filename=ex.filename)
+                    return redirect(request.url)
+                ex_wm, ex_original = process_image(ex, username, prefix="example")
+                examples_paths.append(ex_wm)    
+
+        if len(examples_paths) > 5:
+            flash_translated("flash.too_many_examples", "error")
+            return redirect(request.url)
+
+        examples_paths_str = ",".join(examples_paths)
+
+        # --- Save to DB ---
+
+
+        user_id = user_row[0]
+        author_name = f"{user_row[1]} {user_row[2]} - {username}"
+
+        cursor.execute("""
+            INSERT INTO art 
+            (title, description, tat, price, type, slots,
+             thumbnail_path, preview_path, original_path,
+             examples_path, author_id, author_name)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            title, description, tat, price, art_type, slots,
+            thumb_watermarked, thumb_watermarked, original_path,
+            examples_paths_str, user_id, author_name
+        ))
+
+        conn.commit()
+
+        flash_translated("flash.artwork_created", "success")
+        return redirect("/shop")
+
+    return render_template("create_art.html")
@@ -0,0 +1,180 @@
+"""
+Drawing canvas rendering module
+Replays draw events onto a 1600x1200 image the same way draw.js paints them
+on the drawing canvas, so a room's old events can be folded into one PNG
+snapshot (see room_store). Pillow is imported inside the functions, workers
+that never compact a room do not load it.
+"""
+import io
+import math
+
+CANVAS_WIDTH = 1600    # BASE_WIDTH/BASE_HEIGHT in draw.js
+CANVAS_HEIGHT = 1200
+TRANSPARENT = (0, 0, 0, 0)
+PNG_COMPRESS_LEVEL = 1  # snapshots are rewritten often, speed over size
+
+
+def _hex_to_rgba(color):
+    """Bucket fill colour exactly as hexToRgba() in draw.js reads it"""
+    value = int(str(color).replace('#', ''), 16)
+    return ((value >> 16) & 255, (value >> 8) & 255, value & 255, 255)
+
+
+def _point(x, y):
+    return float(x) * CANVAS_WIDTH, float(y) * CANVAS_HEIGHT
+
+
+def _stroke(event):
+    from PIL import ImageColor
+    color = ImageColor.getcolor(str(event['color']), 'RGBA')
+    # lineWidth = width * (canvas.width / BASE_WIDTH), the canvas is always BASE_WIDTH wide
+    width = max(1, round(float(event['width'])))
+    return color, width
+
+
+def _line(draw, event):
+    color, width = _stroke(event)
+    start, end = _point(event['fromX'], event['fromY']), _point(event['toX'], event['toY'])
+    draw.line([start, end], fill=color, width=width)
+    if width > 2:
+        # lineCap = "round"
+        radius = width / 2
+        for x, y in (start, end):
+            draw.ellipse([x - radius, y - radius, x + radius, y + radius], fill=color)
+
+
+def _polyline(draw, event):
+    """stroke event: points = [x0, y0, x1, y1, ...], round caps and joins like strokePath()"""
+    color, width = _stroke(event)
+    flat = event['points']
+    points = [_point(flat[i], flat[i + 1]) for i in range(0, len(flat) - 1, 2)]
+    if len(points) < 2:
+        return
+    draw.line(points, fill=color, width=width, joint='curve')
+    if width > 2:
+        radius = width / 2
+        for x, y in (points[0], points[-1]):
+            draw.ellipse([x - radius, y - radius, x + radius, y + radius], fill=color)
+
+
+def _outline(draw, points, color, width):
+    """Closed path stroked on its centre line like ctx.stroke()"""
+    draw.line(points + [points[0]], fill=color, width=width, joint='curve')
+
+
+def _rectangle(draw, event):
+    color, width = _stroke(event)
+    (x1, y1), (x2, y2) = _point(event['fromX'], event['fromY']), _point(event['toX'], event['toY'])
+    left, top, right, bottom = min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)
+    _outline(draw, [(left, top), (right, top), (right, bottom), (left, bottom)], color, width)
+
+
+def _triangle(draw, event):
+    color, width = _stroke(event)
+    (x1, y1), (x2, y2) = _point(event['fromX'], event['fromY']), _point(event['toX'], event['toY'])
+    if x1 == x2 or y1 == y2:
+        # none of the branches in triangle() match, only the first edge is drawn
+        draw.line([(x1, y1), (x2, y2)], fill=color, width=width)
+        return
+    # the third corner mirrors (x1, y1) across x2 on the row of y1
+    third = (x2 + abs(x2 - x1) if x1 < x2 else x2 - abs(x2 - x1), y1)
+    _outline(draw, [(x1, y1), (x2, y2), third], color, width)
+
+
+def _circle(draw, event):
+    color, width = _stroke(event)
+    (x1, y1), (x2, y2) = _point(event['fromX'], event['fromY']), _point(event['toX'], event['toY'])
+    radius = math.hypot(x2 - x1, y2 - y1)
+    # PIL strokes inside the box, the canvas strokes centred on the arc
+    outer = radius + width / 2
+    draw.ellipse([x1 - outer, y1 - outer, x1 + outer, y1 + outer], outline=color, width=width)
+
+
+def _flood(mask, width, height, x, y):
+    """
+    4-connected fill over `mask` (bytes, 255 where the pixel has the target
+    colour) from (x, y). Works on whole horizontal runs with bytes.find, so
+    the Python loop runs once per run instead of once per pixel (the pixel
+    stack of bucketFill() in draw.js takes seconds in Python on a 1600x1200
+    canvas). Returns a bytearray with 255 on the filled pixels.
+    """
+    todo = bytearray(mask)
+    filled = bytearray(len(mask))
+    stack = [(x, y)]
+    while stack:
+        x, y = stack.pop()
+        row = y * width
+        if not todo[row + x]:
+            continue
+        left = todo.rfind(b'\x00', row, row + x) + 1 or row
+        right = todo.find(b'\x00', row + x, row + width)
+        if right < 0:
+            right = row + width
+        filled[left:right] = b'\xff' * (right - left)
+        todo[left:right] = bytes(right - left)
+        for ny in (y - 1, y + 1):
+            if not 0 <= ny < height:
+                continue
+            offset = (ny - y) * width
+            pos, end = left + offset, right + offset
+            while pos < end:
+                start = todo.find(b'\xff', pos, end)
+                if start < 0:
+                    break
+                stack.append((start - ny * width, ny))
+                pos = todo.find(b'\x00', start, end)
+                if pos < 0:
+                    break
+    return filled
+
+
+def _bucket(image, event):
+    from PIL import Image, ImageChops
+    x, y = _point(event['x'], event['y'])
+    x, y = math.floor(x), math.floor(y)
+    if not (0 <= x < CANVAS_WIDTH and 0 <= y < CANVAS_HEIGHT):
+        return
+    color = _hex_to_rgba(event['color'])
+    target = image.getpixel((x, y))
+    if target == color:
+        return
+    # pixels with exactly the target colour (colorsMatch with tolerance 0)
+    mask = None
+    for band, value in zip(image.split(), target):
+        band = band.point(lambda v, value=value: 255 if v == value else 0)
+        mask = band if mask is None else ImageChops.multiply(mask, band)
+    filled = _flood(mask.tobytes(), CANVAS_WIDTH, CANVAS_HEIGHT, x, y)
+    image.paste(color, mask=Image.frombytes('L', image.size, bytes(filled)))
+
+
+def render_events(events, base=None):
+    """
+    Paint draw events (dicts with 'type' line/stroke/rect/tri/circ/bucket/clear)
+    over the PNG `base` (bytes, None = empty canvas). Returns PNG bytes.
+    Events the client could not draw either (missing fields, bad colours)
+    are skipped.
+    """
+    from PIL import Image, ImageDraw
+
+    if base:
+        image = Image.open(io.BytesIO(base)).convert('RGBA')
+    else:
+        image = Image.new('RGBA', (CANVAS_WIDTH, CANVAS_HEIGHT), TRANSPARENT)
+    draw = ImageDraw.Draw(image)
+    shapes = {'line': _line, 'stroke': _polyline, 'rect': _rectangle, 'tri': _triangle, 'circ': _circle}
+
+    for event in events:
+        kind = event.get('type')
+        try:
+            if kind in shapes:
+                shapes[kind](draw, event)
+            elif kind == 'bucket':
+                _bucket(image, event)
+            elif kind == 'clear':
+                draw.rectangle([0, 0, CANVAS_WIDTH, CANVAS_HEIGHT], fill=TRANSPARENT)
+        except (KeyError, TypeError, ValueError):
+            continue
+
+    out = io.BytesIO()
+    image.save(out, format='PNG', compress_level=PNG_COMPRESS_LEVEL)
+    return out.getvalue()
@@ -0,0 +1,293 @@
+"""
+Database connection utility module
+Hands out pooled SQLite connections per request through flask.g
+and optionally records per-request SQL statistics
+"""
+import json
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+
+from flask import g, current_app, has_app_context, request
+
+DB_PATH = 'beevy.db'
+POOL_SIZE = 8           # matches the gunicorn --threads setting
+POOL_TIMEOUT = 10       # seconds to wait for a free connection
+BUSY_TIMEOUT_MS = 5000  # how long a writer waits for the lock before "database is locked"
+
+# Applied once when a pooled connection is opened, not on every request
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    "PRAGMA cache_size=-16000",      # ~16 MB page cache per connection
+    "PRAGMA mmap_size=67108864",     # 64 MB memory mapped reads
+    "PRAGMA temp_store=MEMORY",
+)
+
+
+sql_logger = logging.getLogger("beevy.sql")
+
+
+class QueryStats:
+    """SQL statements executed during one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        # normalised sql -> {"count": n, "ms": total, "params": set of parameter tuples}
+        self.statements = {}
+
+    def start(self, sql, params):
+        key = re.sub(r"\s+", " ", sql).strip()
+        entry = self.statements.setdefault(key, {"count": 0, "ms": 0.0, "params": set()})
+        entry["count"] += 1
+        try:
+            entry["params"].add(tuple(params) if not isinstance(params, dict) else tuple(sorted(params.items())))
+        except TypeError:
+            pass  # unhashable parameters, still counted
+        self.count += 1
+        return entry
+
+    def add_time(self, entry, ms):
+        entry["ms"] += ms
+        self.total_ms += ms
+
+    def n_plus_one(self, threshold=2):
+        """Same statement run repeatedly with different parameters (a lookup inside a loop)"""
+        return [
+            {"sql": sql, "count": e["count"], "ms": round(e["ms"], 3)}
+            for sql, e in self.statements.items()
+            if e["count"] >= threshold and len(e["params"]) > 1
+        ]
+
+    def duplicates(self):
+        """Same statement with the same parameters run more than once"""
+        return [
+            {"sql": sql, "count": e["count"]}
+            for sql, e in self.statements.items()
+            if e["count"] > 1 and len(e["params"]) == 1
+        ]
+
+    def as_dict(self):
+        return {
+            "queries": self.count,
+            "db_ms": round(self.total_ms, 3),
+            "n_plus_one": self.n_plus_one(),
+            "duplicates": self.duplicates(),
+        }
+
+
+def _current_stats():
+    if not has_app_context():
+        return None
+    return g.get("sql_stats")
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that times execute and fetch calls into the request's QueryStats"""
+
+    _entry = None
+
+    def _timed(self, method, *args):
+        stats = _current_stats()
+        if stats is None:
+            return method(*args)
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            if self._entry is not None:
+                stats.add_time(self._entry, (time.perf_counter() - started) * 1000)
+
+    def execute(self, sql, params=()):
+        stats = _current_stats()
+        self._entry = stats.start(sql, params) if stats is not None else None
+        return self._timed(super().execute, sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        stats = _current_stats()
+        self._entry = stats.start(sql, ("<many>",)) if stats is not None else None
+        return self._timed(super().executemany, sql, seq_of_params)
+
+    def fetchone(self):
+        return self._timed(super().fetchone)
+
+    def fetchmany(self, size=None):
+        if size is None:
+            return self._timed(super().fetchmany)
+        return self._timed(super().fetchmany, size)
+
+    def fetchall(self):
+        return self._timed(super().fetchall)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors record statistics while SQL_INSTRUMENTATION is on"""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+
+class PoolExhausted(RuntimeError):
+    """Raised when no connection became free within the pool timeout"""
+
+
+class ConnectionPool:
+    """
+    Bounded pool of SQLite connections shared by all request threads.
+
+    Connections are opened lazily up to max_size, configured with PRAGMAS once,
+    and handed back to the pool instead of being closed.
+    """
+
+    def __init__(self, db_path=DB_PATH, max_size=POOL_SIZE, timeout=POOL_TIMEOUT, factory=sqlite3.Connection):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.timeout = timeout
+        self.factory = factory
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._all = []
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            factory=self.factory,
+        )
+        setup = conn.cursor(sqlite3.Cursor)  # plain cursor, pragmas are not request queries
+        for pragma in PRAGMAS:
+            setup.execute(pragma)
+        setup.close()
+        with self._lock:
+            self._all.append(conn)
+        return conn
+
+    def acquire(self):
+        """Borrow a connection, opening a new one if the pool is not full yet"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolExhausted(f"No free database connection after {self.timeout}s")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn):
+        """Return a connection, rolling back anything the caller did not commit"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = None
+        except sqlite3.Error:
+            # broken connection, drop it and let the pool open a fresh one later
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+            with self._lock:
+                if conn in self._all:
+                    self._all.remove(conn)
+            self._slots.release()
+            return
+        self._idle.put(conn)
+        self._slots.release()
+
+    @property
+    def size(self):
+        """Number of connections currently opened by the pool"""
+        with self._lock:
+            return len(self._all)
+
+    def close_all(self):
+        """Close every connection the pool has opened"""
+        with self._lock:
+            conns, self._all = self._all, []
+        while True:
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                break
+        for conn in conns:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+
+def get_pool(app=None):
+    """Get the connection pool belonging to the (current) Flask app"""
+    app = app or current_app
+    return app.extensions['beevy_db_pool']
+
+
+def get_db():
+    """Get the connection for the current request, borrowing one on first use"""
+    if 'db' not in g:
+        g.db = get_pool().acquire()
+    return g.db
+
+
+def close_db(exception=None):
+    """Give the request connection back to the pool (teardown_appcontext)"""
+    conn = g.pop('db', None)
+    if conn is not None:
+        get_pool().release(conn)
+
+
+def start_sql_stats():
+    """Start collecting statistics for the current request (before_request)"""
+    g.sql_stats = QueryStats()
+
+
+def emit_sql_stats(response):
+    """Add a Server-Timing header and log one JSON line per request (after_request)"""
+    stats = g.pop("sql_stats", None)
+    if stats is None:
+        return response
+
+    summary = stats.as_dict()
+    timing = f'db;dur={summary["db_ms"]:.2f};desc="{summary["queries"]} queries"'
+    if summary["n_plus_one"]:
+        timing += f', db-n1;desc="{len(summary["n_plus_one"])} repeated statements"'
+    response.headers.add("Server-Timing", timing)
+
+    summary.update(method=request.method, path=request.path, endpoint=request.endpoint, status=response.status_code)
+    level = logging.WARNING if summary["n_plus_one"] else logging.INFO
+    sql_logger.log(level, json.dumps(summary))
+    return response
+
+
+def init_app(app):
+    """Create the pool for the app and register the request hooks"""
+    app.config.setdefault('DATABASE', os.environ.get('BEEVY_DATABASE', DB_PATH))
+    app.config.setdefault('DATABASE_POOL_SIZE', POOL_SIZE)
+    app.config.setdefault('SQL_INSTRUMENTATION', os.environ.get('BEEVY_SQL_INSTRUMENTATION') == '1')
+
+    instrumented = app.config['SQL_INSTRUMENTATION']
+    app.extensions['beevy_db_pool'] = ConnectionPool(
+        app.config['DATABASE'],
+        max_size=app.config['DATABASE_POOL_SIZE'],
+        factory=InstrumentedConnection if instrumented else sqlite3.Connection,
+    )
+    app.teardown_appcontext(close_db)
+    if instrumented:
+        app.before_request(start_sql_stats)
+        app.after_request(emit_sql_stats)
@@ -0,0 +1,144 @@
+"""
+Compact binary format of draw events
+Rooms keep their history packed like this (room_store, room_log), and
+clients that announce the format on join (draw_codec.js) send and receive
+events as binary Socket.IO frames instead of JSON.
+
+Every op starts with its sequence number (uint32) and type (uint8), all
+little endian:
+    line/rect/tri/circ  colour uint32, width uint16, fromX fromY toX toY uint16
+    stroke              colour uint32, width uint16, point count uint16, x y uint16 per point
+    bucket              colour uint32, x y uint16
+    clear               -
+Coordinates are quantised to uint16 over the normalised canvas (1/65535 of
+its size, well below a pixel), colours are RGBA as 0xRRGGBBAA and widths are
+in 1/16 px. A line is 19 bytes against ~120 as JSON. Ops are
+self-delimiting, so a history or a batch is simply their concatenation.
+"""
+import struct
+
+CODEC = 'bin1'
+COORD_MAX = 65535
+WIDTH_SCALE = 16
+
+_HEADER = struct.Struct('<IB')        # seq, type
+_SHAPE = struct.Struct('<IH4H')       # colour, width, fromX, fromY, toX, toY
+_STROKE = struct.Struct('<IHH')       # colour, width, point count
+_BUCKET = struct.Struct('<IHH')       # colour, x, y
+
+TYPES = {'line': 1, 'stroke': 2, 'rect': 3, 'tri': 4, 'circ': 5, 'bucket': 6, 'clear': 7}
+NAMES = {code: name for name, code in TYPES.items()}
+SHAPES = {'line', 'rect', 'tri', 'circ'}
+
+
+def _coord(value):
+    value = float(value)
+    if value != value:  # NaN
+        raise ValueError("coordinate is not a number")
+    # half up like Math.round() in draw_codec.js, round() would go to even
+    return int(min(max(value, 0.0), 1.0) * COORD_MAX + 0.5)
+
+
+def _color(value):
+    """'#rgb', '#rrggbb' or '#rrggbbaa' -> 0xRRGGBBAA"""
+    text = str(value).lstrip('#')
+    if len(text) == 3:
+        text = ''.join(c * 2 for c in text)
+    if len(text) == 6:
+        text += 'ff'
+    if len(text) != 8:
+        raise ValueError(f"unsupported colour: {value!r}")
+    return int(text, 16)
+
+
+def _width(value):
+    return min(max(int(float(value) * WIDTH_SCALE + 0.5), 0), 0xFFFF)
+
+
+def _color_text(value):
+    text = f"#{value:08x}"
+    return text[:7] if text.endswith('ff') else text
+
+
+def encode_event(event, seq=0):
+    """Pack a draw event dict. Raises ValueError for events that cannot be drawn."""
+    kind = event.get('type')
+    if kind not in TYPES:
+        raise ValueError(f"unknown draw event type: {kind!r}")
+    try:
+        head = _HEADER.pack(seq, TYPES[kind])
+        if kind in SHAPES:
+            return head + _SHAPE.pack(_color(event['color']), _width(event['width']),
+                                      _coord(event['fromX']), _coord(event['fromY']),
+                                      _coord(event['toX']), _coord(event['toY']))
+        if kind == 'stroke':
+            points = [_coord(v) for v in event['points']]
+            if len(points) % 2:
+                raise ValueError("stroke points must be x, y pairs")
+            return (head + _STROKE.pack(_color(event['color']), _width(event['width']), len(points) // 2)
+                    + struct.pack(f'<{len(points)}H', *points))
+        if kind == 'bucket':
+            return head + _BUCKET.pack(_color(event['color']), _coord(event['x']), _coord(event['y']))
+        return head
+    except (KeyError, TypeError, struct.error) as e:
+        raise ValueError(f"malformed {kind} event: {e}") from None
+
+
+def with_seq(op, seq):
+    """The op with its sequence number replaced"""
+    return _HEADER.pack(seq, op[4]) + op[5:]
+
+
+def op_seq(op):
+    return struct.unpack_from('<I', op)[0]
+
+
+def split_ops(data):
+    """Split concatenated ops into a list of single ops. Raises ValueError on truncated data."""
+    data = bytes(data)
+    ops, pos = [], 0
+    while pos < len(data):
+        if pos + _HEADER.size > len(data):
+            raise ValueError("truncated op header")
+        kind = NAMES.get(data[pos + 4])
+        end = pos + _HEADER.size
+        if kind in SHAPES:
+            end += _SHAPE.size
+        elif kind == 'stroke':
+            if end + _STROKE.size > len(data):
+                raise ValueError("truncated stroke")
+            end += _STROKE.size + 4 * _STROKE.unpack_from(data, end)[2]
+        elif kind == 'bucket':
+            end += _BUCKET.size
+        elif kind != 'clear':
+            raise ValueError(f"unknown op type {data[pos + 4]}")
+        if end > len(data):
+            raise ValueError("truncated op")
+        ops.append(data[pos:end])
+        pos = end
+    return ops
+
+
+def decode_op(op):
+    """Unpack one op into a draw event dict (with 'seq')"""
+    seq, code = _HEADER.unpack_from(op)
+    kind = NAMES[code]
+    event = {'type': kind, 'seq': seq}
+    body = _HEADER.size
+    if kind in SHAPES:
+        color, width, x0, y0, x1, y1 = _SHAPE.unpack_from(op, body)
+        event.update(color=_color_text(color), width=width / WIDTH_SCALE, fromX=x0 / COORD_MAX,
+                     fromY=y0 / COORD_MAX, toX=x1 / COORD_MAX, toY=y1 / COORD_MAX)
+    elif kind == 'stroke':
+        color, width, count = _STROKE.unpack_from(op, body)
+        points = struct.unpack_from(f'<{2 * count}H', op, body + _STROKE.size)
+        event.update(color=_color_text(color), width=width / WIDTH_SCALE,
+                     points=[v / COORD_MAX for v in points])
+    elif kind == 'bucket':
+        color, x, y = _BUCKET.unpack_from(op, body)
+        event.update(color=_color_text(color), x=x / COORD_MAX, y=y / COORD_MAX)
+    return event
+
+
+def decode_ops(ops):
+    return [decode_op(op) for op in ops]
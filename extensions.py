@@ -0,0 +1,10 @@
+"""
+Flask extensions shared by the app factory and the blueprints
+Created unbound here and attached to the app in create_app(), so blueprint
+modules can register handlers (e.g. @socketio.on) without importing app.py
+"""
+from flask_socketio import SocketIO
+from flask_wtf.csrf import CSRFProtect
+
+socketio = SocketIO()
+csrf = CSRFProtect()
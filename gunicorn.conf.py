@@ -0,0 +1,37 @@
+"""
+Gunicorn configuration (gunicorn -c gunicorn.conf.py app:app)
+
+Single worker (default): drawing rooms live in the worker's memory, the
+Socket.IO server needs no extra services. This is what the free Render plan runs.
+
+Multi-worker: set BEEVY_MESSAGE_QUEUE=redis://host:6379/0 (and `pip install redis`).
+Broadcasts go through the Redis message queue and the room history and
+membership are kept in Redis (room_store.py), so every worker sees every room
+and the number of workers follows the CPU count (WEB_CONCURRENCY overrides it).
+
+Sticky sessions: Socket.IO's long-polling transport sends each request of one
+connection separately, and gunicorn hands them to whichever worker is free, so
+a polling session breaks as soon as it hits a second worker. Gunicorn cannot
+route by session, so in multi-worker mode the client connects with the
+websocket transport only (SOCKETIO_WEBSOCKET_ONLY, see draw.js) and a
+connection then stays on its worker for its whole life. If clients must keep
+the polling fallback, run several single-worker gunicorns on separate ports
+behind a proxy with sticky sessions (nginx `ip_hash`, or a cookie based
+affinity on the load balancer) instead of raising `workers` here.
+"""
+import multiprocessing
+import os
+
+message_queue = os.environ.get("BEEVY_MESSAGE_QUEUE")
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+
+if message_queue:
+    workers = int(os.environ.get("WEB_CONCURRENCY") or multiprocessing.cpu_count())
+else:
+    # bez message queue by kazdy worker mel vlastni mistnosti
+    workers = 1
+    if int(os.environ.get("WEB_CONCURRENCY") or 1) > 1:
+        print("gunicorn.conf.py: WEB_CONCURRENCY ignored, set BEEVY_MESSAGE_QUEUE to run more than one worker")
@@ -0,0 +1,30 @@
+-- 001: indexes for the lookups every page view does
+-- Applied by scripts/init_db.py (tracked through PRAGMA user_version)
+
+-- login, load_logged_in_user, userPage, settings pages, recover
+CREATE UNIQUE INDEX IF NOT EXISTS idx_users_username ON users(username);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_users_email ON users(email);
+
+-- older databases could hold the same purchase twice, keep the first one
+DELETE FROM art_ownership
+WHERE id NOT IN (SELECT MIN(id) FROM art_ownership GROUP BY art_id, owner_id);
+
+-- user_owns_art, download_art, preview_art, buy_art
+CREATE UNIQUE INDEX IF NOT EXISTS idx_art_ownership_art_owner ON art_ownership(art_id, owner_id);
+-- owned list on userPage
+CREATE INDEX IF NOT EXISTS idx_art_ownership_owner ON art_ownership(owner_id, art_id);
+
+-- selling list on userPage, account deletion
+CREATE INDEX IF NOT EXISTS idx_art_author_active ON art(author_id, is_active);
+-- shop listing, covers every column the shop card shows
+CREATE INDEX IF NOT EXISTS idx_art_shop ON art(id, author_id, title, price, thumbnail_path) WHERE is_active = 1;
+
+-- join_room_page, draw
+CREATE UNIQUE INDEX IF NOT EXISTS idx_rooms_room_id ON rooms(room_ID);
+-- public / private room lists
+CREATE INDEX IF NOT EXISTS idx_rooms_public ON rooms(is_public, user_id);
+
+-- one preferences row per user
+DELETE FROM preferences
+WHERE id NOT IN (SELECT MIN(id) FROM preferences GROUP BY user_id);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_preferences_user ON preferences(user_id);
@@ -0,0 +1,59 @@
+-- 002: full text search, filter indexes and facet cache versioning for the shop
+-- Applied by scripts/init_db.py (tracked through PRAGMA user_version)
+
+-- external content FTS table over art, diacritics folded so "vcela" finds "včela"
+-- detail=column: search only needs per-column term hits, not positions (much smaller doclists)
+CREATE VIRTUAL TABLE IF NOT EXISTS art_fts USING fts5(
+    title, description, author_name,
+    content='art', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3',
+    detail=column
+);
+INSERT INTO art_fts(art_fts) VALUES ('rebuild');
+
+CREATE TRIGGER IF NOT EXISTS art_fts_insert AFTER INSERT ON art BEGIN
+    INSERT INTO art_fts(rowid, title, description, author_name)
+    VALUES (new.id, new.title, new.description, new.author_name);
+END;
+CREATE TRIGGER IF NOT EXISTS art_fts_delete AFTER DELETE ON art BEGIN
+    INSERT INTO art_fts(art_fts, rowid, title, description, author_name)
+    VALUES ('delete', old.id, old.title, old.description, old.author_name);
+END;
+CREATE TRIGGER IF NOT EXISTS art_fts_update AFTER UPDATE OF title, description, author_name ON art BEGIN
+    INSERT INTO art_fts(art_fts, rowid, title, description, author_name)
+    VALUES ('delete', old.id, old.title, old.description, old.author_name);
+    INSERT INTO art_fts(rowid, title, description, author_name)
+    VALUES (new.id, new.title, new.description, new.author_name);
+END;
+
+-- shop filters, one index per filter combination (all ordered for the sort they serve)
+-- type [+ price range], sorted by price
+CREATE INDEX IF NOT EXISTS idx_art_type_price ON art(type, price) WHERE is_active = 1;
+-- type, newest first (rowid is the implicit second column)
+CREATE INDEX IF NOT EXISTS idx_art_type ON art(type) WHERE is_active = 1;
+-- author [+ price range], sorted by price (author newest first uses idx_art_author_active)
+CREATE INDEX IF NOT EXISTS idx_art_author_price ON art(author_id, price) WHERE is_active = 1;
+-- price range only
+CREATE INDEX IF NOT EXISTS idx_art_price ON art(price) WHERE is_active = 1;
+
+-- bumped on every write that can change search results, facet caches compare against it
+CREATE TABLE IF NOT EXISTS art_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO art_version (id, version) VALUES (1, 0);
+
+CREATE TRIGGER IF NOT EXISTS art_version_insert AFTER INSERT ON art BEGIN
+    UPDATE art_version SET version = version + 1 WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS art_version_delete AFTER DELETE ON art BEGIN
+    UPDATE art_version SET version = version + 1 WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS art_version_update AFTER UPDATE ON art BEGIN
+    UPDATE art_version SET version = version + 1 WHERE id = 1;
+END;
+-- deleted authors disappear from the shop
+CREATE TRIGGER IF NOT EXISTS art_version_author_deleted AFTER UPDATE OF deleted ON users BEGIN
+    UPDATE art_version SET version = version + 1 WHERE id = 1;
+END;
@@ -0,0 +1,9 @@
+-- 003: lease row deciding which process runs the background scheduler
+-- Applied by scripts/init_db.py (tracked through PRAGMA user_version)
+
+-- one row per lease name, held by owner until expires_at (unix time) unless renewed
+CREATE TABLE IF NOT EXISTS scheduler_leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
@@ -0,0 +1,18 @@
+-- 004: persistent drawing room history (append-only op log + latest snapshot)
+-- Applied by scripts/init_db.py (tracked through PRAGMA user_version)
+
+-- every draw event of a room in order of its sequence number, op is the event packed by draw_codec.py;
+-- rows up to the room's snapshot or last clear are deleted once they are covered
+CREATE TABLE IF NOT EXISTS room_ops (
+    room_ID TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    op BLOB NOT NULL,
+    PRIMARY KEY (room_ID, seq)
+) WITHOUT ROWID;
+
+-- PNG (under static/uploads/canvas) holding every op of the room up to seq
+CREATE TABLE IF NOT EXISTS room_snapshots (
+    room_ID TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    path TEXT NOT NULL
+);
@@ -0,0 +1,14 @@
+-- 005: random shop order, one stored key per artwork (see load_shop_page in blueprints/shop.py)
+-- Applied by scripts/init_db.py (tracked through PRAGMA user_version)
+
+ALTER TABLE art ADD COLUMN shuffle_key INTEGER;
+UPDATE art SET shuffle_key = random() & 2147483647;
+
+-- new artworks get their key on insert, whichever code path adds them
+CREATE TRIGGER IF NOT EXISTS art_shuffle_key_insert AFTER INSERT ON art WHEN new.shuffle_key IS NULL BEGIN
+    UPDATE art SET shuffle_key = random() & 2147483647 WHERE id = new.id;
+END;
+
+-- shop feed keyset (shuffle_key, id), covers every column the shop card shows
+CREATE INDEX IF NOT EXISTS idx_art_shop_shuffle ON art(shuffle_key, id, author_id, title, price, thumbnail_path)
+    WHERE is_active = 1;
@@ -0,0 +1,4 @@
+-- 006: per-user profile version, bumped by every settings write (see load_logged_in_user in blueprints/main.py)
+-- Applied by scripts/init_db.py (tracked through PRAGMA user_version)
+
+ALTER TABLE users ADD COLUMN profile_version INTEGER NOT NULL DEFAULT 0;
@@ -0,0 +1,105 @@
+"""
+Drawing room broadcast module
+Without it every draw event is emitted to the room on its own, so a room
+with N drawers and M viewers sends N x M messages per mouse move. With
+DRAW_BATCH_RATE set (BEEVY_DRAW_BATCH_RATE, ticks per second) the events of
+each room are buffered and sent once per tick as one `draw_batch` message:
+one emit to the room that skips the senders, plus one per sender holding the
+other senders' events, so nobody gets their own strokes back.
+
+Clients using the binary format (draw_codec) sit in binary_room(room) instead
+of the room itself and get the packed ops concatenated in one binary frame.
+"""
+import atexit
+import sys
+import threading
+
+from flask import current_app
+
+
+def binary_room(room):
+    """Socket.IO room of the clients that receive a drawing room's ops packed"""
+    return f"{room}#bin"
+
+
+def fan_out(socketio, room, events, ops, skip_sid):
+    """Send events to the room's JSON clients and the same ops packed to its binary clients"""
+    socketio.emit('draw_batch', events, to=room, skip_sid=skip_sid)
+    socketio.emit('draw_batch', b''.join(ops), to=binary_room(room), skip_sid=skip_sid)
+
+
+class RoomBroadcaster:
+    """Buffers draw events per room and flushes them as draw_batch messages at most `rate` times a second"""
+
+    def __init__(self, socketio, rate):
+        self.socketio = socketio
+        self.interval = 1.0 / rate
+        self._lock = threading.Lock()
+        self._buffers = {}              # room -> [(sender sid, event, packed op, sender receives binary), ...]
+        self._wake = threading.Event()  # set while something is buffered, the thread sleeps otherwise
+        self._stop = threading.Event()
+        self._thread = None
+
+    def publish(self, room, sid, event, op, binary=False):
+        """
+        Queue an event (and its packed op) from `sid` for the room's next batch.
+        `binary` is the format `sid` receives in (it joined binary_room(room)),
+        whichever format it sent the event in.
+        """
+        with self._lock:
+            self._buffers.setdefault(room, []).append((sid, event, op, binary))
+            self._wake.set()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="room-broadcast", daemon=True)
+                self._thread.start()
+
+    def flush(self):
+        """Send everything buffered now. Returns the number of messages emitted."""
+        with self._lock:
+            buffers, self._buffers = self._buffers, {}
+            self._wake.clear()
+        sent = 0
+        for room, items in buffers.items():
+            senders = dict((sid, binary) for sid, _, _, binary in items)
+            fan_out(self.socketio, room, [item[1] for item in items], [item[2] for item in items], list(senders))
+            sent += 2
+            if len(senders) > 1:
+                for sender, binary in senders.items():
+                    others = [item for item in items if item[0] != sender]
+                    if binary:
+                        self.socketio.emit('draw_batch', b''.join(item[2] for item in others), to=sender)
+                    else:
+                        self.socketio.emit('draw_batch', [item[1] for item in others], to=sender)
+                    sent += 1
+        return sent
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait()
+            self._stop.wait(self.interval)  # collect one tick's worth of events
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"✗ Draw batch broadcast failed: {str(e)}", file=sys.stderr)
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+
+def get_broadcaster():
+    """Get the broadcaster of the current app, None when events are emitted one by one"""
+    return current_app.extensions.get('beevy_room_broadcaster')
+
+
+def init_app(app, socketio):
+    """Create the broadcaster when DRAW_BATCH_RATE is set"""
+    rate = float(app.config.get('DRAW_BATCH_RATE') or 0)
+    if rate > 0:
+        broadcaster = RoomBroadcaster(socketio, rate)
+        atexit.register(broadcaster.close)  # send the last tick
+        app.extensions['beevy_room_broadcaster'] = broadcaster
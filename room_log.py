@@ -0,0 +1,200 @@
+"""
+Persistent drawing room log module
+Every draw event is appended to the room_ops table (migrations/004_room_log.sql)
+with its sequence number, packed by draw_codec, and the room's latest snapshot is kept as a PNG in
+static/uploads/canvas, so rooms survive a restart.
+
+handle_draw only puts the event on a queue; a background thread writes the
+queue in batches, one transaction per batch (group commit), so a stroke
+segment costs one queue put on the hot path and the fsync is shared by every
+event that arrived in the same FLUSH_INTERVAL.
+"""
+import hashlib
+import os
+import queue
+import sqlite3
+import sys
+import threading
+
+from draw_codec import TYPES
+
+BATCH_SIZE = 500          # events per transaction at most
+FLUSH_INTERVAL = 0.05     # seconds the writer waits for more events before committing
+BUSY_TIMEOUT_MS = 5000
+
+CLEAR_TYPE = TYPES['clear']
+
+_STOP = object()
+
+
+class RoomLog:
+    """
+    Append-only op log of the drawing rooms in SQLite.
+
+    append(), save_snapshot() and clear() only queue the write; load() reads
+    what has been committed. Events up to a room's snapshot or last clear
+    are deleted, the log holds at most the events a joiner would replay.
+    """
+
+    def __init__(self, db_path, canvas_dir, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.db_path = db_path
+        self.canvas_dir = canvas_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    @staticmethod
+    def available(db_path):
+        """Whether the database has the room_ops table (004_room_log.sql applied)"""
+        try:
+            conn = sqlite3.connect(db_path)
+            try:
+                return conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'room_ops'"
+                ).fetchone() is not None
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            return False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _put(self, item):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="room-log-writer", daemon=True)
+                    self._thread.start()
+        self._queue.put(item)
+
+    def append(self, room, seq, op):
+        """Queue a packed op with its sequence number in the room"""
+        self._put(('op', room, seq, op))
+
+    def clear(self, room, seq, op):
+        """Queue a packed clear op, everything before it is deleted"""
+        self._put(('clear', room, seq, op))
+
+    def save_snapshot(self, room, seq, image):
+        """Queue the room's snapshot (PNG bytes covering every event up to seq)"""
+        self._put(('snapshot', room, seq, image))
+
+    def flush(self):
+        """Wait until everything queued so far is written"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    def snapshot_path(self, room):
+        # room IDs come from the client, never use them as a file name directly
+        return os.path.join(self.canvas_dir, hashlib.sha256(room.encode()).hexdigest()[:32] + '.png')
+
+    def load(self, room):
+        """
+        Read a room back: (snapshot PNG or None, packed ops after it, last seq).
+        Ops are returned from the last clear on, like the live room.
+        """
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT seq, path FROM room_snapshots WHERE room_ID = ?", (room,)).fetchone()
+            snapshot, since = None, 0
+            if row is not None:
+                try:
+                    with open(row[1], 'rb') as f:
+                        snapshot, since = f.read(), row[0]
+                except OSError as e:
+                    print(f"✗ Room snapshot missing: {str(e)}", file=sys.stderr)
+            rows = conn.execute(
+                "SELECT op FROM room_ops WHERE room_ID = ? AND seq > ? ORDER BY seq", (room, since)
+            ).fetchall()
+            last = conn.execute(
+                "SELECT MAX(seq) FROM (SELECT MAX(seq) AS seq FROM room_ops WHERE room_ID = ? "
+                "UNION ALL SELECT seq FROM room_snapshots WHERE room_ID = ?)", (room, room)
+            ).fetchone()[0] or 0
+        finally:
+            conn.close()
+
+        ops = []
+        for (op,) in rows:
+            if op[4] == CLEAR_TYPE:
+                snapshot, ops = None, []
+            else:
+                ops.append(op)
+        return snapshot, ops, last
+
+    def _run(self):
+        conn = None
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < self.batch_size and batch[-1] is not _STOP:
+                    try:
+                        batch.append(self._queue.get(timeout=self.flush_interval))
+                    except queue.Empty:
+                        break
+                items = [item for item in batch if item is not _STOP]
+                if items:
+                    if conn is None:
+                        conn = self._connect()
+                    self._write(conn, items)
+            except (sqlite3.Error, OSError) as e:
+                print(f"✗ Room log write failed ({len(batch)} events dropped): {str(e)}", file=sys.stderr)
+                if conn is not None:
+                    conn.rollback()
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if batch[-1] is _STOP:
+                if conn is not None:
+                    conn.close()
+                return
+
+    def _write(self, conn, items):
+        ops, stale = [], []
+        with conn:
+            for kind, room, seq, payload in items:
+                if kind == 'op':
+                    ops.append((room, seq, payload))
+                    continue
+                # keep the order: the ops before a snapshot or clear are written first
+                conn.executemany("INSERT OR IGNORE INTO room_ops (room_ID, seq, op) VALUES (?, ?, ?)", ops)
+                ops = []
+                if kind == 'clear':
+                    conn.execute("INSERT OR IGNORE INTO room_ops (room_ID, seq, op) VALUES (?, ?, ?)",
+                                 (room, seq, payload))
+                    conn.execute("DELETE FROM room_ops WHERE room_ID = ? AND seq < ?", (room, seq))
+                    stale += conn.execute("DELETE FROM room_snapshots WHERE room_ID = ? RETURNING path",
+                                          (room,)).fetchall()
+                    continue
+                row = conn.execute("SELECT seq FROM room_snapshots WHERE room_ID = ?", (room,)).fetchone()
+                if row is not None and row[0] >= seq:
+                    continue
+                path = self.snapshot_path(room)
+                os.makedirs(self.canvas_dir, exist_ok=True)
+                with open(path + '.tmp', 'wb') as f:
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(path + '.tmp', path)
+                conn.execute("INSERT OR REPLACE INTO room_snapshots (room_ID, seq, path) VALUES (?, ?, ?)",
+                             (room, seq, path))
+                conn.execute("DELETE FROM room_ops WHERE room_ID = ? AND seq <= ?", (room, seq))
+            conn.executemany("INSERT OR IGNORE INTO room_ops (room_ID, seq, op) VALUES (?, ?, ?)", ops)
+        # a snapshot written again in the same batch after a clear keeps its file
+        for (path,) in stale:
+            if not conn.execute("SELECT 1 FROM room_snapshots WHERE path = ?", (path,)).fetchone():
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,658 @@
+"""
+Drawing room state module
+Keeps the stroke history and the connected sids of every drawing room.
+
+MemoryRoomStore lives inside one process and is used by default. With several
+gunicorn workers every worker needs the same view of a room, so the state is
+kept in Redis instead (RedisRoomStore, BEEVY_ROOM_STORE or BEEVY_MESSAGE_QUEUE
+set to a redis:// URL); the Socket.IO message queue relays the broadcasts
+between the workers, see create_app() and gunicorn.conf.py
+
+History is bounded: once a room has more than MAX_HISTORY events the older
+ones are painted into a PNG snapshot (canvas_utils.render_events) and only
+the last HISTORY_TAIL stay as events, so a joiner gets one image plus a
+short tail. A "clear" event drops the room's history and snapshot.
+
+Events are kept packed (draw_codec, ~20 bytes per op instead of a dict),
+each with the next sequence number of its room. In memory a room's ops sit
+back to back in one bytearray (OpList) rather than one object per op, see
+scripts/bench_room_store.py. With the room log (room_log.py, migration 004)
+they are also written to SQLite and a room is read back from there the first
+time it is used after a restart, or after RoomEvictor dropped it from memory
+for being idle.
+"""
+import atexit
+import bisect
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+
+from flask import current_app
+
+from draw_codec import decode_ops, encode_event, op_seq, with_seq
+from room_log import RoomLog
+
+KEY_PREFIX = 'beevy:'
+MAX_HISTORY = 1000        # events kept per room before compacting
+HISTORY_TAIL = 200        # events left after compacting, the rest goes into the snapshot
+COMPACT_LOCK_TTL = 60     # seconds, a crashed worker cannot block compaction for longer
+EVICT_INTERVAL = 30       # seconds between checks for idle rooms
+EVICT_MIN_IDLE = 30       # seconds a room is kept after its last use even over the memory budget
+
+
+class OpList:
+    """
+    Packed ops of one room stored back to back in a bytearray, with an
+    array of their start offsets. An op costs its ~20 bytes plus 4 for the
+    offset, a list of bytes objects would add ~40 more per op.
+    """
+
+    __slots__ = ('_data', '_starts')
+
+    def __init__(self, ops=()):
+        self._data = bytearray()
+        self._starts = array('I')
+        for op in ops:
+            self.append(op)
+
+    def append(self, op):
+        self._starts.append(len(self._data))
+        self._data += op
+
+    def __len__(self):
+        return len(self._starts)
+
+    def _end(self, i):
+        return self._starts[i + 1] if i + 1 < len(self._starts) else len(self._data)
+
+    def __getitem__(self, index):
+        """One op as bytes, or a list of them for a slice"""
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("op index out of range")
+        return bytes(self._data[self._starts[index]:self._end(index)])
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def seq(self, index):
+        """Sequence number of one op, without copying it out"""
+        return struct.unpack_from('<I', self._data, self._starts[index])[0]
+
+    def index_after(self, seq):
+        """Index of the first op numbered after `seq`"""
+        return bisect.bisect_right(range(len(self)), seq, key=self.seq)
+
+    def drop(self, count):
+        """Remove the first `count` ops"""
+        if count >= len(self):
+            self._data, self._starts = bytearray(), array('I')
+        elif count > 0:
+            cut = self._starts[count]
+            del self._data[:cut]
+            self._starts = array('I', (start - cut for start in self._starts[count:]))
+
+    def tobytes(self):
+        """All ops concatenated, as sent to binary clients"""
+        return bytes(self._data)
+
+    @property
+    def nbytes(self):
+        return len(self._data) + self._starts.itemsize * len(self._starts)
+
+
+class _RoomState:
+    """One room of a MemoryRoomStore, guarded by its own lock"""
+
+    __slots__ = ('lock', 'ops', 'snapshot', 'epoch', 'seq', 'known', 'compacting', 'evicted', 'used')
+
+    def __init__(self, lock):
+        self.lock = lock
+        self.ops = OpList()
+        self.snapshot = None
+        self.epoch = 0            # bumped by clear(), a compaction started before it is dropped
+        self.seq = 0              # last sequence number
+        self.known = False        # drawn in, cleared or restored from the log
+        self.compacting = False
+        self.evicted = False      # dropped by evict_idle(), a writer holding it must look the room up again
+        self.used = time.monotonic()
+
+    def nbytes(self):
+        return self.ops.nbytes + len(self.snapshot or b'')
+
+
+class MemoryRoomStore:
+    """
+    Room state in a dict of this process, for a single worker.
+
+    Every room has its own lock, so draw events of different rooms never wait
+    for each other; the dict of rooms is only locked to add or evict a room
+    and membership has a lock of its own.
+
+    `loader(room) -> (snapshot, ops, last seq)` (RoomLog.load) reads back a
+    room that was evicted while a writer waited for it, so its numbering
+    continues instead of starting over.
+    """
+
+    def __init__(self, loader=None):
+        self.loader = loader
+        self._rooms = {}                      # room -> _RoomState
+        self._rooms_lock = threading.Lock()
+        self._members_lock = threading.Lock()
+        self._members = {}
+        self._rooms_of = {}
+
+    def _room_lock(self):
+        return threading.Lock()
+
+    def _get(self, room):
+        """The room's state for reading, None for a room without state"""
+        state = self._rooms.get(room)
+        if state is not None:
+            state.used = time.monotonic()
+        return state
+
+    def _acquire(self, room):
+        """The room's state with its lock acquired (the caller releases it), created when missing"""
+        evicted = False
+        while True:
+            state = self._rooms.get(room)
+            if state is None:
+                with self._rooms_lock:
+                    state = self._rooms.get(room)
+                    if state is None:
+                        state = self._rooms[room] = _RoomState(self._room_lock())
+            state.lock.acquire()
+            if not state.evicted:
+                if evicted and not state.known and self.loader is not None:
+                    # dropped while we waited: read it back, or seq would start over at 1
+                    snapshot, ops, seq = self.loader(room)
+                    state.known, state.seq, state.snapshot, state.ops = True, seq, snapshot, OpList(ops)
+                state.used = time.monotonic()
+                return state
+            state.lock.release()
+            evicted = True
+
+    def append(self, room, op):
+        """
+        Add a packed op to the end of the room's history under the room's
+        next sequence number. Returns (seq, history length).
+        """
+        state = self._acquire(room)
+        try:
+            state.seq += 1
+            state.known = True
+            state.ops.append(with_seq(op, state.seq))
+            return state.seq, len(state.ops)
+        finally:
+            state.lock.release()
+
+    def history(self, room):
+        """Get the room's packed ops since the snapshot, oldest first"""
+        state = self._get(room)
+        if state is None:
+            return []
+        with state.lock:
+            return list(state.ops)
+
+    def state(self, room, limit=None):
+        """Get (snapshot PNG or None, packed ops drawn after it) of the room, only the first `limit` ops if given"""
+        state = self._get(room)
+        if state is None:
+            return None, []
+        with state.lock:
+            return state.snapshot, state.ops[:limit]
+
+    def ops_after(self, room, seq, limit):
+        """
+        Get up to `limit` packed ops numbered after `seq`. Returns None when
+        the ops right after `seq` are gone (compacted into the snapshot or
+        cleared), the caller has to start over from state().
+        """
+        state = self._get(room)
+        if state is None:
+            return []
+        with state.lock:
+            ops = state.ops
+            if not ops:
+                return None if state.seq > seq else []
+            if ops.seq(0) > seq + 1:
+                return None
+            start = ops.index_after(seq)
+            return ops[start:start + limit]
+
+    def last_seq(self, room):
+        """The room's latest sequence number, 0 for a new room"""
+        state = self._get(room)
+        return 0 if state is None else state.seq
+
+    def clear(self, room):
+        """Drop the room's history and snapshot. Returns the clear's sequence number."""
+        state = self._acquire(room)
+        try:
+            state.ops = OpList()
+            state.snapshot = None
+            state.epoch += 1
+            state.seq += 1
+            state.known = True
+            return state.seq
+        finally:
+            state.lock.release()
+
+    def known(self, room):
+        """Whether the room has state here (drawn in, or restored from the log)"""
+        state = self._get(room)
+        return state is not None and state.known
+
+    def restore(self, room, snapshot, ops, seq):
+        """Load a room read from the log unless it has state already. Returns whether it was loaded."""
+        state = self._acquire(room)
+        try:
+            if state.known:
+                return False
+            state.known = True
+            state.seq = seq
+            state.snapshot = snapshot
+            state.ops = OpList(ops)
+            return True
+        finally:
+            state.lock.release()
+
+    def compact(self, room, keep, render):
+        """
+        Paint all but the last `keep` ops onto the snapshot with
+        render(snapshot, ops) -> PNG and drop them. Rendering runs outside
+        the lock; events appended meanwhile stay in the tail. Returns False
+        when there is nothing to do or another thread is compacting the room.
+        """
+        state = self._get(room)
+        if state is None:
+            return False
+        with state.lock:
+            folded = state.ops[:max(len(state.ops) - keep, 0)]
+            if not folded or state.compacting or state.evicted:
+                return False
+            state.compacting = True
+            base, epoch = state.snapshot, state.epoch
+        try:
+            image = render(base, folded)
+            with state.lock:
+                if state.epoch != epoch:
+                    return False
+                state.snapshot = image
+                state.ops.drop(len(folded))
+                return True
+        finally:
+            with state.lock:
+                state.compacting = False
+
+    def join(self, room, sid):
+        self._get(room)  # counts as use
+        with self._members_lock:
+            self._members.setdefault(room, set()).add(sid)
+            self._rooms_of.setdefault(sid, set()).add(room)
+
+    def leave_all(self, sid):
+        """Remove a disconnected sid from every room. Returns the rooms it was in."""
+        with self._members_lock:
+            rooms = self._rooms_of.pop(sid, set())
+            for room in rooms:
+                members = self._members.get(room)
+                if members is not None:
+                    members.discard(sid)
+                    if not members:
+                        del self._members[room]
+        for room in rooms:
+            self._get(room)  # idle from now on if it was the last member
+        return rooms
+
+    def member_count(self, room):
+        with self._members_lock:
+            return len(self._members.get(room, ()))
+
+    def usage(self):
+        """Memory held per room: {room: {'ops', 'bytes', 'members', 'idle' (seconds since last use)}}"""
+        now = time.monotonic()
+        with self._rooms_lock:
+            rooms = list(self._rooms.items())
+        usage = {}
+        for room, state in rooms:
+            with state.lock:
+                usage[room] = {'ops': len(state.ops), 'bytes': state.nbytes(),
+                               'members': self.member_count(room), 'idle': now - state.used}
+        return usage
+
+    def evict_idle(self, idle_after, budget, min_idle=EVICT_MIN_IDLE, now=None):
+        """
+        Drop rooms nobody is connected to: every room unused for `idle_after`
+        seconds and, while all rooms together hold more than `budget` bytes,
+        the least recently used ones unused for `min_idle`. The rooms must be
+        persisted (RoomLog flushed); load_room reads them back on next use.
+        Returns the evicted rooms.
+        """
+        now = time.monotonic() if now is None else now
+        with self._rooms_lock:
+            rooms = sorted(self._rooms.items(), key=lambda item: item[1].used)
+        total = sum(state.nbytes() for _, state in rooms)
+        evicted = []
+        for room, state in rooms:
+            if now - state.used < min(min_idle, idle_after):
+                break  # least recently used first, the rest is newer
+            if self.member_count(room):
+                continue
+            with state.lock:
+                idle = now - state.used  # again under the lock, a writer may have just used it
+                if state.compacting or not (idle >= idle_after or (total > budget and idle >= min_idle)):
+                    continue
+                state.evicted = True
+                with self._rooms_lock:
+                    del self._rooms[room]
+            total -= state.nbytes()
+            evicted.append(room)
+        return evicted
+
+
+class RedisRoomStore:
+    """
+    Room state in Redis, shared by all workers and nodes.
+
+    History is a list of packed ops per room next to a PNG snapshot key,
+    membership a set of sids per room plus a set of rooms per sid for cleanup
+    on disconnect. `client` is a redis.Redis (or anything with the same
+    string, list and set commands).
+    """
+
+    # the sequence number and the push happen in one step, so the list stays in seq order
+    # across workers; the number replaces the first 4 bytes of the packed op (draw_codec)
+    APPEND_SCRIPT = """
+    local seq = redis.call('INCR', KEYS[1])
+    return {seq, redis.call('RPUSH', KEYS[2], struct.pack('<I4', seq) .. string.sub(ARGV[1], 5))}
+    """
+    # epoch, delete and the clear's number in one step: an append lands wholly before
+    # (and is dropped) or after (and numbered after the clear)
+    CLEAR_SCRIPT = """
+    redis.call('INCR', KEYS[1])
+    redis.call('DEL', KEYS[2], KEYS[3])
+    return redis.call('INCR', KEYS[4])
+    """
+    # counter, snapshot and ops in one step, so no append ends up between the restored ops;
+    # RPUSH in batches because Lua's unpack() is limited to a few thousand values
+    RESTORE_SCRIPT = """
+    if not redis.call('SET', KEYS[1], ARGV[1], 'NX') then
+        return 0
+    end
+    if ARGV[2] ~= '' then
+        redis.call('SET', KEYS[2], ARGV[2])
+    end
+    for i = 3, #ARGV, 1000 do
+        redis.call('RPUSH', KEYS[3], unpack(ARGV, i, math.min(i + 999, #ARGV)))
+    end
+    return 1
+    """
+    # the epoch compare, the new snapshot and the trim in one step, so a clear either
+    # comes first (nothing is written) or after (it wipes the compacted room)
+    COMPACT_SCRIPT = """
+    if (redis.call('GET', KEYS[1]) or '') ~= ARGV[1] then
+        return 0
+    end
+    redis.call('SET', KEYS[2], ARGV[2])
+    redis.call('LTRIM', KEYS[3], ARGV[3], -1)
+    return 1
+    """
+
+    def __init__(self, client, prefix=KEY_PREFIX):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, prefix=KEY_PREFIX):
+        import redis  # optional dependency, only needed for multi-worker mode
+        return cls(redis.Redis.from_url(url), prefix=prefix)
+
+    def _key(self, *parts):
+        return self.prefix + ':'.join(parts)
+
+    def append(self, room, op):
+        """
+        Add a packed op to the end of the room's history under the room's
+        next sequence number. Returns (seq, history length).
+        """
+        seq, length = self.client.eval(self.APPEND_SCRIPT, 2, self._key('room', room, 'seq'),
+                                       self._key('room', room, 'history'), op)
+        return int(seq), length
+
+    def history(self, room):
+        """Get the room's packed ops since the snapshot, oldest first"""
+        return self.client.lrange(self._key('room', room, 'history'), 0, -1)
+
+    def state(self, room, limit=None):
+        """Get (snapshot PNG or None, packed ops drawn after it) of the room, only the first `limit` ops if given"""
+        # history first: a compaction in between repeats a few events instead of losing them
+        history = self.client.lrange(self._key('room', room, 'history'), 0, -1 if limit is None else limit - 1)
+        return self.client.get(self._key('room', room, 'snapshot')), history
+
+    def ops_after(self, room, seq, limit):
+        """
+        Get up to `limit` packed ops numbered after `seq`. Returns None when
+        the ops right after `seq` are gone (compacted into the snapshot or
+        cleared), the caller has to start over from state().
+        """
+        key = self._key('room', room, 'history')
+        first = self.client.lindex(key, 0)
+        if first is None:
+            return None if self.last_seq(room) > seq else []
+        if op_seq(first) > seq + 1:
+            return None
+        # the list holds consecutive numbers, so the position follows from the first one
+        start = seq - op_seq(first) + 1
+        ops = self.client.lrange(key, start, start + limit - 1)
+        if not ops or op_seq(ops[0]) != seq + 1:
+            # trimmed in between, or a gap left by an op the log could not read back: look the slow way
+            ops = self.client.lrange(key, 0, -1)
+            if not ops or op_seq(ops[0]) > seq + 1:
+                return None
+            ops = [op for op in ops if op_seq(op) > seq][:limit]
+        return ops
+
+    def last_seq(self, room):
+        """The room's latest sequence number, 0 for a new room"""
+        return int(self.client.get(self._key('room', room, 'seq')) or 0)
+
+    def clear(self, room):
+        """Drop the room's history and snapshot. Returns the clear's sequence number."""
+        return int(self.client.eval(self.CLEAR_SCRIPT, 4, self._key('room', room, 'epoch'),
+                                    self._key('room', room, 'history'), self._key('room', room, 'snapshot'),
+                                    self._key('room', room, 'seq')))
+
+    def known(self, room):
+        """Whether the room has state here (drawn in, or restored from the log)"""
+        return bool(self.client.exists(self._key('room', room, 'seq')))
+
+    def restore(self, room, snapshot, ops, seq):
+        """Load a room read from the log unless it has state already. Returns whether it was loaded."""
+        # the first worker to set the counter loads the room, the others see it as known
+        return bool(self.client.eval(self.RESTORE_SCRIPT, 3, self._key('room', room, 'seq'),
+                                     self._key('room', room, 'snapshot'), self._key('room', room, 'history'),
+                                     seq, snapshot or b'', *ops))
+
+    def compact(self, room, keep, render):
+        """
+        Paint all but the last `keep` ops onto the snapshot with
+        render(snapshot, ops) -> PNG and trim them from the list. One
+        worker compacts a room at a time (SET NX lock key).
+        """
+        lock = self._key('room', room, 'compacting')
+        if not self.client.set(lock, b'1', nx=True, ex=COMPACT_LOCK_TTL):
+            return False
+        try:
+            history_key, epoch_key = self._key('room', room, 'history'), self._key('room', room, 'epoch')
+            snapshot_key = self._key('room', room, 'snapshot')
+            # epoch first: a clear after this point makes the script refuse the write
+            epoch = self.client.get(epoch_key)
+            count = self.client.llen(history_key) - keep
+            if count <= 0:
+                return False
+            folded = self.client.lrange(history_key, 0, count - 1)
+            image = render(self.client.get(snapshot_key), folded)
+            return bool(self.client.eval(self.COMPACT_SCRIPT, 3, epoch_key, snapshot_key, history_key,
+                                         epoch or b'', image, count))
+        finally:
+            self.client.delete(lock)
+
+    def join(self, room, sid):
+        self.client.sadd(self._key('room', room, 'members'), sid)
+        self.client.sadd(self._key('sid', sid, 'rooms'), room)
+
+    def leave_all(self, sid):
+        """Remove a disconnected sid from every room. Returns the rooms it was in."""
+        key = self._key('sid', sid, 'rooms')
+        rooms = {room.decode() if isinstance(room, bytes) else room for room in self.client.smembers(key)}
+        for room in rooms:
+            self.client.srem(self._key('room', room, 'members'), sid)
+        self.client.delete(key)
+        return rooms
+
+    def member_count(self, room):
+        return self.client.scard(self._key('room', room, 'members'))
+
+    def usage(self):
+        """Rooms live in Redis, not in this worker's memory (see MEMORY USAGE in Redis)"""
+        return {}
+
+
+def create_room_store(url=None):
+    """Create the store for `url`: None keeps rooms in this process, redis:// shares them"""
+    if not url:
+        return MemoryRoomStore()
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisRoomStore.from_url(url)
+    raise ValueError(f"Unsupported room store URL: {url}")
+
+
+def load_room(store, log, room):
+    """Read the room back from the log the first time the store sees it (e.g. after a restart)"""
+    if log is not None and not store.known(room):
+        store.restore(room, *log.load(room))
+
+
+def record_event(store, room, event, log=None):
+    """
+    Store a draw event, compacting the room once its history grows past
+    MAX_HISTORY. A clear event resets the room instead of being stored.
+    With a RoomLog the op and new snapshots are persisted. Sets event['seq']
+    and returns the packed op; raises ValueError for events the canvas
+    cannot draw (draw_codec.encode_event).
+    """
+    op = encode_event(event)
+    load_room(store, log, room)
+    if event.get('type') == 'clear':
+        seq = store.clear(room)
+        op = with_seq(op, seq)
+        if log is not None:
+            log.clear(room, seq, op)
+        event['seq'] = seq
+        return op
+    seq, length = store.append(room, op)
+    op = with_seq(op, seq)
+    if log is not None:
+        log.append(room, seq, op)
+    event['seq'] = seq
+    if length > MAX_HISTORY:
+        from canvas_utils import render_events
+        rendered = []
+
+        def render(base, ops):
+            rendered.append((op_seq(ops[-1]), render_events(decode_ops(ops), base)))
+            return rendered[-1][1]
+
+        if store.compact(room, HISTORY_TAIL, render) and log is not None:
+            log.save_snapshot(room, *rendered[-1])
+    return op
+
+
+class RoomEvictor:
+    """
+    Background thread that drops idle rooms of a MemoryRoomStore every
+    EVICT_INTERVAL seconds (MemoryRoomStore.evict_idle), so a long running
+    worker only keeps the rooms in use. Their ops are in the RoomLog, the
+    log is flushed before each pass.
+    """
+
+    def __init__(self, store, log, idle_after, budget, interval=EVICT_INTERVAL):
+        self.store = store
+        self.log = log
+        self.idle_after = idle_after
+        self.budget = budget
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self):
+        """One pass. Returns the evicted rooms."""
+        self.log.flush()
+        evicted = self.store.evict_idle(self.idle_after, self.budget)
+        if evicted:
+            print(f"✓ Evicted {len(evicted)} idle drawing rooms")
+        return evicted
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"✗ Room eviction failed: {str(e)}", file=sys.stderr)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="room-evictor", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def get_room_store():
+    """Get the room store of the current app"""
+    return current_app.extensions['beevy_room_store']
+
+
+def get_room_log():
+    """Get the room log of the current app, None when rooms are not persisted"""
+    return current_app.extensions.get('beevy_room_log')
+
+
+def init_app(app):
+    """
+    Create the room store and, once migration 004 is applied, the room log
+    for the app. With both an in-process store and the log, idle rooms are
+    evicted after ROOM_IDLE_TIMEOUT seconds (BEEVY_ROOM_IDLE_TIMEOUT, 0 = never)
+    or earlier when the rooms hold more than ROOM_MEMORY_BUDGET bytes
+    (BEEVY_ROOM_MEMORY_MB).
+    """
+    url = app.config.get('ROOM_STORE_URL') or app.config.get('SOCKETIO_MESSAGE_QUEUE')
+    app.extensions['beevy_room_store'] = create_room_store(url)
+
+    app.config.setdefault('ROOM_LOG_ENABLED', os.environ.get('BEEVY_ROOM_LOG', '1') != '0')
+    if app.config['ROOM_LOG_ENABLED'] and RoomLog.available(app.config['DATABASE']):
+        log = RoomLog(app.config['DATABASE'], os.path.join(app.config['UPLOAD_ROOT'], 'canvas'))
+        atexit.register(log.close)  # write out what is still queued
+        app.extensions['beevy_room_log'] = log
+
+    app.config.setdefault('ROOM_IDLE_TIMEOUT', float(os.environ.get('BEEVY_ROOM_IDLE_TIMEOUT', 600)))
+    app.config.setdefault('ROOM_MEMORY_BUDGET', int(float(os.environ.get('BEEVY_ROOM_MEMORY_MB', 256)) * 2**20))
+    store, log = app.extensions['beevy_room_store'], app.extensions.get('beevy_room_log')
+    # without the log an evicted room would be lost, so rooms then stay in memory
+    if isinstance(store, MemoryRoomStore) and log is not None and app.config['ROOM_IDLE_TIMEOUT'] > 0:
+        store.loader = log.load
+        evictor = RoomEvictor(store, log, app.config['ROOM_IDLE_TIMEOUT'], app.config['ROOM_MEMORY_BUDGET'])
+        evictor.start()
+        atexit.register(evictor.close)
+        app.extensions['beevy_room_evictor'] = evictor
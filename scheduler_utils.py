@@ -0,0 +1,185 @@
+"""
+Scheduler leader election module
+Every gunicorn worker imports app.py and creates the scheduler, but only the
+process holding the lease row in scheduler_leases (migrations/003_scheduler_lease.sql)
+runs its jobs; the others keep it paused and take over when the lease expires
+"""
+import atexit
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+LEASE_NAME = 'scheduler'
+LEASE_TTL = 60          # seconds a lease is valid without renewal
+RENEW_INTERVAL = 20     # seconds between renewals, well inside the TTL
+BUSY_TIMEOUT_MS = 5000
+
+
+class LeaderLease:
+    """
+    Lease row in SQLite that at most one owner holds at a time.
+
+    acquire() takes a free or expired lease, or renews one this owner already
+    holds. The check and the write run in one BEGIN IMMEDIATE transaction, so
+    two processes can never both see the lease as free.
+    """
+
+    def __init__(self, db_path, name=LEASE_NAME, owner=None, ttl=LEASE_TTL):
+        self.db_path = db_path
+        self.name = name
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.ttl = ttl
+        self.expires_at = 0.0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        return conn
+
+    def acquire(self, now=None):
+        """Take or renew the lease. Returns True while this owner holds it."""
+        now = time.time() if now is None else now
+        try:
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute(
+                    "SELECT owner, expires_at FROM scheduler_leases WHERE name = ?", (self.name,)
+                ).fetchone()
+                if row is not None and row[0] != self.owner and row[1] > now:
+                    conn.execute("ROLLBACK")
+                    return False
+                conn.execute(
+                    "INSERT INTO scheduler_leases (name, owner, expires_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at",
+                    (self.name, self.owner, now + self.ttl)
+                )
+                conn.execute("COMMIT")
+                self.expires_at = now + self.ttl
+                return True
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            # database busy or not migrated yet: keep a lease we still hold, never take a new one
+            print(f"✗ Scheduler lease check failed: {str(e)}", file=sys.stderr)
+            return self.expires_at > now
+
+    def held(self, now=None):
+        """Whether this owner's lease is still valid as of its last renewal"""
+        return self.expires_at > (time.time() if now is None else now)
+
+    def release(self):
+        """Give the lease up so another process can take over right away"""
+        self.expires_at = 0.0
+        try:
+            conn = self._connect()
+            try:
+                conn.execute("DELETE FROM scheduler_leases WHERE name = ? AND owner = ?", (self.name, self.owner))
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            pass  # the lease simply expires
+
+
+class LeaderElection:
+    """
+    Background thread that keeps trying to hold a LeaderLease.
+
+    on_elected() runs when this process becomes the leader, on_deposed() when
+    it loses the lease (for example after a long stall) or stops.
+    """
+
+    def __init__(self, lease, on_elected, on_deposed, interval=RENEW_INTERVAL):
+        self.lease = lease
+        self.on_elected = on_elected
+        self.on_deposed = on_deposed
+        self.interval = interval
+        self.is_leader = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def check(self):
+        """One election round; returns whether this process is the leader"""
+        leader = self.lease.acquire()
+        if leader and not self.is_leader:
+            self.is_leader = True
+            print(f"✓ Scheduler leader: {self.lease.owner}", file=sys.stderr)
+            self.on_elected()
+        elif not leader and self.is_leader:
+            self.is_leader = False
+            print(f"✗ Scheduler lease lost: {self.lease.owner}", file=sys.stderr)
+            self.on_deposed()
+        return self.is_leader
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.check()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="scheduler-election", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.is_leader:
+            self.is_leader = False
+            self.on_deposed()
+        self.lease.release()
+
+
+def daily_backup_job(lease, media_root, db_path):
+    """Runs every day at 2 AM, snapshots the app's database (app.config['DATABASE'])"""
+    if not lease.held():
+        return  # lease lost since the last renewal, the new leader runs it
+    from backup_utils import snapshot_database, prune_snapshots
+    try:
+        # the upload tree goes with the database, art rows point at files in it
+        success, manifest_path, message = snapshot_database(db_path=db_path, media_root=media_root)
+        if success:
+            print(f"✓ Daily snapshot completed: {message}", file=sys.stderr)
+            # Keep a week of daily and two months of weekly snapshots
+            removed, prune_msg = prune_snapshots(keep_daily=7, keep_weekly=8)
+            print(f"✓ {prune_msg}", file=sys.stderr)
+        else:
+            print(f"✗ Daily snapshot failed: {message}", file=sys.stderr)
+    except Exception as e:
+        print(f"✗ Backup job error: {str(e)}", file=sys.stderr)
+
+
+def init_scheduler(app):
+    """
+    Create the APScheduler for the app, paused, and join the leader election.
+
+    APScheduler and the backup code are only imported here, so processes
+    running with SCHEDULER_ENABLED off (tests, scripts) never load them.
+    Returns the LeaderElection.
+    """
+    from flask_apscheduler import APScheduler
+
+    app.config['SCHEDULER_API_ENABLED'] = True
+    scheduler = APScheduler()
+    lease = LeaderLease(app.config['DATABASE'])
+
+    scheduler.init_app(app)
+    scheduler.add_job(
+        func=daily_backup_job,
+        args=(lease, app.config['UPLOAD_ROOT'], app.config['DATABASE']),
+        trigger='cron',
+        hour=2,
+        minute=0,
+        id='daily_backup',
+        name='Daily Database Snapshot'
+    )
+    election = LeaderElection(lease, on_elected=scheduler.resume, on_deposed=scheduler.pause)
+    scheduler.start(paused=True)
+    election.start()
+    atexit.register(election.stop)
+    app.extensions['beevy_scheduler'] = election
+    return election
@@ -0,0 +1,113 @@
+"""
+Drawing room history benchmark: memory per op and append throughput.
+
+Compares the room history kept as JSON-shaped dicts (as sent to clients),
+as a list of packed ops and as OpList (what MemoryRoomStore keeps), then
+appends from many threads at once with per-room locks and with one lock
+shared by all rooms.
+
+Usage: python scripts/bench_room_store.py [ops] [threads] [rooms]   (default 200000 200 50)
+"""
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from draw_codec import decode_op, encode_event, op_seq, with_seq  # noqa: E402
+from room_store import MemoryRoomStore, OpList  # noqa: E402
+
+
+class GlobalLockRoomStore(MemoryRoomStore):
+    """Every room shares one lock, as with a single lock around all room state"""
+
+    def __init__(self):
+        super().__init__()
+        self._shared_lock = threading.Lock()
+
+    def _room_lock(self):
+        return self._shared_lock
+
+
+def make_events(count):
+    rng = random.Random(42)
+    events = []
+    for _ in range(count):
+        x, y = rng.random(), rng.random()
+        events.append({"type": "line", "fromX": x, "fromY": y, "toX": x + rng.random() / 100,
+                       "toY": y + rng.random() / 100, "color": "#%06x" % rng.randrange(1 << 24),
+                       "width": rng.randint(1, 40)})
+    return events
+
+
+def measure(build):
+    """Bytes allocated by build() that stay alive with its result"""
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def bench(count):
+    events = make_events(count)
+    ops = [encode_event(event, seq) for seq, event in enumerate(events, 1)]
+
+    _, dict_bytes = measure(lambda: [decode_op(op) for op in ops])
+    _, list_bytes = measure(lambda: [with_seq(op, op_seq(op)) for op in ops])  # new objects, as appended
+    _, oplist_bytes = measure(lambda: OpList(ops))
+    for name, size in (("dicts", dict_bytes), ("list of ops", list_bytes), ("OpList", oplist_bytes)):
+        print(f"{name:>12}: {size / count:7.1f} B/op, {size / 2**20:7.1f} MiB for {count} ops")
+
+    store = MemoryRoomStore()
+    started = time.perf_counter()
+    for op in ops:
+        store.append("bench", op)
+    elapsed = time.perf_counter() - started
+    print(f"{'append':>12}: {count / elapsed:9.0f} ops/s ({elapsed / count * 1e6:.2f} us/op)")
+
+    started = time.perf_counter()
+    for event in events:
+        encode_event(event)
+    elapsed = time.perf_counter() - started
+    print(f"{'encode':>12}: {count / elapsed:9.0f} ops/s ({elapsed / count * 1e6:.2f} us/op)")
+
+
+def append_from_threads(store, op, per_thread, threads, rooms):
+    """Ops per second of `threads` threads appending at once, thread n drawing in room n % rooms"""
+    barrier = threading.Barrier(threads + 1)
+
+    def drawer(n):
+        room = f"room-{n % rooms}"
+        barrier.wait()
+        for _ in range(per_thread):
+            store.append(room, op)
+
+    workers = [threading.Thread(target=drawer, args=(n,)) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    appended = sum(store.last_seq(f"room-{r}") for r in range(rooms))
+    assert appended == per_thread * threads, "lost ops"
+    return appended / elapsed
+
+
+def bench_threads(count, threads, rooms, runs=3):
+    op = encode_event(make_events(1)[0])
+    for store_class in (MemoryRoomStore, GlobalLockRoomStore):
+        best = max(append_from_threads(store_class(), op, count // threads, threads, rooms) for _ in range(runs))
+        print(f"{store_class.__name__:>20}: {best:9.0f} ops/s with {threads} threads in {rooms} rooms (best of {runs})")
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    bench(count)
+    bench_threads(count, int(sys.argv[2]) if len(sys.argv) > 2 else 200, int(sys.argv[3]) if len(sys.argv) > 3 else 50)
@@ -0,0 +1,134 @@
+"""
+Shop search benchmark on a synthetic catalogue.
+
+Usage: python scripts/bench_search.py [size] [catalogue.db]   (default 500000)
+Builds the catalogue in a temporary file (or in catalogue.db, which is reused
+on the next run) and prints the median and worst time per query shape.
+The target is < 20 ms for every shape.
+"""
+import itertools
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from scripts.init_db import create_schema, apply_migrations  # noqa: E402
+from db_utils import ConnectionPool  # noqa: E402
+from search_utils import FacetCache, search_art  # noqa: E402
+
+AUTHORS = 5000
+# common words first, the long tail follows a Zipf distribution like real titles
+WORDS = [
+    "bee", "včela", "hive", "honey", "flower", "garden", "sunset", "forest", "river", "city",
+    "portrait", "dragon", "cat", "dog", "fox", "owl", "moon", "star", "ocean", "mountain",
+    "pixel", "sketch", "ink", "watercolor", "neon", "retro", "cozy", "dark", "bright", "tiny",
+] + [f"word{i}" for i in range(20000)]
+CUM_WEIGHTS = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(WORDS))))
+RUNS = 25
+
+
+def build_catalogue(path, size, seed=1):
+    rng = random.Random(seed)
+    create_schema(path)
+    conn = sqlite3.connect(str(path))
+    conn.executemany(
+        "INSERT INTO users (username, email, password, dob, deleted) VALUES (?, ?, 'x', '2000-01-01', ?)",
+        ((f"artist{i}", f"artist{i}@example.com", int(i % 100 == 0)) for i in range(AUTHORS)),
+    )
+
+    def rows():
+        for i in range(size):
+            author = rng.randrange(AUTHORS) + 1
+            yield (
+                f"artist{author - 1}",
+                " ".join(rng.choices(WORDS, cum_weights=CUM_WEIGHTS, k=3)),
+                " ".join(rng.choices(WORDS, cum_weights=CUM_WEIGHTS, k=10)),
+                rng.randint(1, 500),
+                "commission" if rng.random() < 0.2 else "art",
+                author,
+                int(rng.random() > 0.05),
+            )
+
+    conn.executemany(
+        """INSERT INTO art (author_name, title, description, tat, price, type, thumbnail_path, author_id, is_active)
+           VALUES (?, ?, ?, 1, ?, ?, 'uploads/shop/thumbs/bench.png', ?, ?)""",
+        rows(),
+    )
+    conn.commit()
+    conn.close()
+
+    # migrating the filled database builds the search index in one pass, like on a live upgrade
+    apply_migrations(path)
+    conn = sqlite3.connect(str(path))
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+SHAPES = {
+    "text rare": dict(q="word1234"),
+    "text two words": dict(q="word7 word8"),
+    "text common": dict(q="bee"),
+    "text prefix": dict(q="drag"),
+    "text relevance": dict(q="bee", sort="relevance"),
+    "text common, newest": dict(q="honey", sort="newest"),
+    "text common, price": dict(q="honey", sort="price_asc"),
+    "text + type + price": dict(q="forest", art_type="commission", min_price=100, max_price=200),
+    "text + author": dict(q="cat", author="artist42"),
+    "type": dict(art_type="commission"),
+    "type, price desc": dict(art_type="art", sort="price_desc"),
+    "type + price range": dict(art_type="art", min_price=50, max_price=60),
+    "price range, newest": dict(min_price=10, max_price=20),
+    "author": dict(author="artist7"),
+    "author + price, newest": dict(author="artist7", min_price=100),
+    "newest": dict(),
+}
+
+
+def time_ms(fn):
+    started = time.perf_counter()
+    fn()
+    return (time.perf_counter() - started) * 1000
+
+
+def run(path):
+    pool = ConnectionPool(str(path), max_size=1)  # same pragmas as the app
+    conn = pool.acquire()
+    worst = 0.0
+    for name, kwargs in SHAPES.items():
+        times = [time_ms(lambda: search_art(conn, **kwargs)) for _ in range(RUNS)]
+        worst = max(worst, max(times[1:]))
+        print(f"{name:<24} median {statistics.median(times):6.2f} ms  max {max(times[1:]):6.2f} ms")
+
+    cache = FacetCache()
+    cold = time_ms(lambda: cache.get(conn))
+    warm = time_ms(lambda: cache.get(conn))
+    print(f"{'facets':<24} cold {cold:6.2f} ms  cached {warm:6.2f} ms")
+    pool.release(conn)
+    pool.close_all()
+    print(f"worst search {worst:.2f} ms")
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    if len(sys.argv) > 2:
+        path = Path(sys.argv[2])
+        if not path.exists():
+            build_catalogue(path, size)
+        run(path)
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "beevy.db"
+        started = time.perf_counter()
+        build_catalogue(path, size)
+        print(f"built {size} artworks in {time.perf_counter() - started:.1f}s")
+        run(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Shop feed benchmark: time per page and HTML size as the catalogue grows.
+
+Usage: python scripts/bench_shop.py [sizes...]   (default 500 20000 200000)
+"""
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from flask import Flask, render_template_string  # noqa: E402
+from app import load_shop_page  # noqa: E402
+from db_utils import get_pool, init_app  # noqa: E402
+from scripts.init_db import create_schema, apply_migrations  # noqa: E402
+
+PAGES = 20
+CARD = "{% for item in items %}<a href='/shop/{{ item[0] }}'><h3>{{ item[1] }}</h3>{{ item[2] }} {{ item[4] }}<img src='{{ item[3] }}'></a>{% endfor %}"
+
+
+def build_db(path, size):
+    create_schema(path)
+    apply_migrations(path)
+    conn = sqlite3.connect(str(path))
+    conn.execute("INSERT INTO users (username, email, password, dob) VALUES ('bench', 'bench@x', 'x', '2000-01-01')")
+    conn.executemany(
+        """INSERT INTO art (author_name, title, tat, price, type, thumbnail_path, author_id, is_active)
+           VALUES ('bench', ?, 1, ?, 'digital', 'uploads/shop/thumbs/bench.png', 1, ?)""",
+        ((f"Art {i}", i % 500, int(i % 10 != 0)) for i in range(size)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def bench(size):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "beevy.db"
+        build_db(db_path, size)
+
+        bench_app = Flask(__name__)
+        bench_app.config["DATABASE"] = str(db_path)
+        init_app(bench_app)
+        with bench_app.app_context():
+            cursor, html_bytes = None, 0
+            started = time.perf_counter()
+            for _ in range(PAGES):
+                items, cursor = load_shop_page(seed=424242, cursor=cursor)
+                html_bytes += len(render_template_string(CARD, items=items))
+            elapsed = time.perf_counter() - started
+        get_pool(bench_app).close_all()
+
+    print(f"{size:>8} artworks: {elapsed / PAGES * 1000:6.2f} ms/page, {html_bytes // PAGES:6d} B/page")
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [500, 20000, 200000]
+    for size in sizes:
+        bench(size)
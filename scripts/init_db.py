@@ -1,9 +1,11 @@
 import sqlite3
+from datetime import datetime
 from pathlib import Path
 import shutil
 
 DB_PRIMARY_PATH = Path("/var/data/beevy.db")
 DB_FALLBACK_PATH = Path("beevy.db")
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "migrations"
 
 
 def ensure_db_link(target: Path) -> None:
@@ -119,10 +121,56 @@ def create_schema(db_path: Path) -> None:
     conn.close()
 
 
+def pending_migrations(conn: sqlite3.Connection) -> list:
+    """Migration files (NNN_name.sql) newer than the database's user_version."""
+    current = conn.execute("PRAGMA user_version").fetchone()[0]
+    pending = []
+    for path in sorted(MIGRATIONS_DIR.glob("[0-9][0-9][0-9]_*.sql")):
+        version = int(path.name[:3])
+        if version > current:
+            pending.append((version, path))
+    return pending
+
+
+def apply_migrations(db_path: Path) -> list:
+    """Apply pending migrations in order, each in its own transaction.
+
+    Returns the names of the applied migration files.
+    """
+    conn = sqlite3.connect(str(db_path))
+    applied = []
+    try:
+        for version, path in pending_migrations(conn):
+            sql = path.read_text(encoding="utf-8")
+            try:
+                conn.executescript(
+                    f"BEGIN;\n{sql}\nPRAGMA user_version = {version};\nCOMMIT;"
+                )
+            except sqlite3.Error:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+            applied.append(path.name)
+    finally:
+        conn.close()
+    return applied
+
+
+def log_migrations(db_path: Path, applied: list) -> None:
+    log_path = MIGRATIONS_DIR / "migration_log.txt"
+    with open(log_path, "a", encoding="utf-8") as fh:
+        for name in applied:
+            fh.write(f"{datetime.now().isoformat()} - Applied {name} to {db_path}\n")
+
+
 def main() -> None:
     db_path = DB_PRIMARY_PATH if DB_PRIMARY_PATH.parent.exists() else DB_FALLBACK_PATH
     ensure_db_link(DB_PRIMARY_PATH)
     create_schema(db_path)
+    applied = apply_migrations(db_path)
+    if applied:
+        log_migrations(db_path, applied)
+        print(f"Applied migrations: {', '.join(applied)}")
     print(f"Database ready at: {db_path}")
 
 
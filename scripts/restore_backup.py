@@ -0,0 +1,67 @@
+"""
+Restore an incremental database snapshot.
+
+Usage:
+    python scripts/restore_backup.py                       list snapshots
+    python scripts/restore_backup.py latest beevy.db       restore the newest snapshot
+    python scripts/restore_backup.py <snapshot> <dest.db>  restore a given snapshot
+    python scripts/restore_backup.py latest beevy.db static/uploads
+                                                           restore the database and its uploads
+
+Stop the app before restoring over the live beevy.db. The file is rebuilt
+chunk by chunk next to the destination and only replaces it once every
+checksum matches. Uploads are restored into the given folder; files that
+are already there with the right content are not copied again.
+Snapshots are taken daily by the scheduler in app.py.
+"""
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from backup_utils import get_snapshots_list, read_snapshot_manifest, restore_media, restore_snapshot  # noqa: E402
+
+
+def list_snapshots():
+    names = get_snapshots_list()
+    if not names:
+        print("No snapshots yet")
+        return
+    for name in names:
+        manifest = read_snapshot_manifest(name)
+        media = manifest.get('media')
+        media_info = f"  {media['files']} media files" if media else ""
+        print(f"{name}  {manifest['size'] / (1024*1024):8.2f} MB  "
+              f"{len(manifest['chunks']):5d} chunks  {manifest['new_chunks']:5d} new  {manifest['created']}{media_info}")
+
+
+def main(argv):
+    if not argv:
+        list_snapshots()
+        return 0
+    if len(argv) not in (2, 3):
+        print(__doc__)
+        return 2
+
+    name, dest, media_dest = argv[0], argv[1], argv[2] if len(argv) == 3 else None
+    if name == "latest":
+        names = get_snapshots_list()
+        if not names:
+            print("No snapshots to restore")
+            return 1
+        name = names[0]
+
+    success, _, message = restore_snapshot(name, dest)
+    print(message)
+    if success and media_dest is not None:
+        if not read_snapshot_manifest(name).get('media'):
+            print(f"{name} has no media")
+            return 1
+        success, _, message = restore_media(name, media_dest)
+        print(message)
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,236 @@
+"""
+Shop search utility module
+Full text search over art_fts (migrations/002_art_search.sql), filters on
+type, price range and author, and shop facet counts cached until the next art write.
+Artworks of deleted accounts are deactivated on deletion, so filtering runs on
+art alone and users are only joined for the page being shown
+"""
+import re
+import threading
+
+SEARCH_PAGE_SIZE = 30
+MAX_QUERY_TERMS = 8
+MIN_PREFIX_LENGTH = 3
+
+# Sorting a text search by relevance or price needs every match, which for a
+# common word is a good part of the catalogue. Those sorts therefore work on the
+# newest matches only, so a common word costs the same as a rare one.
+SEARCH_WINDOW = 2000
+
+# sort name -> ORDER BY over the art filter indexes in 002_art_search.sql
+SORTS = {
+    "newest": "art.id DESC",
+    "price_asc": "art.price ASC, art.id ASC",
+    "price_desc": "art.price DESC, art.id DESC",
+}
+# sort name -> ORDER BY over the candidate window of a text search
+WINDOW_SORTS = {
+    "newest": None,  # matches already come newest first
+    "price_asc": "price ASC, id ASC",
+    "price_desc": "price DESC, id DESC",
+    "relevance": None,  # ranked in relevance_order()
+}
+# Relevance weight of a hit per FTS column (description hits score 0).
+# bm25() would need a pass over the full doclist of every term for its IDF,
+# which alone costs more than the whole search for a common word.
+RELEVANCE_WEIGHTS = (("title", 10), ("author_name", 2))
+
+# (label, lower bound, upper bound or None)
+PRICE_BUCKETS = (
+    ("0-49", 0, 49),
+    ("50-99", 50, 99),
+    ("100-249", 100, 249),
+    ("250+", 250, None),
+)
+
+
+def fts_query(text, prefix=False):
+    """
+    Turn user input into a safe FTS5 query.
+
+    Every word is quoted and all of them must match. With prefix=True the last
+    word also matches as a prefix ("drak" finds "drakem").
+    Returns None when there is nothing to search for.
+    """
+    terms = re.findall(r"\w+", text or "")[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    if prefix and len(terms[-1]) >= MIN_PREFIX_LENGTH:
+        quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def resolve_match(conn, text):
+    """
+    FTS5 query for a search text: whole words, or a prefix search when the
+    whole words match nothing (someone typed half a word).
+
+    Prefix queries merge the doclists of every word they expand to, so they
+    are only used when the cheap query finds nothing.
+    """
+    exact = fts_query(text)
+    if exact is None:
+        return None
+    prefixed = fts_query(text, prefix=True)
+    if prefixed == exact:
+        return exact
+    found = conn.execute("SELECT 1 FROM art_fts WHERE art_fts MATCH ? LIMIT 1", (exact,)).fetchone()
+    return exact if found else prefixed
+
+
+def build_filters(art_type=None, min_price=None, max_price=None, author=None):
+    """WHERE clauses and parameters for the art filters"""
+    where, params = ["art.is_active = 1"], []
+    if art_type:
+        where.append("art.type = ?")
+        params.append(art_type)
+    if min_price is not None:
+        where.append("art.price >= ?")
+        params.append(min_price)
+    if max_price is not None:
+        where.append("art.price <= ?")
+        params.append(max_price)
+    if author:
+        where.append("art.author_id = (SELECT id FROM users WHERE username = ?)")
+        params.append(author)
+    return where, params
+
+
+def search_ids(conn, q=None, art_type=None, min_price=None, max_price=None, author=None,
+               sort="newest", limit=SEARCH_PAGE_SIZE, offset=0):
+    """
+    Ids of one page of matching artworks, in order.
+
+    Only art columns are touched here, so every filter combination is answered
+    from one of the filter indexes without reading the artwork rows.
+    """
+    where, params = build_filters(art_type, min_price, max_price, author)
+    match = resolve_match(conn, q)
+
+    if not match:
+        if sort not in SORTS:
+            sort = "newest"
+        sql = f"""
+            SELECT art.id FROM art
+            WHERE {" AND ".join(where)}
+            ORDER BY {SORTS[sort]}
+            LIMIT ? OFFSET ?
+        """
+        return [row[0] for row in conn.execute(sql, params + [limit, offset])]
+
+    if sort not in WINDOW_SORTS:
+        sort = "relevance"
+    if author:
+        # one author has few artworks, check each of them against the index
+        source, newest = "art CROSS JOIN art_fts ON art_fts.rowid = art.id", "art.id DESC"
+    else:
+        # walk the matches newest first straight from the FTS doclists
+        source, newest = "art_fts JOIN art ON art.id = art_fts.rowid", "art_fts.rowid DESC"
+    candidates = f"""
+        SELECT art.id AS id, art.price AS price
+        FROM {source}
+        WHERE art_fts MATCH ? AND {" AND ".join(where)}
+        ORDER BY {newest}
+        LIMIT ?
+    """
+    if sort == "newest":
+        rows = conn.execute(candidates + " OFFSET ?", [match] + params + [limit, offset])
+        return [row[0] for row in rows]
+    if sort == "relevance":
+        ids = [row[0] for row in conn.execute(candidates, [match] + params + [SEARCH_WINDOW])]
+        return relevance_order(conn, match, ids)[offset:offset + limit]
+
+    sql = f"SELECT id FROM ({candidates}) ORDER BY {WINDOW_SORTS[sort]} LIMIT ? OFFSET ?"
+    return [row[0] for row in conn.execute(sql, [match] + params + [SEARCH_WINDOW, limit, offset])]
+
+
+def relevance_order(conn, match, ids):
+    """
+    Order candidate ids (newest first) by where the search words were found:
+    title hits first, then author name hits, then description only hits.
+    """
+    if not ids:
+        return []
+    score = dict.fromkeys(ids, 0)
+    oldest = min(ids)
+    for column, weight in RELEVANCE_WEIGHTS:
+        rows = conn.execute(
+            "SELECT rowid FROM art_fts WHERE art_fts MATCH ? AND rowid >= ?",
+            (f"{{{column}}} : ({match})", oldest)
+        )
+        for (art_id,) in rows:
+            if art_id in score:
+                score[art_id] += weight
+    return sorted(ids, key=lambda art_id: (-score[art_id], -art_id))
+
+
+def search_art(conn, q=None, art_type=None, min_price=None, max_price=None, author=None,
+               sort="newest", limit=SEARCH_PAGE_SIZE, offset=0):
+    """
+    Search active artworks.
+
+    Returns rows shaped like the shop listing:
+    (id, title, price, thumbnail_path, author username, author deleted)
+    """
+    ids = search_ids(conn, q, art_type, min_price, max_price, author, sort, limit, offset)
+    if not ids:
+        return []
+    placeholders = ",".join("?" * len(ids))
+    rows = conn.execute(f"""
+        SELECT art.id, art.title, art.price, art.thumbnail_path, users.username, users.deleted
+        FROM art
+        JOIN users ON art.author_id = users.id
+        WHERE art.id IN ({placeholders}) AND users.deleted = 0
+    """, ids).fetchall()
+    position = {art_id: i for i, art_id in enumerate(ids)}
+    return sorted(rows, key=lambda row: position[row[0]])
+
+
+def art_version(conn):
+    """Counter bumped by triggers on every art write"""
+    row = conn.execute("SELECT version FROM art_version WHERE id = 1").fetchone()
+    return row[0] if row else 0
+
+
+def compute_facets(conn):
+    """Active artwork counts per type and per price bucket"""
+    types = dict(conn.execute(
+        "SELECT type, COUNT(*) FROM art WHERE is_active = 1 GROUP BY type"
+    ).fetchall())
+
+    bucket_sql = " ".join(
+        f"WHEN price <= {upper} THEN '{label}'" for label, _, upper in PRICE_BUCKETS if upper is not None
+    )
+    last_label = PRICE_BUCKETS[-1][0]
+    counts = dict(conn.execute(
+        f"SELECT CASE {bucket_sql} ELSE '{last_label}' END, COUNT(*) FROM art WHERE is_active = 1 GROUP BY 1"
+    ).fetchall())
+    prices = {label: counts.get(label, 0) for label, _, _ in PRICE_BUCKETS}
+
+    return {"total": sum(types.values()), "types": types, "prices": prices}
+
+
+class FacetCache:
+    """
+    Facet counts of the whole shop, valid until art_version changes.
+
+    Counting the catalogue touches every active artwork, so it is done once
+    after each art write instead of on every search page.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._facets = None
+
+    def get(self, conn):
+        version = art_version(conn)
+        with self._lock:
+            if version == self._version:
+                return self._facets
+
+        facets = compute_facets(conn)
+        with self._lock:
+            self._version, self._facets = version, facets
+        return facets
@@ -3,13 +3,45 @@ const canvas = document.getElementById('drawCanvas');
 toolBtns = document.querySelectorAll(".tool");
 const ctx = canvas.getContext('2d');
 const room_ID = canvas.dataset.roomId;
-const socket = io();  //pripoji se k WebSocket
+//s vice workery (gunicorn.conf.py) neni sticky session, proto rovnou websocket bez pollingu
+const socket = canvas.dataset.websocketOnly === "1" ? io({ transports: ["websocket"] }) : io();  //pripoji se k WebSocket
 //const socket = io("https://c85432c98e12.ngrok-free.app");  //pripoji se k WebSocket pres ngrok
-socket.emit('join_room', { room: room_ID });
+//nabidne serveru binarni format (draw_codec.js), server ho potvrdi eventem 'codec'
+//po reconnectu posle 'since' = posledni vykresleny seq a dostane jen to, co zmeskal
+let binaryCodec = false;
+let lastSeq = 0;
+let ownSeqs = new Set();  //seq vlastnich tahu (ack od serveru), ktere jeste nenavazuji na lastSeq
+let pendingOps = [];  //zive tahy, ktere cekaji na dokonceni prehravani historie
+socket.on('connect', () => {
+    pendingOps = [];  //zive tahy z fronty budou v doplnene historii
+    socket.emit('join_room', { room: room_ID, codec: DrawCodec.CODEC, since: lastSeq || null });
+});
+socket.on('codec', (codec) => { binaryCodec = codec === DrawCodec.CODEC; });
+
+//posun lastSeq; vlastni tahy, ktere na nej navazuji, se pridaji hned za nim
+function advanceSeq(seq) {
+    if (seq > lastSeq) lastSeq = seq;
+    while (ownSeqs.has(lastSeq + 1)) ownSeqs.delete(++lastSeq);
+}
+
+//server vrati seq naseho tahu; pred nim muzou byt cizi tahy, ktere jeste nedorazily (davka),
+//proto se lastSeq posune az kdyz na nej navazuje, jinak by je reconnect preskocil
+function ackSeq(seq) {
+    if (!(seq > lastSeq)) return;
+    ownSeqs.add(seq);
+    if (pendingOps === null) advanceSeq(lastSeq);
+}
 
 //posila drawdata na server
 function sendDrawData(drawData) {
-    socket.emit('draw', { room: room_ID, ...drawData });
+    if (binaryCodec) socket.emit('draw', { room: room_ID, op: DrawCodec.encode(drawData) }, ackSeq);
+    else socket.emit('draw', { room: room_ID, ...drawData }, ackSeq);
+}
+
+//tahy od serveru: binarne (ArrayBuffer se zretezenymi tahy), pole nebo jeden objekt
+function toOps(payload) {
+    if (payload instanceof ArrayBuffer || ArrayBuffer.isView(payload)) return DrawCodec.decode(payload);
+    return Array.isArray(payload) ? payload : [payload];
 }
 
 function showTool(name) {
@@ -57,6 +89,34 @@ let slider = document.getElementById("sizeSlider");
 let clearcanvas = document.getElementById("clearCanvas");
 let canvasSnapshot = null;
 
+//tahy stetcem se posilaji jako jedna lomena cara (stroke) za STROKE_FLUSH_MS misto eventu za kazdy mousemove
+const STROKE_FLUSH_MS = 40;
+let strokeBuffer = null;  //{ color, width, points: [x0, y0, x1, y1, ...] }
+let strokeTimer = null;
+
+function roundCoord(v) {
+    return Math.round(v * 10000) / 10000;
+}
+
+function startStroke(x, y, color, width) {
+    strokeBuffer = { color: color, width: width, points: [roundCoord(x), roundCoord(y)] };
+}
+
+function addStrokePoint(x, y) {
+    strokeBuffer.points.push(roundCoord(x), roundCoord(y));
+    if (!strokeTimer) strokeTimer = setTimeout(flushStroke, STROKE_FLUSH_MS);
+}
+
+function flushStroke() {
+    clearTimeout(strokeTimer);
+    strokeTimer = null;
+    if (!strokeBuffer || strokeBuffer.points.length < 4) return;
+    const points = strokeBuffer.points;
+    sendDrawData({ type: "stroke", color: strokeBuffer.color, width: strokeBuffer.width, points: points });
+    //dalsi cast navazuje na posledni bod
+    strokeBuffer.points = points.slice(-2);
+}
+
 clearcanvas.addEventListener("click", () => { // Clear locally 
     ctx.clearRect(0, 0, canvas.width, canvas.height); // Sync to others 
     sendDrawData({ type: "clear" }); 
@@ -95,6 +155,9 @@ canvas.addEventListener("mousedown", (e) => {
     lastX = pos.x;
     lastY = pos.y;
 
+    if (currentTool === "brush") startStroke(pos.x, pos.y, currentColor, slider.value);
+    else if (currentTool === "eraser") startStroke(pos.x, pos.y, '#ffffff', brushSize);
+
     if (currentTool === "rectangle" || currentTool === "triangle" || currentTool === "circle") {
         saveCanvasState();
     }
@@ -125,6 +188,8 @@ canvas.addEventListener("mouseup", (e) => {
         sendDrawData({ type:"circ", ...data});
         circle(data);
     }
+    flushStroke();
+    strokeBuffer = null;
     drawing = false;
 });
 
@@ -141,7 +206,7 @@ canvas.addEventListener("mousemove", (e) => {
             color: currentColor,
             width: slider.value
         };
-        sendDrawData({ type: "line", ...data });
+        addStrokePoint(pos.x, pos.y);
         draw(data);
 
         lastX = pos.x;
@@ -156,7 +221,7 @@ canvas.addEventListener("mousemove", (e) => {
             color: '#ffffff',
             width: brushSize
         };
-        sendDrawData({ type:"line",  ...data});
+        addStrokePoint(pos.x, pos.y);
         draw(data);
 
         lastX = pos.x;
@@ -222,6 +287,24 @@ function draw(data) {
     ctx.stroke();
 }
 
+//lomena cara ze stroke eventu, points = [x0, y0, x1, y1, ...] normalizovane
+function strokePath(data) {
+    const p = data.points;
+    if (!Array.isArray(p) || p.length < 4) return;
+    ctx.save();
+    ctx.strokeStyle = data.color;
+    ctx.lineWidth = data.width * (canvas.width / BASE_WIDTH);
+    ctx.lineCap = "round";
+    ctx.lineJoin = "round";
+    ctx.beginPath();
+    ctx.moveTo(denormX(p[0]), denormY(p[1]));
+    for (let i = 2; i + 1 < p.length; i += 2) {
+        ctx.lineTo(denormX(p[i]), denormY(p[i + 1]));
+    }
+    ctx.stroke();
+    ctx.restore();
+}
+
 function rectangle(data) {
     ctx.strokeStyle = data.color;
     ctx.lineWidth = data.width * (canvas.width / BASE_WIDTH);
@@ -363,12 +446,14 @@ const colorPicker = new iro.ColorPicker("#colorPicker", { //vytvori novy color p
     color: "#000" //default barva
 });
 
-//posila historii mistnosti pro nove pripojene uzivatele
-socket.on('draw_history', (history) => {
-    history.forEach((data) => {
-        switch (data.type){
+//vykresli jednu akci od serveru
+function applyOp(data) {
+    advanceSeq(data.seq);
+    switch (data.type){
         case "line": draw(data);
         break;
+        case "stroke": strokePath(data);
+        break;
         case "rect": rectangle(data);
         break;
         case "tri": triangle(data);
@@ -379,27 +464,56 @@ socket.on('draw_history', (history) => {
         break;
         case "clear": ctx.clearRect(0, 0, canvas.width, canvas.height); 
         break;
-        }
-    });
+    }
+}
+
+//historie prichazi po castech (chunk), dalsi posle server az po 'history_ack',
+//takze se kresli hned a klient se nezasekne na jedne obri zprave;
+//zive tahy mezitim cekaji ve fronte, ty se seq do 'target' uz jsou v historii
+function applyChunk(chunk) {
+    toOps(chunk.ops).forEach(applyOp);
+    if (chunk.more) {
+        socket.emit('history_ack', { room: room_ID, to: chunk.to, target: chunk.target,
+                                     codec: binaryCodec ? DrawCodec.CODEC : null });
+        return;
+    }
+    const queued = pendingOps;
+    pendingOps = null;
+    advanceSeq(chunk.target);
+    queued.filter(op => !(op.seq <= chunk.target)).forEach(applyOp);
+}
+
+socket.on('draw_history', applyChunk);
+
+//dlouha historie: obrazek (PNG 1600x1200) se starymi tahy + prvni chunk zbytku
+//(bez obrazku, kdyz se mistnost behem prehravani vymazala)
+socket.on('draw_snapshot', (state) => {
+    pendingOps = pendingOps || [];
+    lastSeq = 0;  //kreslime znovu od obrazku
+    const show = (img) => {
+        ctx.clearRect(0, 0, canvas.width, canvas.height);
+        if (img && img.naturalWidth) ctx.drawImage(img, 0, 0, canvas.width, canvas.height);
+        applyChunk(state.history);
+    };
+    if (!state.image) return show(null);
+    const img = new Image();
+    const url = URL.createObjectURL(new Blob([state.image], { type: "image/png" }));
+    img.onload = img.onerror = () => {
+        URL.revokeObjectURL(url);
+        show(img);
+    };
+    img.src = url;
 });
 
 //prijima data od ostatnich uzivatelu
-socket.on('draw', (data) => {
-    switch (data.type){
-        case "line": draw(data);
-        break;
-        case "rect": rectangle(data);
-        break;
-        case "tri": triangle(data);
-        break;
-        case "circ": circle(data);
-        break;
-        case "bucket": bucketFillAtNormalized(data); 
-        break;
-        case "clear": ctx.clearRect(0, 0, canvas.width, canvas.height); 
-        break;
-    }
-}); 
+function onLiveOp(data) {
+    if (pendingOps) pendingOps.push(data);
+    else applyOp(data);
+}
+
+socket.on('draw', (data) => toOps(data).forEach(onLiveOp));
+//se zapnutym DRAW_BATCH_RATE posila server tahy po davkach (jedna zprava za tick)
+socket.on('draw_batch', (ops) => toOps(ops).forEach(onLiveOp));
 //meni barvu podle vyberu na color pickeru
 colorPicker.on('color:change', function(color) {
     currentColor=color.hexString;
@@ -0,0 +1,109 @@
+//binarni format tahu, stejny jako draw_codec.py (viz popis tam)
+//op = seq uint32, typ uint8, pak podle typu barva/sirka/souradnice, vse little endian
+const DrawCodec = (() => {
+    const CODEC = "bin1";
+    const COORD_MAX = 65535;
+    const WIDTH_SCALE = 16;
+    const TYPES = { line: 1, stroke: 2, rect: 3, tri: 4, circ: 5, bucket: 6, clear: 7 };
+    const NAMES = Object.fromEntries(Object.entries(TYPES).map(([name, code]) => [code, name]));
+    const SHAPES = new Set(["line", "rect", "tri", "circ"]);
+    const HEADER = 5;
+
+    function coord(v) {
+        v = Number(v);
+        if (!(v >= 0)) v = 0;
+        return Math.round(Math.min(v, 1) * COORD_MAX);
+    }
+
+    function color(value) {
+        let text = String(value).replace("#", "");
+        if (text.length === 3) text = text.split("").map(c => c + c).join("");
+        if (text.length === 6) text += "ff";
+        return parseInt(text, 16) >>> 0;
+    }
+
+    function colorText(value) {
+        const text = "#" + value.toString(16).padStart(8, "0");
+        return text.endsWith("ff") ? text.slice(0, 7) : text;
+    }
+
+    function width(value) {
+        return Math.min(Math.max(Math.round(Number(value) * WIDTH_SCALE), 0), 0xFFFF);
+    }
+
+    function size(event) {
+        if (SHAPES.has(event.type)) return HEADER + 14;
+        if (event.type === "stroke") return HEADER + 8 + 2 * event.points.length;
+        if (event.type === "bucket") return HEADER + 8;
+        return HEADER;
+    }
+
+    //jeden tah -> ArrayBuffer (seq doplni server)
+    function encode(event) {
+        const buffer = new ArrayBuffer(size(event));
+        const view = new DataView(buffer);
+        view.setUint32(0, 0, true);
+        view.setUint8(4, TYPES[event.type]);
+        let pos = HEADER;
+        if (event.type !== "clear") {
+            view.setUint32(pos, color(event.color), true);
+            pos += 4;
+        }
+        if (SHAPES.has(event.type)) {
+            view.setUint16(pos, width(event.width), true);
+            [event.fromX, event.fromY, event.toX, event.toY].forEach((v, i) => {
+                view.setUint16(pos + 2 + 2 * i, coord(v), true);
+            });
+        } else if (event.type === "stroke") {
+            view.setUint16(pos, width(event.width), true);
+            view.setUint16(pos + 2, event.points.length / 2, true);
+            event.points.forEach((v, i) => view.setUint16(pos + 4 + 2 * i, coord(v), true));
+        } else if (event.type === "bucket") {
+            view.setUint16(pos, coord(event.x), true);
+            view.setUint16(pos + 2, coord(event.y), true);
+        }
+        return buffer;
+    }
+
+    //ArrayBuffer se zretezenymi tahy -> pole objektu jako v JSON formatu
+    function decode(buffer) {
+        const view = new DataView(buffer instanceof ArrayBuffer ? buffer : buffer.buffer,
+                                  buffer.byteOffset || 0, buffer.byteLength);
+        const events = [];
+        let pos = 0;
+        while (pos + HEADER <= view.byteLength) {
+            const event = { seq: view.getUint32(pos, true), type: NAMES[view.getUint8(pos + 4)] };
+            pos += HEADER;
+            if (!event.type) break;
+            if (event.type !== "clear") {
+                event.color = colorText(view.getUint32(pos, true));
+                pos += 4;
+            }
+            if (SHAPES.has(event.type)) {
+                event.width = view.getUint16(pos, true) / WIDTH_SCALE;
+                event.fromX = view.getUint16(pos + 2, true) / COORD_MAX;
+                event.fromY = view.getUint16(pos + 4, true) / COORD_MAX;
+                event.toX = view.getUint16(pos + 6, true) / COORD_MAX;
+                event.toY = view.getUint16(pos + 8, true) / COORD_MAX;
+                pos += 10;
+            } else if (event.type === "stroke") {
+                event.width = view.getUint16(pos, true) / WIDTH_SCALE;
+                const count = view.getUint16(pos + 2, true);
+                pos += 4;
+                event.points = [];
+                for (let i = 0; i < 2 * count; i++) {
+                    event.points.push(view.getUint16(pos, true) / COORD_MAX);
+                    pos += 2;
+                }
+            } else if (event.type === "bucket") {
+                event.x = view.getUint16(pos, true) / COORD_MAX;
+                event.y = view.getUint16(pos + 2, true) / COORD_MAX;
+                pos += 4;
+            }
+            events.push(event);
+        }
+        return events;
+    }
+
+    return { CODEC, encode, decode };
+})();
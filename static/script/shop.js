@@ -0,0 +1,45 @@
+// Infinite scroll for the shop, pulls the next page from /shop/feed
+(function () {
+    const more = document.getElementById("shop-more");
+    const grid = document.getElementById("shop-grid");
+    const template = document.getElementById("shop-item-template");
+    if (!more || !grid || !template || !("IntersectionObserver" in window)) return;
+
+    let cursor = more.dataset.cursor;
+    let loading = false;
+
+    function renderItem(item) {
+        const node = template.content.firstElementChild.cloneNode(true);
+        node.href = item.url;
+        node.querySelector("h3").textContent = item.title;
+        node.querySelector(".artist").append(item.artist);
+        node.querySelector(".price").append(item.price + " BP");
+        node.querySelector("img").src = item.thumbnail;
+        return node;
+    }
+
+    async function loadMore() {
+        if (loading || !cursor) return;
+        loading = true;
+        try {
+            const response = await fetch(more.dataset.feed + "?cursor=" + encodeURIComponent(cursor));
+            if (!response.ok) return;
+            const page = await response.json();
+            page.items.forEach(item => grid.appendChild(renderItem(item)));
+            cursor = page.next;
+            if (cursor) {
+                more.href = more.href.split("?")[0] + "?cursor=" + encodeURIComponent(cursor);
+            } else {
+                observer.disconnect();
+                more.remove();
+            }
+        } finally {
+            loading = false;
+        }
+    }
+
+    const observer = new IntersectionObserver(entries => {
+        if (entries.some(entry => entry.isIntersecting)) loadMore();
+    }, { rootMargin: "400px" });
+    observer.observe(more);
+})();
@@ -6,7 +6,9 @@ Provides common fixtures, setup/teardown, and test configuration.
 import pytest
 import sys
 import os
+import shutil
 import sqlite3
+import tempfile
 import bcrypt
 from pathlib import Path
 from io import BytesIO
@@ -14,11 +16,27 @@ from io import BytesIO
 # Add project root to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+# test sessions never run the backup scheduler nor write drawing rooms to beevy.db
+os.environ.setdefault("BEEVY_SCHEDULER", "0")
+os.environ.setdefault("BEEVY_ROOM_LOG", "0")
+# the app and the fixtures write to a copy, the committed beevy.db stays untouched;
+# migrated like on deploy (scripts/init_db.py runs before the app starts)
+TEST_DB_DIR = tempfile.mkdtemp(prefix="beevy-tests-")
+os.environ["BEEVY_DATABASE"] = shutil.copy(Path(__file__).parent.parent / "beevy.db", TEST_DB_DIR)
+
+from scripts.init_db import apply_migrations
+apply_migrations(Path(os.environ["BEEVY_DATABASE"]))
+
 from app import app
 
 
 # ===== Pytest Configuration =====
 
+def pytest_unconfigure(config):
+    """Remove the database copy after the session"""
+    shutil.rmtree(TEST_DB_DIR, ignore_errors=True)
+
+
 def pytest_configure(config):
     """Configure pytest before test collection"""
     # Add custom markers
@@ -53,7 +71,7 @@ def app_instance():
 @pytest.fixture(scope="session")
 def database():
     """Ensure database exists and is accessible for session"""
-    db_path = Path("beevy.db")
+    db_path = Path(app.config["DATABASE"])
     if not db_path.exists():
         # Create a basic database if it doesn't exist
         conn = sqlite3.connect(str(db_path))
@@ -107,7 +125,7 @@ def db_connection():
 @pytest.fixture
 def main_db():
     """Access main application database"""
-    conn = sqlite3.connect("beevy.db")
+    conn = sqlite3.connect(app.config["DATABASE"])
     conn.row_factory = sqlite3.Row
     
     yield conn
@@ -284,7 +302,7 @@ def temp_upload_dir(tmp_path):
 def clean_database():
     """Provide a clean database state before and after test"""
     # Setup
-    conn = sqlite3.connect("beevy.db")
+    conn = sqlite3.connect(app.config["DATABASE"])
     cursor = conn.cursor()
     
     # Get list of tables
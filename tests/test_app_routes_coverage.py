@@ -23,7 +23,7 @@ def client():
 
 @pytest.fixture
 def seeded_data():
-    conn = sqlite3.connect("beevy.db")
+    conn = sqlite3.connect(app.config["DATABASE"])
     cursor = conn.cursor()
 
     author_username = f"cov_author_{uuid.uuid4().hex[:8]}"
@@ -292,6 +292,43 @@ class TestCoverageDrawAndJoinRoutes:
         draw_public = client.get(f"/draw/{seeded_data['public_room_id']}")
         assert draw_public.status_code == 200
 
+        assert client.get("/rooms/usage").status_code == 404
+
+    def test_room_usage_for_operators(self, client, seeded_data, monkeypatch):
+        set_session_user(client, seeded_data["buyer_username"])
+        monkeypatch.setitem(app.config, "ROOM_USAGE", True)
+
+        usage = client.get("/rooms/usage")
+        assert usage.status_code == 200
+        assert set(usage.get_json()) == {"bytes", "budget", "rooms"}
+
+
+class TestVerifiedRooms:
+    def test_private_draw_page_needs_password(self, client, seeded_data):
+        set_session_user(client, seeded_data["buyer_username"])
+
+        response = client.get(f"/draw/{seeded_data['private_room_id']}", follow_redirects=False)
+        assert response.status_code == 302
+        assert f"/join/{seeded_data['private_room_id']}" in response.headers["Location"]
+        with client.session_transaction() as session:
+            assert seeded_data["private_room_id"] not in session.get("verified_rooms", [])
+
+    def test_verified_rooms_are_deduplicated_and_bounded(self, client, seeded_data):
+        set_session_user(client, seeded_data["buyer_username"])
+        with client.session_transaction() as session:
+            session["verified_rooms"] = [f"old-{i}" for i in range(60)]
+
+        for _ in range(3):
+            assert client.get(f"/draw/{seeded_data['public_room_id']}").status_code == 200
+            client.post(f"/join/{seeded_data['private_room_id']}",
+                        data={"password": seeded_data["private_room_password"]})
+
+        with client.session_transaction() as session:
+            rooms = session["verified_rooms"]
+        assert len(rooms) == 50
+        assert rooms[-2:] == [seeded_data["public_room_id"], seeded_data["private_room_id"]]
+        assert len(set(rooms)) == len(rooms)
+
 
 class TestCoverageShopAndOwnedRoutes:
     def test_shop_and_owned_paths(self, client, seeded_data):
@@ -335,3 +372,204 @@ class TestCoverageRecoverRoute:
             },
         )
         assert wrong_password_resp.status_code == 200
+
+
+class TestCoverageSessionProfile:
+    def test_profile_cached_in_session(self, client, seeded_data):
+        username = seeded_data["buyer_username"]
+        set_session_user(client, username)
+
+        assert client.get("/shop").status_code == 200
+
+        with client.session_transaction() as session:
+            assert session["user_id"]
+            assert session["profile"]["username"] == username
+            assert session["profile"]["theme"] == "bee"
+            assert session["profile"]["brush"] == 30
+
+    def test_preferences_refresh_profile(self, client, seeded_data):
+        username = seeded_data["buyer_username"]
+        set_session_user(client, username)
+
+        client.post(
+            f"/{username}/settings/preferences",
+            data={"language": "cs", "theme": "dark", "brush": "12"},
+        )
+
+        with client.session_transaction() as session:
+            assert session["profile"]["theme"] == "dark"
+            assert session["profile"]["brush"] == 12
+            assert session["user_language"] == "cs"
+
+    def test_settings_reach_other_devices(self, client, seeded_data):
+        username = seeded_data["buyer_username"]
+        other_device = app.test_client()
+        for device in (client, other_device):
+            set_session_user(device, username)
+            assert device.get("/shop").status_code == 200
+
+        client.post(
+            f"/{username}/settings/preferences",
+            data={"language": "cs", "theme": "dark", "brush": "12"},
+        )
+        assert other_device.get("/shop").status_code == 200
+
+        with other_device.session_transaction() as session:
+            assert session["profile"]["theme"] == "dark"
+            assert session["user_language"] == "cs"
+
+    def test_rename_reaches_other_devices(self, client, seeded_data):
+        username = seeded_data["buyer_username"]
+        other_device = app.test_client()
+        for device in (client, other_device):
+            set_session_user(device, username)
+            assert device.get("/shop").status_code == 200
+
+        client.post(
+            f"/{username}/settings/profile",
+            data={"username": f"{username}_renamed", "bio": ""},
+        )
+        assert other_device.get("/shop").status_code == 200
+
+        with other_device.session_transaction() as session:
+            assert session["username"] == f"{username}_renamed"
+            assert session["profile"]["username"] == f"{username}_renamed"
+
+
+class TestCoverageArtViewResolver:
+    def test_resolver_for_owner_and_author(self, seeded_data):
+        from app import resolve_art_view
+
+        conn = sqlite3.connect(app.config["DATABASE"])
+        ids = dict(conn.execute(
+            "SELECT username, id FROM users WHERE username IN (?, ?)",
+            (seeded_data["author_username"], seeded_data["buyer_username"]),
+        ).fetchall())
+        conn.close()
+        art_id = seeded_data["active_art_id"]
+
+        with app.app_context():
+            as_buyer = resolve_art_view(art_id, ids[seeded_data["buyer_username"]])
+            as_author = resolve_art_view(art_id, ids[seeded_data["author_username"]])
+            as_guest = resolve_art_view(art_id, None)
+
+        assert as_buyer["title"] == as_buyer[2] == "Coverage Active Art"
+        assert as_buyer["owns"] and not as_buyer["is_author"]
+        # empty owner copy falls back to the original
+        assert as_buyer["owned_image"] == "uploads/shop/original/coverage_active_original.png"
+        assert as_buyer["author_username"] == seeded_data["author_username"]
+
+        assert as_author["is_author"] and not as_author["owns"]
+        assert as_author["owned_image"] is None
+
+        assert not as_guest["owns"] and not as_guest["is_author"]
+        assert as_guest["public_image"] == "uploads/shop/examples/coverage_active_preview.png"
+
+    def test_preview_routes_use_access_rules(self, client, seeded_data):
+        set_session_user(client, seeded_data["buyer_username"])
+
+        # buyer does not own the inactive artwork
+        assert client.get(f"/preview/{seeded_data['inactive_art_id']}").status_code == 404
+        assert client.get(f"/owned/{seeded_data['inactive_art_id']}/preview").status_code == 403
+        # seeded files are not on disk
+        assert client.get(f"/owned/{seeded_data['active_art_id']}/preview").status_code == 404
+
+
+class TestCoverageShopFeed:
+    @pytest.fixture
+    def many_artworks(self, seeded_data):
+        conn = sqlite3.connect(app.config["DATABASE"])
+        cursor = conn.cursor()
+        author_id = cursor.execute(
+            "SELECT id FROM users WHERE username = ?", (seeded_data["author_username"],)
+        ).fetchone()[0]
+        art_ids = []
+        for i in range(20):
+            cursor.execute(
+                """
+                INSERT INTO art (author_name, title, tat, price, type, thumbnail_path, author_id, is_active)
+                VALUES (?, ?, 1, 10, 'digital', 'uploads/shop/thumbs/coverage_active.png', ?, 1)
+                """,
+                (seeded_data["author_username"], f"Feed Art {i}", author_id),
+            )
+            art_ids.append(cursor.lastrowid)
+        conn.commit()
+        yield art_ids
+        cursor.executemany("DELETE FROM art WHERE id = ?", [(art_id,) for art_id in art_ids])
+        conn.commit()
+        conn.close()
+
+    def walk_feed(self, client):
+        seen, pages, cursor = [], 0, None
+        while True:
+            resp = client.get("/shop/feed", query_string={"cursor": cursor} if cursor else {})
+            assert resp.status_code == 200
+            page = resp.get_json()
+            assert len(page["items"]) <= 15
+            seen.extend(item["id"] for item in page["items"])
+            pages += 1
+            cursor = page["next"]
+            if cursor is None:
+                return seen, pages
+
+    def test_feed_covers_catalogue_once(self, client, seeded_data, many_artworks):
+        set_session_user(client, seeded_data["buyer_username"])
+        with client.session_transaction() as session:
+            session["shop_seed"] = 12345
+
+        seen, pages = self.walk_feed(client)
+
+        conn = sqlite3.connect(app.config["DATABASE"])
+        expected = {row[0] for row in conn.execute(
+            "SELECT art.id FROM art JOIN users ON art.author_id = users.id WHERE art.is_active = 1 AND users.deleted = 0"
+        )}
+        conn.close()
+        assert len(seen) == len(set(seen))
+        assert set(seen) == expected
+        assert seeded_data["inactive_art_id"] not in seen
+        assert pages >= 2
+
+    def test_order_is_stable_per_seed(self, client, seeded_data, many_artworks):
+        set_session_user(client, seeded_data["buyer_username"])
+        with client.session_transaction() as session:
+            session["shop_seed"] = 777
+
+        first, _ = self.walk_feed(client)
+        second, _ = self.walk_feed(client)
+        assert first == second
+
+        with client.session_transaction() as session:
+            session["shop_seed"] = 778
+        other, _ = self.walk_feed(client)
+        assert sorted(other) == sorted(first)
+        assert other != first
+
+    def test_order_follows_shuffle_key(self, client, seeded_data, many_artworks):
+        set_session_user(client, seeded_data["buyer_username"])
+        with client.session_transaction() as session:
+            session["shop_seed"] = 4242
+        conn = sqlite3.connect(app.config["DATABASE"])
+        # equal keys are paged by id
+        conn.executemany("UPDATE art SET shuffle_key = 7 WHERE id = ?", [(art_id,) for art_id in many_artworks[:5]])
+        conn.commit()
+        keys = dict(conn.execute("SELECT id, shuffle_key FROM art"))
+        conn.close()
+
+        seen, _ = self.walk_feed(client)
+
+        order = [(keys[art_id], art_id) for art_id in seen]
+        # one rotation of the (shuffle_key, id) order: it drops back at most once, at the wrap around
+        assert sum(a > b for a, b in zip(order, order[1:])) <= 1
+        assert len(seen) == len(set(seen))
+        assert set(many_artworks) <= set(seen)
+
+    def test_html_page_links_next_cursor(self, client, seeded_data, many_artworks):
+        set_session_user(client, seeded_data["buyer_username"])
+
+        resp = client.get("/shop")
+        assert resp.status_code == 200
+        assert b'id="shop-more"' in resp.data
+        assert resp.data.count(b'class="art-link"') == 15 + 1  # plus the infinite scroll template
+
+        resp = client.get("/shop", query_string={"cursor": "not-a-cursor"})
+        assert resp.status_code == 200
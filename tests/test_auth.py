@@ -29,7 +29,7 @@ def client():
 @pytest.fixture
 def setup_test_user():
     """Create a test user in the database"""
-    conn = sqlite3.connect("beevy.db")
+    conn = sqlite3.connect(app.config["DATABASE"])
     cursor = conn.cursor()
     
     # Hash a test password
@@ -54,7 +54,7 @@ def setup_test_user():
     yield {"username": username, "email": email, "password": test_password}
     
     # Cleanup
-    conn = sqlite3.connect("beevy.db")
+    conn = sqlite3.connect(app.config["DATABASE"])
     cursor = conn.cursor()
     cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
     row = cursor.fetchone()
@@ -87,7 +87,7 @@ class TestUserRegistration:
         }, follow_redirects=True)
         
         # Check user was created
-        conn = sqlite3.connect("beevy.db")
+        conn = sqlite3.connect(app.config["DATABASE"])
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM users WHERE username = ?", (username,))
         user = cursor.fetchone()
@@ -96,7 +96,7 @@ class TestUserRegistration:
         assert user is not None
         
         # Cleanup
-        conn = sqlite3.connect("beevy.db")
+        conn = sqlite3.connect(app.config["DATABASE"])
         cursor = conn.cursor()
         cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
         row = cursor.fetchone()
@@ -208,7 +208,7 @@ class TestPasswordManagement:
     
     def test_password_hashing(self, setup_test_user):
         """Test that passwords are properly hashed"""
-        conn = sqlite3.connect("beevy.db")
+        conn = sqlite3.connect(app.config["DATABASE"])
         cursor = conn.cursor()
         cursor.execute("SELECT password FROM users WHERE username = ?", 
                       (setup_test_user['username'],))
@@ -236,7 +236,7 @@ class TestDeletedUsername:
     
     def test_get_unique_deleted_username(self, setup_test_user):
         """Test that unique deleted usernames are generated"""
-        conn = sqlite3.connect("beevy.db")
+        conn = sqlite3.connect(app.config["DATABASE"])
         cursor = conn.cursor()
         
         username1 = get_unique_deleted_username(cursor)
@@ -12,7 +12,9 @@ print('\nCurrent Backups:')
 backups = get_backups_list()
 if backups:
     for b in backups:
-        print(f'  - {b["name"]} ({b["size_mb"]:.2f} MB)')
+        metrics = b['metrics']
+        detail = f', {metrics["duration_s"]:.2f}s, {metrics["pages_per_s"]:.0f} pages/s, integrity {metrics["integrity"]}' if metrics else ''
+        print(f'  - {b["name"]} ({b["size_mb"]:.2f} MB{detail})')
 else:
     print('  (No backups yet - first will be created weekly)')
 
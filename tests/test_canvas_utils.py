@@ -0,0 +1,110 @@
+"""
+Test suite for the server side canvas renderer.
+Tests that draw events are painted onto the 1600x1200 snapshot the way
+draw.js paints them.
+"""
+
+import io
+import sys
+from pathlib import Path
+
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from canvas_utils import CANVAS_HEIGHT, CANVAS_WIDTH, render_events
+
+RED = (255, 0, 0, 255)
+GREEN = (0, 255, 0, 255)
+EMPTY = (0, 0, 0, 0)
+
+
+def open_png(data):
+    return Image.open(io.BytesIO(data)).convert("RGBA")
+
+
+def shape(kind, from_xy, to_xy, color="#ff0000", width="4"):
+    return {"type": kind, "fromX": from_xy[0], "fromY": from_xy[1],
+            "toX": to_xy[0], "toY": to_xy[1], "color": color, "width": width}
+
+
+class TestRenderEvents:
+    """Tests for render_events"""
+
+    def test_empty_canvas(self):
+        """Test that no events give a transparent 1600x1200 image"""
+        image = open_png(render_events([]))
+        assert image.size == (CANVAS_WIDTH, CANVAS_HEIGHT)
+        assert image.getextrema()[3] == (0, 0)
+
+    def test_line_with_round_caps(self):
+        """Test that a line covers its path and its round ends"""
+        image = open_png(render_events([shape("line", (0.25, 0.5), (0.75, 0.5), width="20")]))
+        assert image.getpixel((800, 600)) == RED
+        assert image.getpixel((395, 600)) == RED      # cap before the start point
+        assert image.getpixel((800, 620)) == EMPTY
+
+    def test_stroke_polyline(self):
+        """Test that a stroke event draws every segment of its polyline"""
+        event = {"type": "stroke", "color": "#ff0000", "width": "6",
+                 "points": [0.25, 0.25, 0.5, 0.25, 0.5, 0.5, 0.75, 0.5]}
+        image = open_png(render_events([event]))
+        assert image.getpixel((600, 300)) == RED      # first segment
+        assert image.getpixel((800, 450)) == RED      # second segment
+        assert image.getpixel((1000, 600)) == RED     # third segment
+        assert image.getpixel((600, 600)) == EMPTY
+
+    def test_stroke_matches_line_segments(self):
+        """Test that one stroke paints the same pixels as its segments sent as line events"""
+        points = [0.1, 0.1, 0.3, 0.2, 0.5, 0.1, 0.7, 0.4]
+        segments = [shape("line", points[i:i + 2], points[i + 2:i + 4], width="1") for i in range(0, 6, 2)]
+        stroke = {"type": "stroke", "color": "#ff0000", "width": "1", "points": points}
+        assert open_png(render_events([stroke])).tobytes() == open_png(render_events(segments)).tobytes()
+
+    def test_rectangle_is_outlined(self):
+        """Test that a rectangle is stroked, not filled, whichever corner it starts from"""
+        image = open_png(render_events([shape("rect", (0.75, 0.75), (0.25, 0.25))]))
+        assert image.getpixel((400, 600)) == RED      # left edge
+        assert image.getpixel((800, 900)) == RED      # bottom edge
+        assert image.getpixel((800, 600)) == EMPTY    # inside
+
+    def test_triangle_third_corner(self):
+        """Test that the third corner lies on the start row, mirrored across the end point"""
+        image = open_png(render_events([shape("tri", (0.25, 0.75), (0.5, 0.25))]))
+        assert image.getpixel((800, 900)) == RED      # base from (400, 900) to (1200, 900)
+        assert image.getpixel((1000, 600)) == RED     # edge from (800, 300) to (1200, 900)
+        assert image.getpixel((800, 700)) == EMPTY
+
+    def test_circle_around_start_point(self):
+        """Test that the circle is centred on the start point with the drag as radius"""
+        image = open_png(render_events([shape("circ", (0.5, 0.5), (0.5625, 0.5))]))
+        assert image.getpixel((900, 600)) == RED
+        assert image.getpixel((800, 500)) == RED
+        assert image.getpixel((800, 600)) == EMPTY
+
+    def test_bucket_fills_enclosed_area_only(self):
+        """Test that the bucket fills the region under the click up to the outline"""
+        events = [shape("rect", (0.25, 0.25), (0.75, 0.75)),
+                  {"type": "bucket", "x": 0.5, "y": 0.5, "color": "#00ff00"}]
+        image = open_png(render_events(events))
+        assert image.getpixel((800, 600)) == GREEN
+        assert image.getpixel((400, 600)) == RED
+        assert image.getpixel((100, 100)) == EMPTY
+
+    def test_clear_and_base_image(self):
+        """Test that events are painted over the base snapshot and clear empties it"""
+        base = render_events([shape("line", (0, 0.5), (1, 0.5))])
+        image = open_png(render_events([shape("line", (0.5, 0), (0.5, 1))], base))
+        assert image.getpixel((100, 600)) == RED
+        assert image.getpixel((800, 100)) == RED
+
+        image = open_png(render_events([{"type": "clear"}], base))
+        assert image.getextrema()[3] == (0, 0)
+
+    def test_malformed_events_skipped(self):
+        """Test that events the client could not draw either are ignored"""
+        events = [{"type": "line"}, shape("rect", (0.1, 0.1), (0.2, 0.2), color="nope"),
+                  {"type": "stroke", "color": "#ff0000", "width": "2", "points": [0.5]},
+                  {"type": "stroke", "color": "#ff0000", "width": "2", "points": "0.1,0.2"},
+                  {"type": "bucket", "x": 5, "y": 5, "color": "#00ff00"}, {"type": "unknown"}]
+        assert open_png(render_events(events)).getextrema()[3] == (0, 0)
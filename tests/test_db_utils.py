@@ -0,0 +1,225 @@
+"""
+Test suite for the pooled database connection layer.
+Tests pragmas, connection reuse, pool bounds and request scoping.
+"""
+
+import json
+import pytest
+import shutil
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from flask import Flask
+from app import app, create_app
+from db_utils import ConnectionPool, PoolExhausted, QueryStats, get_db, get_pool, init_app
+
+
+@pytest.fixture
+def pool(tmp_path):
+    """Create a small pool over a temporary database"""
+    db_path = tmp_path / "pool.db"
+    conn = sqlite3.connect(str(db_path))
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.commit()
+    conn.close()
+
+    pool = ConnectionPool(str(db_path), max_size=2, timeout=0.2)
+    yield pool
+    pool.close_all()
+
+
+class TestConnectionPool:
+    """Tests for ConnectionPool"""
+
+    def test_pragmas_applied(self, pool):
+        """Test that pooled connections are tuned once on open"""
+        conn = pool.acquire()
+        try:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+            assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+            assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+        finally:
+            pool.release(conn)
+
+    def test_connection_is_reused(self, pool):
+        """Test that a released connection is handed out again"""
+        first = pool.acquire()
+        pool.release(first)
+        second = pool.acquire()
+        pool.release(second)
+
+        assert first is second
+        assert pool.size == 1
+
+    def test_pool_is_bounded(self, pool):
+        """Test that the pool never opens more than max_size connections"""
+        a = pool.acquire()
+        b = pool.acquire()
+
+        with pytest.raises(PoolExhausted):
+            pool.acquire()
+
+        pool.release(a)
+        c = pool.acquire()
+        assert c is a
+        pool.release(b)
+        pool.release(c)
+
+    def test_broken_connection_is_closed(self, tmp_path):
+        """Test that a connection whose rollback fails is closed and replaced"""
+        closed = []
+
+        class BrokenConnection(sqlite3.Connection):
+            def rollback(self):
+                raise sqlite3.OperationalError("disk I/O error")
+
+            def close(self):
+                closed.append(self)
+                super().close()
+
+        pool = ConnectionPool(str(tmp_path / "broken.db"), max_size=1, timeout=0.2, factory=BrokenConnection)
+        conn = pool.acquire()
+        conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY)")
+        conn.execute("INSERT INTO items DEFAULT VALUES")  # left uncommitted
+        pool.release(conn)
+
+        assert closed == [conn]
+        assert pool.size == 0
+        fresh = pool.acquire()
+        assert fresh is not conn
+        pool.release(fresh)
+        pool.close_all()
+
+    def test_release_rolls_back_uncommitted_work(self, pool):
+        """Test that uncommitted writes do not leak into the next borrower"""
+        conn = pool.acquire()
+        conn.execute("INSERT INTO items (name) VALUES ('leak')")
+        pool.release(conn)
+
+        conn = pool.acquire()
+        try:
+            assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 0
+        finally:
+            pool.release(conn)
+
+    def test_threads_share_the_pool(self, pool):
+        """Test that connections can move between request threads"""
+        errors = []
+
+        def worker():
+            try:
+                conn = pool.acquire()
+                conn.execute("INSERT INTO items (name) VALUES ('t')")
+                conn.commit()
+                pool.release(conn)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert errors == []
+        assert pool.size <= 2
+
+
+@pytest.fixture
+def scoped_app(tmp_path):
+    """The app on a copy of beevy.db"""
+    db_path = shutil.copy(Path(app.config["DATABASE"]), tmp_path / "beevy.db")
+    test_app = create_app({"DATABASE": str(db_path), "SCHEDULER_ENABLED": False, "ROOM_LOG_ENABLED": False})
+    yield test_app
+    get_pool(test_app).close_all()
+
+
+class TestRequestScope:
+    """Tests for get_db inside Flask requests"""
+
+    def test_same_connection_within_request(self, scoped_app):
+        """Test that one request borrows a single connection"""
+        with scoped_app.test_request_context():
+            assert get_db() is get_db()
+
+    def test_connection_returned_on_teardown(self, scoped_app):
+        """Test that the connection goes back to the app pool after the request"""
+        with scoped_app.app_context():
+            conn = get_db()
+        with scoped_app.app_context():
+            assert get_db() is conn
+            assert get_pool().size >= 1
+
+
+@pytest.fixture
+def instrumented_app(tmp_path):
+    """Minimal app with SQL instrumentation switched on"""
+    db_path = tmp_path / "stats.db"
+    conn = sqlite3.connect(str(db_path))
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.executemany("INSERT INTO items (name) VALUES (?)", [("a",), ("b",), ("c",)])
+    conn.commit()
+    conn.close()
+
+    test_app = Flask(__name__)
+    test_app.config["DATABASE"] = str(db_path)
+    test_app.config["SQL_INSTRUMENTATION"] = True
+    init_app(test_app)
+
+    @test_app.route("/loop")
+    def loop():
+        cursor = get_db().cursor()
+        cursor.execute("SELECT id FROM items")
+        names = []
+        for (item_id,) in cursor.fetchall():
+            row = get_db().execute("SELECT name FROM items WHERE id = ?", (item_id,)).fetchone()
+            names.append(row[0])
+        return ",".join(names)
+
+    yield test_app
+    get_pool(test_app).close_all()
+
+
+class TestInstrumentation:
+    """Tests for per-request SQL statistics"""
+
+    def test_server_timing_header(self, instrumented_app):
+        """Test that query count and time are reported in Server-Timing"""
+        response = instrumented_app.test_client().get("/loop")
+
+        assert response.data == b"a,b,c"
+        timing = response.headers["Server-Timing"]
+        assert timing.startswith("db;dur=")
+        assert '"4 queries"' in timing
+        assert "db-n1" in timing
+
+    def test_log_line_flags_n_plus_one(self, instrumented_app, caplog):
+        """Test that a lookup inside a loop is logged as an N+1 pattern"""
+        with caplog.at_level("INFO", logger="beevy.sql"):
+            instrumented_app.test_client().get("/loop")
+
+        record = json.loads(caplog.records[-1].getMessage())
+        assert record["path"] == "/loop"
+        assert record["queries"] == 4
+        assert record["n_plus_one"][0]["sql"] == "SELECT name FROM items WHERE id = ?"
+        assert record["n_plus_one"][0]["count"] == 3
+
+    def test_duplicates_are_not_n_plus_one(self):
+        """Test that the same statement with the same parameters counts as a duplicate"""
+        stats = QueryStats()
+        stats.start("SELECT 1 WHERE 1 = ?", (1,))
+        stats.start("SELECT 1 WHERE 1 = ?", (1,))
+
+        assert stats.n_plus_one() == []
+        assert stats.duplicates()[0]["count"] == 2
+
+    def test_disabled_by_default(self):
+        """Test that the main app does not add the header unless switched on"""
+        if app.config["SQL_INSTRUMENTATION"]:
+            pytest.skip("instrumentation enabled through BEEVY_SQL_INSTRUMENTATION")
+        response = app.test_client().get("/health")
+        assert "Server-Timing" not in response.headers
@@ -0,0 +1,166 @@
+"""
+Test suite for the binary draw op format.
+Tests packing and unpacking of every event type, splitting concatenated ops
+and drawing with a client that negotiated the binary format.
+"""
+
+import json
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import app
+from extensions import socketio
+from draw_codec import CODEC, decode_op, decode_ops, encode_event, op_seq, split_ops, with_seq
+from room_store import get_room_store
+
+EVENTS = [
+    {"type": "line", "fromX": 0, "fromY": 1, "toX": 0.5, "toY": 0.25, "color": "#ff0000", "width": 2.5},
+    {"type": "rect", "fromX": 0.1, "fromY": 0.2, "toX": 0.3, "toY": 0.4, "color": "#00ff0080", "width": 1},
+    {"type": "tri", "fromX": 0, "fromY": 0, "toX": 1, "toY": 1, "color": "#abc", "width": "12"},
+    {"type": "circ", "fromX": 0.5, "fromY": 0.5, "toX": 0.6, "toY": 0.6, "color": "#000000", "width": 40},
+    {"type": "stroke", "points": [0.1, 0.1, 0.2, 0.15, 0.3, 0.2], "color": "#123456", "width": 4},
+    {"type": "bucket", "x": 0.75, "y": 0.125, "color": "#ffffff"},
+    {"type": "clear"},
+]
+
+
+class TestCodec:
+    """Tests for draw_codec"""
+
+    @pytest.mark.parametrize("event", EVENTS, ids=[event["type"] for event in EVENTS])
+    def test_round_trip(self, event):
+        """Test that an event comes back with its seq, coordinates within a quantisation step"""
+        decoded = decode_op(encode_event(event, seq=7))
+        assert decoded.pop("seq") == 7
+        assert decoded.keys() == event.keys()
+        for key, value in event.items():
+            if key == "color":
+                assert decoded[key] == {"#abc": "#aabbcc"}.get(value, value)
+            elif key == "type":
+                assert decoded[key] == value
+            elif key == "points":
+                assert decoded[key] == pytest.approx(value, abs=1e-4)
+            else:
+                assert decoded[key] == pytest.approx(float(value), abs=1e-4)
+
+    def test_smaller_than_json(self):
+        """Test that a line takes a fraction of its JSON size"""
+        op = encode_event(EVENTS[0])
+        assert len(op) == 19
+        assert len(op) * 4 < len(json.dumps(dict(EVENTS[0], room="r" * 32, seq=1)))
+
+    def test_out_of_range_values_are_clamped(self):
+        """Test that points off the canvas and huge widths still pack"""
+        event = decode_op(encode_event({"type": "line", "fromX": -3, "fromY": 2, "toX": 0, "toY": 0,
+                                        "color": "#000", "width": 1e9}))
+        assert (event["fromX"], event["fromY"], event["width"]) == (0, 1, 0xFFFF / 16)
+
+    @pytest.mark.parametrize("event", [
+        {"type": "script"},
+        {"type": "line", "fromX": 0},
+        {"type": "line", "fromX": "a", "fromY": 0, "toX": 0, "toY": 0, "color": "#000", "width": 1},
+        {"type": "line", "fromX": float("nan"), "fromY": 0, "toX": 0, "toY": 0, "color": "#000", "width": 1},
+        {"type": "bucket", "x": 0, "y": 0, "color": "red"},
+        {"type": "stroke", "points": [0.1, 0.2, 0.3], "color": "#000", "width": 1},
+        {"type": "stroke", "points": None, "color": "#000", "width": 1},
+    ])
+    def test_malformed_events(self, event):
+        """Test that events the canvas cannot draw are refused"""
+        with pytest.raises(ValueError):
+            encode_event(event)
+
+    def test_split_concatenated_ops(self):
+        """Test that a history sent as one frame splits back into its ops"""
+        ops = [encode_event(event, seq) for seq, event in enumerate(EVENTS, 1)]
+        assert split_ops(b"".join(ops)) == ops
+        assert [event["seq"] for event in decode_ops(ops)] == list(range(1, len(EVENTS) + 1))
+        assert op_seq(with_seq(ops[0], 99)) == 99
+        assert split_ops(b"") == []
+
+    @pytest.mark.parametrize("cut", [1, 5, 10, 20])
+    def test_truncated_data(self, cut):
+        """Test that cut off data is refused instead of misread"""
+        data = encode_event(EVENTS[0]) + encode_event(EVENTS[4])
+        with pytest.raises(ValueError):
+            split_ops(data[:-cut])
+
+    def test_unknown_type(self):
+        """Test that an unknown type byte is refused"""
+        with pytest.raises(ValueError):
+            split_ops(b"\0\0\0\0\x63")
+
+
+@pytest.fixture
+def room():
+    return f"test-{uuid.uuid4().hex}"
+
+
+def drawer_client(room):
+    app.config['TESTING'] = True
+    with app.test_client() as flask_client:
+        with flask_client.session_transaction() as sess:
+            sess['verified_rooms'] = [room]
+        return socketio.test_client(app, flask_test_client=flask_client)
+
+
+class TestBinaryClients:
+    """Tests for the format negotiation over Socket.IO"""
+
+    def test_binary_drawer(self, room):
+        """Test that a packed op is stored and reaches JSON viewers as a dict and binary viewers as bytes"""
+        drawer = drawer_client(room)
+        drawer.emit('join_room', {'room': room, 'codec': CODEC})
+        assert [message['name'] for message in drawer.get_received()] == ['codec', 'draw_history']
+        json_viewer, binary_viewer = socketio.test_client(app), socketio.test_client(app)
+        json_viewer.emit('join_room', {'room': room})
+        binary_viewer.emit('join_room', {'room': room, 'codec': CODEC})
+        json_viewer.get_received()
+        binary_viewer.get_received()
+
+        drawer.emit('draw', {'room': room, 'op': encode_event(EVENTS[0])})
+        drawer.emit('draw', {'room': room, 'op': encode_event(EVENTS[0])[:-1]})  # truncated, ignored
+
+        with app.app_context():
+            assert get_room_store().history(room) == [encode_event(EVENTS[0], 1)]
+        [message] = json_viewer.get_received()
+        assert (message['name'], message['args'][0]['seq'], message['args'][0]['color']) == ('draw', 1, '#ff0000')
+        [message] = binary_viewer.get_received()
+        assert (message['name'], message['args'][0]) == ('draw', encode_event(EVENTS[0], 1))
+        assert drawer.get_received() == []
+
+        late = socketio.test_client(app)
+        late.emit('join_room', {'room': room, 'codec': CODEC})
+        assert late.get_received()[1]['args'][0]['ops'] == encode_event(EVENTS[0], 1)
+
+        for client in (drawer, json_viewer, binary_viewer, late):
+            client.disconnect()
+
+    def test_drawer_gets_its_seq(self, room):
+        """Test that the drawer's own event is acked with its seq, in either codec, and ignored events without one"""
+        drawer = drawer_client(room)
+        drawer.emit('join_room', {'room': room, 'codec': CODEC})
+
+        assert drawer.emit('draw', {'room': room, 'op': encode_event(EVENTS[0])}, callback=True) == 1
+        assert drawer.emit('draw', dict(EVENTS[5], room=room), callback=True) == 2
+        assert not drawer.emit('draw', {'room': room, 'op': encode_event(EVENTS[0])[:-1]}, callback=True)
+        drawer.disconnect()
+
+    def test_binary_off(self, room, monkeypatch):
+        """Test that with DRAW_BINARY off everyone gets JSON"""
+        monkeypatch.setitem(app.config, 'DRAW_BINARY', False)
+        drawer = drawer_client(room)
+        drawer.emit('join_room', {'room': room, 'codec': CODEC})
+        drawer.emit('draw', dict(EVENTS[5], room=room))
+        client = socketio.test_client(app)
+        client.emit('join_room', {'room': room, 'codec': CODEC})
+
+        assert [message['name'] for message in drawer.get_received()] == ['draw_history']
+        [message] = client.get_received()
+        assert (message['name'], message['args'][0]['ops'][0]['type']) == ('draw_history', 'bucket')
+        drawer.disconnect()
+        client.disconnect()
@@ -0,0 +1,167 @@
+"""
+Test suite for the purchase transaction.
+Tests the purchase guards and runs a concurrency benchmark with 50 parallel buyers.
+"""
+
+import pytest
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import purchase_art
+from db_utils import ConnectionPool
+from scripts.init_db import create_schema, apply_migrations
+
+BUYERS = 50
+ARTWORKS = 20
+PRICE = 10
+START_POINTS = 100  # enough for 10 of the 20 artworks
+
+
+@pytest.fixture
+def shop_db(tmp_path):
+    """Migrated database with one author, BUYERS buyers and ARTWORKS artworks"""
+    db_path = tmp_path / "beevy.db"
+    create_schema(db_path)
+    apply_migrations(db_path)
+
+    conn = sqlite3.connect(str(db_path))
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO users (username, email, password, dob, bee_points) VALUES ('author', 'a@x', 'x', '2000-01-01', 0)"
+    )
+    author_id = cursor.lastrowid
+    buyer_ids = []
+    for i in range(BUYERS):
+        cursor.execute(
+            "INSERT INTO users (username, email, password, dob, bee_points) VALUES (?, ?, 'x', '2000-01-01', ?)",
+            (f"buyer{i}", f"b{i}@x", START_POINTS)
+        )
+        buyer_ids.append(cursor.lastrowid)
+    art_ids = []
+    for i in range(ARTWORKS):
+        cursor.execute(
+            """INSERT INTO art (author_name, title, tat, price, type, thumbnail_path, author_id)
+               VALUES ('author', ?, 1, ?, 'digital', 'thumb.png', ?)""",
+            (f"art{i}", PRICE, author_id)
+        )
+        art_ids.append(cursor.lastrowid)
+    conn.commit()
+    conn.close()
+
+    pool = ConnectionPool(str(db_path), max_size=16, timeout=30)
+    yield pool, author_id, buyer_ids, art_ids
+    pool.close_all()
+
+
+def run(pool, fn):
+    conn = pool.acquire()
+    try:
+        return fn(conn)
+    finally:
+        pool.release(conn)
+
+
+class TestPurchaseGuards:
+    """Tests for the purchase_art status results"""
+
+    def test_purchase_moves_points(self, shop_db):
+        """Test that a purchase debits the buyer and credits the author"""
+        pool, author_id, buyer_ids, art_ids = shop_db
+
+        assert run(pool, lambda c: purchase_art(c, buyer_ids[0], art_ids[0])) == "purchased"
+
+        points = dict(run(pool, lambda c: c.execute("SELECT id, bee_points FROM users").fetchall()))
+        assert points[buyer_ids[0]] == START_POINTS - PRICE
+        assert points[author_id] == PRICE
+
+    def test_second_purchase_is_rejected(self, shop_db):
+        """Test that buying the same artwork twice charges only once"""
+        pool, _, buyer_ids, art_ids = shop_db
+
+        run(pool, lambda c: purchase_art(c, buyer_ids[0], art_ids[0]))
+        assert run(pool, lambda c: purchase_art(c, buyer_ids[0], art_ids[0])) == "already_owned"
+
+        points = run(pool, lambda c: c.execute("SELECT bee_points FROM users WHERE id = ?", (buyer_ids[0],)).fetchone()[0])
+        assert points == START_POINTS - PRICE
+
+    def test_insufficient_points(self, shop_db):
+        """Test that the balance guard stops a purchase without leaving ownership behind"""
+        pool, _, buyer_ids, art_ids = shop_db
+        run(pool, lambda c: (c.execute("UPDATE users SET bee_points = 5 WHERE id = ?", (buyer_ids[0],)), c.commit()))
+
+        assert run(pool, lambda c: purchase_art(c, buyer_ids[0], art_ids[0])) == "insufficient"
+        owned = run(pool, lambda c: c.execute("SELECT COUNT(*) FROM art_ownership").fetchone()[0])
+        assert owned == 0
+
+    def test_author_and_missing_art(self, shop_db):
+        """Test that authors cannot buy their own art and unknown art is reported"""
+        pool, author_id, _, art_ids = shop_db
+
+        assert run(pool, lambda c: purchase_art(c, author_id, art_ids[0])) == "own_art"
+        assert run(pool, lambda c: purchase_art(c, author_id, 999999)) == "not_found"
+
+
+class TestPurchaseConcurrency:
+    """Concurrency benchmark: parallel buyers double-clicking every artwork"""
+
+    def test_parallel_buyers_no_anomalies(self, shop_db):
+        """Test that 50 parallel buyers never double spend or go negative"""
+        pool, author_id, buyer_ids, art_ids = shop_db
+        results = []
+        errors = []
+        lock = threading.Lock()
+        start = threading.Barrier(BUYERS)
+
+        def buyer(buyer_id):
+            start.wait()
+            for art_id in art_ids:
+                for _ in range(2):  # double click
+                    try:
+                        status = run(pool, lambda c: purchase_art(c, buyer_id, art_id))
+                    except Exception as e:
+                        with lock:
+                            errors.append(repr(e))
+                        continue
+                    with lock:
+                        results.append(status)
+
+        threads = [threading.Thread(target=buyer, args=(b,)) for b in buyer_ids]
+        began = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - began
+
+        purchased = results.count("purchased")
+        print(f"\n{len(results)} purchase attempts, {purchased} purchases in {elapsed:.2f}s "
+              f"({len(results) / elapsed:.0f} attempts/s, {purchased / elapsed:.0f} purchases/s)")
+
+        assert errors == []
+        conn = pool.acquire()
+        try:
+            rows = conn.execute("SELECT id, bee_points FROM users").fetchall()
+            points = dict(rows)
+            owned = dict(conn.execute(
+                "SELECT owner_id, COUNT(*) FROM art_ownership GROUP BY owner_id"
+            ).fetchall())
+            duplicates = conn.execute(
+                "SELECT COUNT(*) FROM (SELECT 1 FROM art_ownership GROUP BY art_id, owner_id HAVING COUNT(*) > 1)"
+            ).fetchone()[0]
+        finally:
+            pool.release(conn)
+
+        assert duplicates == 0
+        assert all(p >= 0 for p in points.values())
+        # every buyer spent exactly what they own, and could afford exactly 10
+        for buyer_id in buyer_ids:
+            assert owned.get(buyer_id, 0) == START_POINTS // PRICE
+            assert points[buyer_id] == START_POINTS - owned.get(buyer_id, 0) * PRICE
+        assert purchased == sum(owned.values())
+        assert points[author_id] == purchased * PRICE
+        assert sum(points.values()) == BUYERS * START_POINTS
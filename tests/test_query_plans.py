@@ -0,0 +1,139 @@
+"""
+Query plan regression tests.
+Runs EXPLAIN QUERY PLAN on the hot lookups from blueprints/ against a freshly
+migrated database and fails if any of them falls back to a full table scan.
+"""
+
+import pytest
+import sqlite3
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from blueprints import auth, common, draw, main, media, settings, shop
+from scripts.init_db import create_schema, apply_migrations
+
+
+# (name, sql, params) - the statements the blueprints run
+HOT_QUERIES = [
+    ("load_logged_in_user", common.USER_ID_SQL, ("bee",)),
+    ("load_logged_in_user.version", common.USER_PROFILE_VERSION_SQL, (1,)),
+    ("load_profile", common.PROFILE_SQL, (1,)),
+    ("login", auth.LOGIN_SQL, ("bee@example.com", "bee")),
+    ("register.username", auth.USERNAME_TAKEN_SQL, ("bee",)),
+    ("register.email", auth.EMAIL_TAKEN_SQL, ("bee@example.com",)),
+    ("settingsDelete", settings.DELETE_ACCOUNT_SQL, ("bee",)),
+    ("preferences", settings.PREFERENCES_SQL, (1,)),
+    ("purchase_art.ownership", shop.PURCHASE_OWNERSHIP_SQL, (1, 1, "now", 1, 1)),
+    ("download_art", media.DOWNLOAD_SQL, (1, 1)),
+    ("userPage", main.USER_PAGE_SQL, ("bee",)),
+    ("userPage.selling", main.USER_SELLING_SQL, (1,)),
+    ("userPage.owned", main.USER_OWNED_SQL, (1,)),
+    ("shop", shop.SHOP_PAGE_SQL, (1000, 5, shop.SHOP_KEY_RANGE, 16)),
+    ("resolve_art_view", common.ART_VIEW_SQL, (1, 1, 1)),
+    ("join_room_page", draw.ROOM_PASSWORD_SQL, ("room",)),
+    ("draw.room", draw.ROOM_TYPE_SQL, ("room",)),
+]
+
+
+@pytest.fixture(scope="module")
+def migrated_db(tmp_path_factory):
+    """Create the production schema and apply every migration"""
+    db_path = tmp_path_factory.mktemp("plans") / "beevy.db"
+    create_schema(db_path)
+    apply_migrations(db_path)
+
+    conn = sqlite3.connect(str(db_path))
+    yield conn
+    conn.close()
+
+
+# index walks in the index's order that the statement's LIMIT stops after one page
+# (search newest first and by price without filters); any other SCAN of a table fails
+ORDERED_SCANS = {
+    "SCAN art USING INDEX idx_art_shop",
+    "SCAN art USING INDEX idx_art_price",
+}
+
+
+def full_scans(conn, sql, params):
+    """
+    Return plan lines that read a whole table or index: tables must be
+    accessed with SEARCH. Allowed are the constant row of INSERT ... SELECT,
+    FTS5 MATCH lookups (index driven), subquery scans (an already bounded
+    result) and ORDERED_SCANS in a statement with a LIMIT.
+    """
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    details = [row[3] for row in plan]
+    return [d for d in details if d.startswith("SCAN ")
+            and d != "SCAN CONSTANT ROW"
+            and "VIRTUAL TABLE INDEX" not in d
+            and not d.startswith("SCAN (")
+            and not (d in ORDERED_SCANS and "LIMIT" in sql.upper())]
+
+
+class TestMigrations:
+    """Tests for the versioned migration runner"""
+
+    def test_user_version_recorded(self, migrated_db):
+        """Test that the applied migration number is stored in the database"""
+        version = migrated_db.execute("PRAGMA user_version").fetchone()[0]
+        assert version >= 1
+
+    def test_migrations_run_once(self, migrated_db, tmp_path):
+        """Test that re-running the migrations is a no-op"""
+        db_file = migrated_db.execute("PRAGMA database_list").fetchone()[2]
+        assert apply_migrations(Path(db_file)) == []
+
+    def test_ownership_is_unique(self, migrated_db):
+        """Test that the same artwork cannot be owned twice by one user"""
+        migrated_db.execute(
+            "INSERT INTO art_ownership (art_id, owner_id, acquired_at) VALUES (1, 1, 'now')"
+        )
+        with pytest.raises(sqlite3.IntegrityError):
+            migrated_db.execute(
+                "INSERT INTO art_ownership (art_id, owner_id, acquired_at) VALUES (1, 1, 'now')"
+            )
+        migrated_db.rollback()
+
+
+class TestQueryPlans:
+    """Tests that hot queries are served from indexes"""
+
+    @pytest.mark.parametrize("name,sql,params", HOT_QUERIES, ids=[q[0] for q in HOT_QUERIES])
+    def test_no_full_table_scan(self, migrated_db, name, sql, params):
+        """Test that the query plan never scans a whole table or index"""
+        scans = full_scans(migrated_db, sql, params)
+        assert scans == [], f"{name} does a full table scan: {scans}"
+
+
+class TestSearchPlans:
+    """Tests that every shop search filter combination is served from an index"""
+
+    COMBINATIONS = [
+        dict(q=q, art_type=art_type, min_price=min_price, author=author, sort=sort)
+        for q in (None, "bee")
+        for art_type in (None, "art")
+        for min_price in (None, 50)
+        for author in (None, "bee")
+        for sort in ("newest", "price_asc", "price_desc")
+    ]
+
+    @pytest.mark.parametrize("filters", COMBINATIONS)
+    def test_no_full_table_scan(self, migrated_db, filters):
+        """Test that search_art never scans a whole table"""
+        from search_utils import search_art
+
+        executed = []
+        migrated_db.set_trace_callback(executed.append)
+        try:
+            search_art(migrated_db, **filters)
+        finally:
+            migrated_db.set_trace_callback(None)
+
+        # the trace holds the expanded statements, FTS5 shadow table lookups are skipped
+        statements = [sql for sql in executed if "'main'." not in sql]
+        assert statements
+        for sql in statements:
+            assert full_scans(migrated_db, sql, ()) == [], sql
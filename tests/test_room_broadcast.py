@@ -0,0 +1,149 @@
+"""
+Test suite for the batched drawing room broadcast.
+Tests that draw events are coalesced per room and tick and that senders do
+not get their own events back.
+"""
+
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import app
+from draw_codec import CODEC, encode_event
+from extensions import socketio
+from room_broadcast import RoomBroadcaster
+
+
+class RecordingSocketIO:
+    """Stand-in for SocketIO that records server side emits"""
+
+    def __init__(self):
+        self.emits = []
+
+    def emit(self, event, data, to=None, skip_sid=None):
+        self.emits.append((event, data, to, sorted(skip_sid or [])))
+
+
+class TestRoomBroadcaster:
+    """Tests for RoomBroadcaster"""
+
+    def test_single_sender_is_one_message(self):
+        """Test that a tick of one drawer's events is one emit per codec that skips the drawer"""
+        sio = RecordingSocketIO()
+        broadcaster = RoomBroadcaster(sio, rate=30)
+        broadcaster._buffers = {"r1": [("a", {"n": n}, bytes([n]), False) for n in (1, 2, 3)]}
+
+        assert broadcaster.flush() == 2
+        assert sio.emits == [
+            ("draw_batch", [{"n": 1}, {"n": 2}, {"n": 3}], "r1", ["a"]),
+            ("draw_batch", b"\1\2\3", "r1#bin", ["a"]),
+        ]
+
+    def test_senders_get_only_others_events(self):
+        """Test that with several drawers each gets the batch without its own events, in its own codec"""
+        sio = RecordingSocketIO()
+        broadcaster = RoomBroadcaster(sio, rate=30)
+        broadcaster._buffers = {
+            "r1": [("a", {"n": 1}, b"\1", False), ("b", {"n": 2}, b"\2", True), ("a", {"n": 3}, b"\3", False)],
+            "r2": [("c", {"n": 4}, b"\4", True)],
+        }
+
+        assert broadcaster.flush() == 6
+        assert sio.emits == [
+            ("draw_batch", [{"n": 1}, {"n": 2}, {"n": 3}], "r1", ["a", "b"]),
+            ("draw_batch", b"\1\2\3", "r1#bin", ["a", "b"]),
+            ("draw_batch", [{"n": 2}], "a", []),
+            ("draw_batch", b"\1\3", "b", []),
+            ("draw_batch", [{"n": 4}], "r2", ["c"]),
+            ("draw_batch", b"\4", "r2#bin", ["c"]),
+        ]
+        assert broadcaster.flush() == 0
+
+    def test_background_tick(self):
+        """Test that published events are flushed by the tick thread in one batch"""
+        sio = RecordingSocketIO()
+        broadcaster = RoomBroadcaster(sio, rate=20)
+        for n in range(50):
+            broadcaster.publish("r1", "a", {"n": n}, bytes([n]))
+        time.sleep(0.3)
+        try:
+            assert len(sio.emits) == 2
+            assert [event["n"] for event in sio.emits[0][1]] == list(range(50))
+            assert sio.emits[1][1] == bytes(range(50))
+        finally:
+            broadcaster.close()
+
+
+@pytest.fixture
+def batching(monkeypatch):
+    """Turn batching on for the shared test app"""
+    broadcaster = RoomBroadcaster(socketio, rate=1)  # the test flushes itself, long before the first tick
+    monkeypatch.setitem(app.extensions, 'beevy_room_broadcaster', broadcaster)
+    yield broadcaster
+    broadcaster.close()
+
+
+class TestDrawBatch:
+    """Tests for draw_batch over Socket.IO"""
+
+    def test_viewer_gets_one_batch(self, batching):
+        """Test that a viewer receives a burst of strokes as one message and the drawer gets nothing back"""
+        room = f"test-{uuid.uuid4().hex}"
+        app.config['TESTING'] = True
+        with app.test_client() as flask_client:
+            with flask_client.session_transaction() as sess:
+                sess['verified_rooms'] = [room]
+            drawer = socketio.test_client(app, flask_test_client=flask_client)
+        viewer = socketio.test_client(app)
+        drawer.emit('join_room', {'room': room})
+        viewer.emit('join_room', {'room': room})
+        drawer.get_received()
+        viewer.get_received()
+
+        for n in range(10):
+            drawer.emit('draw', {'room': room, 'type': 'line', 'fromX': 0, 'fromY': 0, 'toX': 1, 'toY': n / 10,
+                                 'color': '#000000', 'width': '2'})
+        batching.flush()
+
+        received = viewer.get_received()
+        assert [message['name'] for message in received] == ['draw_batch']
+        assert [event['toY'] for event in received[0]['args'][0]] == [n / 10 for n in range(10)]
+        assert drawer.get_received() == []
+
+        drawer.disconnect()
+        viewer.disconnect()
+
+    def test_senders_get_batch_in_joined_codec(self, batching):
+        """Test that a drawer's batch of the others' events follows the codec it joined with, not the one it sent"""
+        room = f"test-{uuid.uuid4().hex}"
+        app.config['TESTING'] = True
+        drawers = []
+        for codec in (None, CODEC):
+            with app.test_client() as flask_client:
+                with flask_client.session_transaction() as sess:
+                    sess['verified_rooms'] = [room]
+                drawers.append(socketio.test_client(app, flask_test_client=flask_client))
+        json_drawer, binary_drawer = drawers
+        json_drawer.emit('join_room', {'room': room})
+        binary_drawer.emit('join_room', {'room': room, 'codec': CODEC})
+        json_drawer.get_received()
+        binary_drawer.get_received()
+
+        event = {'type': 'line', 'fromX': 0, 'fromY': 0, 'toX': 1, 'toY': 1, 'color': '#000000', 'width': 2}
+        json_drawer.emit('draw', {'room': room, 'op': encode_event(event)})  # sends packed, joined as JSON
+        binary_drawer.emit('draw', dict(event, room=room))                   # sends JSON, joined as binary
+        batching.flush()
+
+        [message] = json_drawer.get_received()
+        assert message['name'] == 'draw_batch'
+        assert [received['seq'] for received in message['args'][0]] == [2]
+        [message] = binary_drawer.get_received()
+        assert (message['name'], message['args'][0]) == ('draw_batch', encode_event(event, 1))
+
+        json_drawer.disconnect()
+        binary_drawer.disconnect()
@@ -0,0 +1,183 @@
+"""
+Test suite for the persistent drawing room log.
+Tests batched writes, snapshots, clears and reading rooms back after a restart.
+"""
+
+import os
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scripts.init_db import create_schema, apply_migrations
+from draw_codec import encode_event
+from room_log import RoomLog
+from room_store import MemoryRoomStore, RoomEvictor, load_room, record_event
+import room_store
+
+
+@pytest.fixture
+def log_db(tmp_path):
+    """Create a migrated database holding the room_ops table"""
+    db_path = tmp_path / "beevy.db"
+    create_schema(db_path)
+    apply_migrations(db_path)
+    return str(db_path)
+
+
+@pytest.fixture
+def room_log(log_db, tmp_path):
+    log = RoomLog(log_db, str(tmp_path / "canvas"))
+    yield log
+    log.close()
+
+
+def line(i):
+    return {"type": "line", "fromX": 0, "fromY": 0, "toX": 1, "toY": i / 100, "color": "#000000", "width": "2"}
+
+
+def op(seq, kind="line"):
+    """Packed op numbered seq"""
+    return encode_event(line(seq) if kind == "line" else {"type": kind}, seq)
+
+
+class TestRoomLog:
+    """Tests for RoomLog"""
+
+    def test_append_and_load(self, room_log):
+        """Test that events come back in sequence order after a flush"""
+        for seq in (1, 2, 3):
+            room_log.append("r1", seq, op(seq))
+        room_log.append("r2", 1, op(1))
+        room_log.flush()
+
+        assert room_log.load("r1") == (None, [op(s) for s in (1, 2, 3)], 3)
+        assert room_log.load("missing") == (None, [], 0)
+
+    def test_writes_are_batched(self, log_db, tmp_path):
+        """Test that a burst of events is committed in a few transactions, not one per event"""
+        log = RoomLog(log_db, str(tmp_path / "canvas"), batch_size=100)
+        batches = []
+        write = log._write
+        log._write = lambda conn, items: batches.append(len(items)) or write(conn, items)
+        for seq in range(1, 1001):
+            log.append("r1", seq, op(seq))
+        log.close()
+
+        assert sum(batches) == 1000
+        assert len(batches) <= 20
+        conn = sqlite3.connect(log_db)
+        assert conn.execute("SELECT COUNT(*) FROM room_ops").fetchone()[0] == 1000
+        conn.close()
+
+    def test_snapshot_replaces_covered_ops(self, room_log, log_db):
+        """Test that a snapshot is written to the canvas folder and older ops are dropped"""
+        for seq in range(1, 6):
+            room_log.append("r1", seq, op(seq))
+        room_log.save_snapshot("r1", 3, b"png")
+        room_log.flush()
+
+        snapshot, events, last = room_log.load("r1")
+        assert snapshot == b"png"
+        assert events == [op(4), op(5)]
+        assert last == 5
+        conn = sqlite3.connect(log_db)
+        assert conn.execute("SELECT MIN(seq) FROM room_ops").fetchone()[0] == 4
+        conn.close()
+
+    def test_clear_drops_history_and_snapshot(self, room_log):
+        """Test that a clear deletes what came before it, and a late older snapshot does not bring it back"""
+        room_log.append("r1", 1, op(1))
+        room_log.save_snapshot("r1", 1, b"png")
+        room_log.flush()
+        path = room_log.snapshot_path("r1")
+        assert os.path.exists(path)
+
+        room_log.clear("r1", 2, op(2, "clear"))
+        room_log.append("r1", 3, op(3))
+        room_log.flush()
+        assert not os.path.exists(path)
+        assert room_log.load("r1") == (None, [op(3)], 3)
+
+        room_log.save_snapshot("r1", 1, b"stale")
+        room_log.flush()
+        assert room_log.load("r1") == (None, [op(3)], 3)
+
+    def test_snapshot_file_name_is_safe(self, room_log, tmp_path):
+        """Test that a room ID from the client cannot pick the snapshot's location"""
+        path = Path(room_log.snapshot_path("../../etc/passwd"))
+        assert path.parent == tmp_path / "canvas"
+
+    def test_unmigrated_database(self, tmp_path):
+        """Test that the log is off until migration 004 is applied"""
+        db_path = tmp_path / "old.db"
+        sqlite3.connect(str(db_path)).close()
+        assert not RoomLog.available(str(db_path))
+
+
+class TestRestart:
+    """Tests for reading rooms back from the log"""
+
+    def test_room_survives_restart(self, log_db, tmp_path, monkeypatch):
+        """Test that a room is rebuilt on first use and numbering continues"""
+        monkeypatch.setattr(room_store, "MAX_HISTORY", 20)
+        monkeypatch.setattr(room_store, "HISTORY_TAIL", 5)
+        log = RoomLog(log_db, str(tmp_path / "canvas"))
+        store = MemoryRoomStore()
+        for i in range(30):
+            record_event(store, "r1", line(i), log)
+        before = store.state("r1")
+        log.close()
+
+        # new process: empty store, same database
+        log = RoomLog(log_db, str(tmp_path / "canvas"))
+        store = MemoryRoomStore()
+        load_room(store, log, "r1")
+        assert store.state("r1") == before
+
+        event = line(30)
+        record_event(store, "r1", event, log)
+        assert event["seq"] == 31
+        log.close()
+
+    def test_clear_survives_restart(self, log_db, tmp_path):
+        """Test that a cleared room stays empty after a restart"""
+        log = RoomLog(log_db, str(tmp_path / "canvas"))
+        store = MemoryRoomStore()
+        record_event(store, "r1", line(1), log)
+        record_event(store, "r1", {"type": "clear"}, log)
+        log.close()
+
+        store = MemoryRoomStore()
+        log = RoomLog(log_db, str(tmp_path / "canvas"))
+        load_room(store, log, "r1")
+        assert store.state("r1") == (None, [])
+        event = line(2)
+        record_event(store, "r1", event, log)
+        assert event["seq"] == 3
+        log.close()
+
+    def test_evicted_room_is_reloaded(self, log_db, tmp_path, monkeypatch):
+        """Test that a room dropped from memory comes back from the log as it was"""
+        monkeypatch.setattr(room_store, "MAX_HISTORY", 20)
+        monkeypatch.setattr(room_store, "HISTORY_TAIL", 5)
+        log = RoomLog(log_db, str(tmp_path / "canvas"))
+        store = MemoryRoomStore()
+        for i in range(30):
+            record_event(store, "r1", line(i), log)
+        record_event(store, "r2", line(0), log)
+        store.join("r2", "sid-a")
+        before = store.state("r1")
+
+        assert RoomEvictor(store, log, idle_after=0, budget=0).run_once() == ["r1"]
+        assert store.usage().keys() == {"r2"}
+
+        load_room(store, log, "r1")
+        assert store.state("r1") == before
+        event = line(30)
+        record_event(store, "r1", event, log)
+        assert event["seq"] == 31
+        log.close()
@@ -0,0 +1,731 @@
+"""
+Test suite for the drawing room state.
+Tests the in-process and Redis room stores, the Socket.IO drawing events and
+the worker settings in gunicorn.conf.py.
+"""
+
+import runpy
+import struct
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import app
+from blueprints import draw
+from extensions import socketio
+from draw_codec import decode_ops, encode_event, op_seq
+import room_store
+from room_store import MemoryRoomStore, OpList, RedisRoomStore, create_room_store, get_room_store, record_event
+
+ROOT = Path(__file__).parent.parent
+
+
+def op(kind="line", seq=0, toY=0.5):
+    """Packed op of a simple event"""
+    if kind == "clear":
+        return encode_event({"type": "clear"}, seq)
+    return encode_event({"type": kind, "fromX": 0, "fromY": 0, "toX": 1, "toY": toY,
+                         "color": "#000000", "width": 2}, seq)
+
+
+class FakeRedis:
+    """Stand-in for redis.Redis with the string, list and set commands the room store uses"""
+
+    def __init__(self, data=None):
+        self.data = {} if data is None else data  # shared dict = shared server
+
+    def eval(self, script, numkeys, *args):
+        keys, argv = args[:numkeys], args[numkeys:]
+        if script == RedisRoomStore.APPEND_SCRIPT:
+            seq_key, history_key = keys
+            seq = FakeRedis.incr(self, seq_key)
+            return [seq, FakeRedis.rpush(self, history_key, struct.pack('<I', seq) + argv[0][4:])]
+        if script == RedisRoomStore.CLEAR_SCRIPT:
+            epoch_key, history_key, snapshot_key, seq_key = keys
+            FakeRedis.incr(self, epoch_key)
+            FakeRedis.delete(self, history_key)
+            FakeRedis.delete(self, snapshot_key)
+            return FakeRedis.incr(self, seq_key)
+        if script == RedisRoomStore.COMPACT_SCRIPT:
+            epoch_key, snapshot_key, history_key = keys
+            if (FakeRedis.get(self, epoch_key) or b'') != argv[0]:
+                return 0
+            FakeRedis.set(self, snapshot_key, argv[1])
+            FakeRedis.ltrim(self, history_key, argv[2], -1)
+            return 1
+        assert script == RedisRoomStore.RESTORE_SCRIPT
+        seq_key, snapshot_key, history_key = keys
+        if not FakeRedis.set(self, seq_key, argv[0], nx=True):
+            return 0
+        if argv[1]:
+            FakeRedis.set(self, snapshot_key, argv[1])
+        for op in argv[2:]:
+            FakeRedis.rpush(self, history_key, op)
+        return 1
+
+    def exists(self, key):
+        return int(key in self.data)
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = str(value).encode() if isinstance(value, int) else value
+        return True
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1).encode()
+        return int(self.data[key])
+
+    def rpush(self, key, value):
+        self.data.setdefault(key, []).append(value)
+        return len(self.data[key])
+
+    def llen(self, key):
+        return len(self.data.get(key, ()))
+
+    def lindex(self, key, index):
+        items = self.data.get(key, [])
+        return items[index] if -len(items) <= index < len(items) else None
+
+    def lrange(self, key, start, end):
+        items = self.data.get(key, [])
+        return items[start:] if end == -1 else items[start:end + 1]
+
+    def ltrim(self, key, start, end):
+        self.data[key] = self.data.get(key, [])[start:] if end == -1 else self.data.get(key, [])[start:end + 1]
+
+    def sadd(self, key, member):
+        self.data.setdefault(key, set()).add(member.encode())
+
+    def srem(self, key, member):
+        self.data.get(key, set()).discard(member.encode())
+
+    def smembers(self, key):
+        return set(self.data.get(key, set()))
+
+    def scard(self, key):
+        return len(self.data.get(key, ()))
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+class InterleavingRedis(FakeRedis):
+    """
+    FakeRedis where another worker runs action(store) after every command,
+    or only after command number `at`. A script runs whole.
+    """
+
+    def __init__(self, data, action, at=None):
+        super().__init__(data)
+        self.other = RedisRoomStore(FakeRedis(data))
+        self.action = action
+        self.at = at
+        self.commands = 0
+
+    def _then_interleave(self, result):
+        if self.at is None or self.commands == self.at:
+            self.action(self.other)
+        self.commands += 1
+        return result
+
+    def eval(self, *args):
+        return self._then_interleave(super().eval(*args))
+
+    def get(self, key):
+        return self._then_interleave(super().get(key))
+
+    def set(self, *args, **kwargs):
+        return self._then_interleave(super().set(*args, **kwargs))
+
+    def incr(self, key):
+        return self._then_interleave(super().incr(key))
+
+    def rpush(self, key, value):
+        return self._then_interleave(super().rpush(key, value))
+
+    def llen(self, key):
+        return self._then_interleave(super().llen(key))
+
+    def lrange(self, key, start, end):
+        return self._then_interleave(super().lrange(key, start, end))
+
+    def ltrim(self, key, start, end):
+        return self._then_interleave(super().ltrim(key, start, end))
+
+    def delete(self, key):
+        return self._then_interleave(super().delete(key))
+
+
+@pytest.fixture(params=["memory", "redis"])
+def store(request):
+    """Room store of either kind"""
+    if request.param == "memory":
+        return MemoryRoomStore()
+    return RedisRoomStore(FakeRedis())
+
+
+class TestRoomStore:
+    """Tests for MemoryRoomStore and RedisRoomStore"""
+
+    def test_history_in_order(self, store):
+        """Test that ops come back in the order they were drawn, numbered per room"""
+        assert store.append("r1", op("line")) == (1, 1)
+        assert store.append("r1", op("rect", seq=99)) == (2, 2)   # a client cannot pick its number
+        store.append("r2", op("rect"))
+
+        assert store.history("r1") == [op("line", 1), op("rect", 2)]
+        assert store.history("r2") == [op("rect", 1)]
+        assert store.history("missing") == []
+
+    def test_clear_continues_sequence(self, store):
+        """Test that a clear empties the room but takes the next number"""
+        store.append("r1", op())
+        assert store.clear("r1") == 2
+        assert store.append("r1", op())[0] == 3
+        assert store.state("r1") == (None, [op("line", 3)])
+
+    def test_restore_only_unknown_rooms(self, store):
+        """Test that a room read from the log is loaded once and numbering continues after it"""
+        assert not store.known("r1")
+        assert store.restore("r1", b"png", [op("line", 41)], 41)
+        assert not store.restore("r1", None, [], 0)
+        store.append("r1", op("rect"))
+
+        assert store.known("r1")
+        assert store.state("r1") == (b"png", [op("line", 41), op("rect", 42)])
+
+    def test_ops_after(self, store):
+        """Test paging through the history by sequence number"""
+        ops = [op(seq=i + 1, toY=i / 10) for i in range(10)]
+        for i in range(10):
+            store.append("r1", op(toY=i / 10))
+
+        assert store.state("r1", 3) == (None, ops[:3])
+        assert store.ops_after("r1", 0, 3) == ops[:3]
+        assert store.ops_after("r1", 8, 5) == ops[8:]
+        assert store.ops_after("r1", 10, 5) == []
+        assert store.last_seq("r1") == 10
+        assert store.ops_after("missing", 0, 5) == []
+
+        # ops folded into a snapshot cannot be paged any more
+        store.compact("r1", 3, lambda base, folded: b"png")
+        assert store.ops_after("r1", 2, 5) is None
+        assert store.ops_after("r1", 7, 5) == ops[7:]
+
+        assert store.clear("r1") == 11
+        assert store.ops_after("r1", 10, 5) is None
+        assert store.ops_after("r1", 11, 5) == []
+
+    def test_membership(self, store):
+        """Test that a disconnected sid leaves every room it joined"""
+        store.join("r1", "sid-a")
+        store.join("r2", "sid-a")
+        store.join("r1", "sid-b")
+
+        assert store.member_count("r1") == 2
+        assert store.leave_all("sid-a") == {"r1", "r2"}
+        assert store.member_count("r1") == 1
+        assert store.member_count("r2") == 0
+        assert store.leave_all("sid-a") == set()
+
+    def test_compact_folds_old_events(self, store):
+        """Test that all but the tail go into the snapshot"""
+        for i in range(10):
+            store.append("r1", op(toY=i / 10))
+
+        calls = []
+        assert store.compact("r1", 3, lambda base, ops: calls.append((base, ops)) or b"png")
+        assert calls == [(None, [op(seq=i + 1, toY=i / 10) for i in range(7)])]
+        assert store.state("r1") == (b"png", [op(seq=i + 1, toY=i / 10) for i in range(7, 10)])
+
+        # the next compaction starts from the previous snapshot
+        store.append("r1", op(toY=1))
+        assert store.compact("r1", 1, lambda base, ops: base + b"+" + bytes(len(ops)))
+        assert store.state("r1") == (b"png+\0\0\0", [op(seq=11, toY=1)])
+        assert not store.compact("r1", 1, lambda base, ops: b"unused")
+
+    def test_clear_during_compaction_wins(self, store):
+        """Test that a clear while the snapshot renders is not undone by it"""
+        for i in range(5):
+            store.append("r1", op())
+
+        def render(base, ops):
+            store.clear("r1")
+            store.append("r1", op("rect"))
+            return b"stale"
+
+        assert not store.compact("r1", 1, render)
+        assert store.state("r1") == (None, [op("rect", 7)])
+
+    def test_record_event_bounds_history(self, store, monkeypatch):
+        """Test that the history never grows past MAX_HISTORY and clear resets the room"""
+        monkeypatch.setattr(room_store, "MAX_HISTORY", 20)
+        monkeypatch.setattr(room_store, "HISTORY_TAIL", 5)
+        line = {"type": "line", "fromX": 0, "fromY": 0, "toX": 1, "toY": 1, "color": "#000000", "width": "3"}
+        for i in range(50):
+            event = dict(line)
+            assert record_event(store, "r1", event) == encode_event(line, i + 1)
+            assert event["seq"] == i + 1
+            assert len(store.history("r1")) <= 20
+
+        snapshot, _ = store.state("r1")
+        assert snapshot.startswith(b"\x89PNG")
+
+        record_event(store, "r1", {"type": "clear"})
+        assert store.state("r1") == (None, [])
+
+    def test_redis_store_is_shared_between_workers(self):
+        """Test that two workers on the same Redis see the same room"""
+        server = {}
+        first, second = RedisRoomStore(FakeRedis(server)), RedisRoomStore(FakeRedis(server))
+        first.append("r1", op())
+        first.join("r1", "sid-a")
+        second.join("r1", "sid-b")
+
+        assert second.history("r1") == [op("line", 1)]
+        assert first.member_count("r1") == 2
+
+    def test_redis_clear_is_atomic(self):
+        """Test that an append from another worker lands wholly before or after a clear"""
+        server = {}
+        store = RedisRoomStore(InterleavingRedis(server, lambda other: other.append("r1", op())))
+        cleared = store.clear("r1")
+
+        history = RedisRoomStore(FakeRedis(server)).history("r1")
+        assert history and all(op_seq(item) > cleared for item in history)
+
+    def test_redis_restore_is_atomic(self):
+        """Test that no append from another worker ends up between the restored ops"""
+        server = {}
+        store = RedisRoomStore(InterleavingRedis(server, lambda other: other.append("r1", op())))
+        assert store.restore("r1", b"png", [op(seq=41), op(seq=42)], 42)
+
+        snapshot, history = RedisRoomStore(FakeRedis(server)).state("r1")
+        assert snapshot == b"png"
+        assert [op_seq(item) for item in history] == [41, 42, 43]
+
+    @pytest.mark.parametrize("at", range(7))
+    def test_redis_compact_loses_to_clear(self, at):
+        """Test that a clear from another worker at any point of a compaction is not undone"""
+        server = {}
+        reader = RedisRoomStore(FakeRedis(server))
+        for i in range(5):
+            reader.append("r1", op())
+        cleared = []
+        store = RedisRoomStore(InterleavingRedis(server, lambda other: cleared.append(other.clear("r1")), at=at))
+        compacted = store.compact("r1", 1, lambda base, ops: b"png")
+
+        assert cleared, "the compaction ran fewer commands than expected"
+        assert reader.state("r1") == (None, [])
+        assert not compacted or at >= 5  # only a clear after the compaction's own write
+
+    def test_evict_idle_rooms(self):
+        """Test that idle rooms without members are dropped, rooms in use are kept"""
+        store = MemoryRoomStore()
+        for room in ("busy", "idle", "recent"):
+            store.append(room, op())
+        store.join("busy", "sid-a")
+        later = time.monotonic() + 1000
+
+        assert store.usage()["idle"] == {"ops": 1, "bytes": 23, "members": 0, "idle": pytest.approx(0, abs=1)}
+        assert store.evict_idle(idle_after=600, budget=10**9) == []
+        assert sorted(store.evict_idle(idle_after=600, budget=10**9, now=later)) == ["idle", "recent"]
+        assert set(store.usage()) == {"busy"}
+        assert not store.known("idle")
+
+    def test_evict_over_budget(self):
+        """Test that over the budget the least recently used rooms go first, before their idle timeout"""
+        store = MemoryRoomStore()
+        for room in ("a", "b", "c"):
+            for _ in range(10):
+                store.append(room, op())
+        store.history("a")  # used last
+
+        assert store.evict_idle(idle_after=600, budget=2 * 230, min_idle=0) == ["b"]
+        assert store.evict_idle(idle_after=600, budget=2 * 230, min_idle=60) == []
+        assert set(store.usage()) == {"a", "c"}
+
+    def test_create_room_store(self):
+        """Test that no URL means an in-process store and unknown URLs are refused"""
+        assert isinstance(create_room_store(None), MemoryRoomStore)
+        with pytest.raises(ValueError):
+            create_room_store("amqp://localhost")
+
+
+class TestOpList:
+    """Tests for OpList, the packed history of a room in memory"""
+
+    def test_append_and_index(self):
+        """Test that ops of different sizes come back one by one and as slices"""
+        ops = [op("line", 1), encode_event({"type": "stroke", "points": [0, 0, 1, 1], "color": "#000", "width": 1}, 2),
+               op("clear", 3), op("rect", 4)]
+        packed = OpList(ops)
+
+        assert len(packed) == 4
+        assert list(packed) == ops
+        assert packed[1] == ops[1]
+        assert packed[-1] == ops[-1]
+        assert packed[1:3] == ops[1:3]
+        assert packed[:0] == []
+        assert packed.tobytes() == b"".join(ops)
+        with pytest.raises(IndexError):
+            packed[4]
+
+    def test_drop(self):
+        """Test that dropping the oldest ops keeps the rest addressable"""
+        ops = [op(seq=i, toY=i / 10) for i in range(10)]
+        packed = OpList(ops)
+        packed.drop(7)
+        assert list(packed) == ops[7:]
+        packed.append(ops[0])
+        assert packed[-1] == ops[0]
+        packed.drop(10)
+        assert len(packed) == 0 and packed.tobytes() == b""
+
+    def test_smaller_than_a_list(self):
+        """Test that an op costs its packed size plus the offset"""
+        packed = OpList(op(seq=i) for i in range(1000))
+        assert packed.nbytes == 1000 * (19 + 4)
+
+
+class TestConcurrency:
+    """Stress tests for MemoryRoomStore under the threading async mode"""
+
+    def test_concurrent_appends_lose_nothing(self):
+        """Test that hundreds of threads drawing in a few rooms, with compaction running, lose and repeat no op"""
+        store = MemoryRoomStore()
+        threads, per_thread, rooms = 200, 50, 10
+        barrier = threading.Barrier(threads + 1)
+        done = threading.Event()
+
+        def drawer(n):
+            barrier.wait()
+            for i in range(per_thread):
+                store.append(f"r{(n + i) % rooms}", op())
+
+        def compactor():
+            barrier.wait()
+            while not done.is_set():
+                for r in range(rooms):
+                    store.compact(f"r{r}", 20, lambda base, ops: (base or b"") + bytes([len(ops) % 256]))
+                    store.usage()
+
+        workers = [threading.Thread(target=drawer, args=(n,)) for n in range(threads)]
+        background = threading.Thread(target=compactor)
+        for thread in workers + [background]:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        done.set()
+        background.join()
+
+        assert sum(store.last_seq(f"r{r}") for r in range(rooms)) == threads * per_thread
+        for r in range(rooms):
+            seqs = [op_seq(packed) for packed in store.history(f"r{r}")]
+            # whatever was not compacted is one unbroken run ending at the last number
+            assert seqs == list(range(store.last_seq(f"r{r}") - len(seqs) + 1, store.last_seq(f"r{r}") + 1))
+
+    def test_first_append_to_a_new_room_from_many_threads(self):
+        """Test that threads creating the same room at once end up in one room"""
+        store = MemoryRoomStore()
+        barrier = threading.Barrier(100)
+
+        def drawer():
+            barrier.wait()
+            store.append("new", op())
+
+        workers = [threading.Thread(target=drawer) for _ in range(100)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        assert [op_seq(packed) for packed in store.history("new")] == list(range(1, 101))
+
+    def test_writer_retries_an_evicted_room(self):
+        """Test that a write racing an eviction reads the room back and continues its numbering"""
+        store = MemoryRoomStore(loader=lambda room: (b"png", [op(seq=1)], 1))  # the log holds the first op
+        store.append("r1", op())
+        old = store._rooms["r1"]
+        old.lock.acquire()
+        result = []
+        writer = threading.Thread(target=lambda: result.append(store.append("r1", op())))
+        writer.start()
+        time.sleep(0.05)  # the writer now waits for the old state's lock
+        old.evicted = True
+        del store._rooms["r1"]
+        old.lock.release()
+        writer.join()
+
+        assert result == [(2, 2)]
+        assert store._rooms["r1"] is not old
+        assert store.state("r1") == (b"png", [op(seq=1), op(seq=2)])
+
+
+@pytest.fixture
+def room():
+    return f"test-{uuid.uuid4().hex}"
+
+
+@pytest.fixture
+def flask_client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+
+def socket_client(flask_client, verified_rooms=()):
+    with flask_client.session_transaction() as sess:
+        sess['verified_rooms'] = list(verified_rooms)
+    return socketio.test_client(app, flask_test_client=flask_client)
+
+
+class TestDrawEvents:
+    """Tests for the Socket.IO drawing events"""
+
+    def test_draw_is_stored_and_replayed(self, flask_client, room):
+        """Test that a late joiner gets the room's history"""
+        drawer = socket_client(flask_client, [room])
+        drawer.emit('join_room', {'room': room})
+        line = {'type': 'line', 'fromX': 0, 'fromY': 1, 'toX': 1, 'toY': 0, 'color': '#ff0000', 'width': '3'}
+        drawer.emit('draw', dict(line, room=room))
+
+        with app.app_context():
+            assert get_room_store().history(room) == [encode_event(line, 1)]
+
+        late = socketio.test_client(app)
+        late.emit('join_room', {'room': room})
+        received = late.get_received()
+        assert received[0]['name'] == 'draw_history'
+        assert received[0]['args'][0] == {'from': 1, 'to': 1, 'target': 1, 'more': False,
+                                          'ops': [dict(line, width=3.0, seq=1)]}
+
+        drawer.disconnect()
+        late.disconnect()
+
+    def test_long_history_is_sent_as_snapshot(self, flask_client, room, monkeypatch):
+        """Test that a joiner gets one image plus the tail once the room was compacted"""
+        monkeypatch.setattr(room_store, "MAX_HISTORY", 10)
+        monkeypatch.setattr(room_store, "HISTORY_TAIL", 4)
+        drawer = socket_client(flask_client, [room])
+        drawer.emit('join_room', {'room': room})
+        for i in range(11):
+            drawer.emit('draw', {'room': room, 'type': 'line', 'fromX': 0, 'fromY': 0,
+                                 'toX': 1, 'toY': i / 10, 'color': '#000000', 'width': '2'})
+
+        late = socketio.test_client(app)
+        late.emit('join_room', {'room': room})
+        received = late.get_received()
+        assert received[0]['name'] == 'draw_snapshot'
+        state = received[0]['args'][0]
+        assert state['image'].startswith(b'\x89PNG')
+        assert [event['toY'] for event in state['history']['ops']] == pytest.approx([0.7, 0.8, 0.9, 1.0], abs=1e-4)
+
+        drawer.disconnect()
+        late.disconnect()
+
+    def test_stroke_is_one_op(self, flask_client, room):
+        """Test that a stroke is stored and fanned out as a single event"""
+        drawer = socket_client(flask_client, [room])
+        drawer.emit('join_room', {'room': room})
+        viewer = socketio.test_client(app)
+        viewer.emit('join_room', {'room': room})
+        viewer.get_received()
+
+        points = [0.1, 0.1, 0.2, 0.15, 0.3, 0.2, 0.4, 0.3, 0.5, 0.3]
+        drawer.emit('draw', {'room': room, 'type': 'stroke', 'color': '#000000', 'width': '4', 'points': points})
+        drawer.emit('draw', {'room': room, 'type': 'stroke', 'color': '#000000', 'width': '4', 'points': [0.1]})
+
+        with app.app_context():
+            history = decode_ops(get_room_store().history(room))
+        assert [event['points'] for event in history] == [pytest.approx(points, abs=1e-4)]
+        received = viewer.get_received()
+        assert [(message['name'], message['args'][0]['points']) for message in received] == [('draw', points)]
+
+        drawer.disconnect()
+        viewer.disconnect()
+
+    def test_history_is_replayed_in_chunks(self, flask_client, room, monkeypatch):
+        """Test that a joiner gets the history one acked chunk at a time, up to the seq at join"""
+        monkeypatch.setattr(draw, "HISTORY_CHUNK", 4)
+        drawer = socket_client(flask_client, [room])
+        drawer.emit('join_room', {'room': room})
+        for i in range(10):
+            drawer.emit('draw', {'room': room, 'type': 'line', 'fromX': 0, 'fromY': 0,
+                                 'toX': 1, 'toY': i / 10, 'color': '#000000', 'width': '2'})
+
+        late = socketio.test_client(app)
+        late.emit('join_room', {'room': room})
+        [message] = late.get_received()
+        chunk = message['args'][0]
+        assert message['name'] == 'draw_history'
+        assert (chunk['from'], chunk['to'], chunk['target'], chunk['more']) == (1, 4, 10, True)
+
+        # drawn during the replay: comes live, not in the replay
+        drawer.emit('draw', {'room': room, 'type': 'clear'})
+        drawer.emit('draw', {'room': room, 'type': 'bucket', 'x': 0.5, 'y': 0.5, 'color': '#ff0000'})
+        assert [message['args'][0]['seq'] for message in late.get_received()] == [11, 12]
+
+        late.emit('history_ack', {'room': room, 'to': 4, 'target': 10})
+        [message] = late.get_received()
+        # the clear dropped the rest, the replay starts over from the room as it is now
+        assert message['name'] == 'draw_snapshot'
+        assert message['args'][0]['image'] is None
+        assert [event['seq'] for event in message['args'][0]['history']['ops']] == [12]
+        assert message['args'][0]['history']['more'] is False
+
+        drawer.disconnect()
+        late.disconnect()
+
+    def test_history_ack_pages_to_target(self, flask_client, room, monkeypatch):
+        """Test that acks walk the history and stop at the target even when more was drawn since"""
+        monkeypatch.setattr(draw, "HISTORY_CHUNK", 4)
+        drawer = socket_client(flask_client, [room])
+        drawer.emit('join_room', {'room': room})
+        for i in range(12):
+            drawer.emit('draw', {'room': room, 'type': 'line', 'fromX': 0, 'fromY': 0,
+                                 'toX': 1, 'toY': i / 12, 'color': '#000000', 'width': '2'})
+
+        late = socketio.test_client(app)
+        late.emit('join_room', {'room': room})
+        late.get_received()
+        chunks = []
+        late.emit('history_ack', {'room': room, 'to': 0, 'target': 10})
+        while True:
+            [message] = late.get_received()
+            chunk = message['args'][0]
+            chunks.append((chunk['from'], chunk['to'], chunk['more']))
+            if not chunk['more']:
+                break
+            late.emit('history_ack', {'room': room, 'to': chunk['to'], 'target': 10})
+        assert chunks == [(1, 4, True), (5, 8, True), (9, 10, False)]
+
+        late.emit('history_ack', {'room': room, 'to': 'x'})  # malformed, ignored
+        assert late.get_received() == []
+        drawer.disconnect()
+        late.disconnect()
+
+    def test_history_ack_needs_join(self, flask_client, room):
+        """Test that a sid that did not join the room gets none of its history by acking"""
+        drawer = socket_client(flask_client, [room])
+        drawer.emit('join_room', {'room': room})
+        drawer.emit('draw', {'room': room, 'type': 'bucket', 'x': 0.5, 'y': 0.5, 'color': '#ff0000'})
+
+        outsider = socketio.test_client(app)
+        outsider.emit('join_room', {'room': f"{room}-other"})
+        outsider.get_received()
+        outsider.emit('history_ack', {'room': room, 'to': 0, 'target': 1})
+        assert outsider.get_received() == []
+
+        drawer.disconnect()
+        outsider.disconnect()
+
+    def test_reconnect_gets_only_missed_ops(self, flask_client, room, monkeypatch):
+        """Test that a join with `since` replays the ops after it, or the whole room when they are gone"""
+        monkeypatch.setattr(room_store, "MAX_HISTORY", 10)
+        monkeypatch.setattr(room_store, "HISTORY_TAIL", 4)
+        drawer = socket_client(flask_client, [room])
+        drawer.emit('join_room', {'room': room})
+        for i in range(10):
+            drawer.emit('draw', {'room': room, 'type': 'line', 'fromX': 0, 'fromY': 0,
+                                 'toX': 1, 'toY': i / 10, 'color': '#000000', 'width': '2'})
+
+        client = socketio.test_client(app)
+        client.emit('join_room', {'room': room, 'since': 7})
+        [message] = client.get_received()
+        assert message['name'] == 'draw_history'
+        assert [event['seq'] for event in message['args'][0]['ops']] == [8, 9, 10]
+
+        client.emit('join_room', {'room': room, 'since': 10})
+        [message] = client.get_received()
+        assert (message['args'][0]['ops'], message['args'][0]['more']) == ([], False)
+
+        # seq 1-7 are folded into the snapshot by the 11th op, a client behind that gets it plus the tail
+        drawer.emit('draw', {'room': room, 'type': 'bucket', 'x': 0.5, 'y': 0.5, 'color': '#ff0000'})
+        client.get_received()
+        client.emit('join_room', {'room': room, 'since': 3})
+        [message] = client.get_received()
+        assert message['name'] == 'draw_snapshot'
+        assert message['args'][0]['image'].startswith(b'\x89PNG')
+        assert [event['seq'] for event in message['args'][0]['history']['ops']] == [8, 9, 10, 11]
+
+        # a cursor from another numbering (server restarted without the log) starts over
+        client.emit('join_room', {'room': room, 'since': 500})
+        [message] = client.get_received()
+        assert message['name'] == 'draw_snapshot'
+
+        drawer.disconnect()
+        client.disconnect()
+
+    def test_unverified_draw_is_ignored(self, flask_client, room):
+        """Test that a sid without the room in its session cannot draw"""
+        client = socket_client(flask_client)
+        client.emit('join_room', {'room': room})
+        client.emit('draw', {'room': room, 'type': 'clear'})
+
+        with app.app_context():
+            assert get_room_store().history(room) == []
+        client.disconnect()
+
+    def test_draw_needs_join(self, flask_client, room):
+        """Test that the permission is taken on join_room, not read from the session on every event"""
+        client = socket_client(flask_client, [room])
+        client.emit('draw', {'room': room, 'type': 'clear'})
+        with app.app_context():
+            assert get_room_store().last_seq(room) == 0
+
+        client.emit('join_room', {'room': room})
+        client.emit('draw', {'room': room, 'type': 'clear'})
+        with app.app_context():
+            assert get_room_store().last_seq(room) == 1
+
+        sid = next(sid for sid, rooms in draw.drawable_rooms.items() if room in rooms)
+        client.disconnect()
+        assert sid not in draw.drawable_rooms and sid not in draw.joined_rooms
+
+    def test_disconnect_leaves_room(self, flask_client, room):
+        """Test that membership is cleared on disconnect"""
+        client = socket_client(flask_client)
+        client.emit('join_room', {'room': room})
+        with app.app_context():
+            assert get_room_store().member_count(room) == 1
+
+        client.disconnect()
+        with app.app_context():
+            assert get_room_store().member_count(room) == 0
+
+
+def load_gunicorn_conf(monkeypatch, **env):
+    for name in ("BEEVY_MESSAGE_QUEUE", "WEB_CONCURRENCY"):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    return runpy.run_path(str(ROOT / "gunicorn.conf.py"))
+
+
+class TestGunicornConf:
+    """Tests for the worker settings in gunicorn.conf.py"""
+
+    def test_single_worker_without_queue(self, monkeypatch):
+        """Test that without a message queue only one worker runs, whatever WEB_CONCURRENCY says"""
+        assert load_gunicorn_conf(monkeypatch)["workers"] == 1
+        assert load_gunicorn_conf(monkeypatch, WEB_CONCURRENCY="4")["workers"] == 1
+
+    def test_workers_with_queue(self, monkeypatch):
+        """Test that with a message queue workers follow the CPU count or WEB_CONCURRENCY"""
+        import multiprocessing
+
+        conf = load_gunicorn_conf(monkeypatch, BEEVY_MESSAGE_QUEUE="redis://localhost:6379/0")
+        assert conf["workers"] == multiprocessing.cpu_count()
+        assert conf["worker_class"] == "gthread"
+        conf = load_gunicorn_conf(monkeypatch, BEEVY_MESSAGE_QUEUE="redis://localhost:6379/0", WEB_CONCURRENCY="3")
+        assert conf["workers"] == 3
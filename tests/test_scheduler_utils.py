@@ -0,0 +1,143 @@
+"""
+Test suite for scheduler leader election.
+Tests that the scheduler lease has a single owner, expires, renews and hands over.
+"""
+
+import pytest
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scripts.init_db import create_schema, apply_migrations
+from backup_utils import get_snapshots_list, restore_snapshot
+from scheduler_utils import LeaderElection, LeaderLease, daily_backup_job
+
+
+@pytest.fixture
+def lease_db(tmp_path):
+    """Create a migrated database holding the scheduler_leases table"""
+    db_path = tmp_path / "beevy.db"
+    create_schema(db_path)
+    apply_migrations(db_path)
+    return str(db_path)
+
+
+class TestLeaderLease:
+    """Tests for LeaderLease"""
+
+    def test_single_owner(self, lease_db):
+        """Test that a held lease cannot be taken by another process"""
+        first, second = LeaderLease(lease_db, owner="a"), LeaderLease(lease_db, owner="b")
+        assert first.acquire(now=1000)
+        assert not second.acquire(now=1001)
+        assert first.acquire(now=1002)  # renewal
+
+    def test_expired_lease_is_taken_over(self, lease_db):
+        """Test that a stalled leader loses the lease after the TTL"""
+        first = LeaderLease(lease_db, owner="a", ttl=60)
+        second = LeaderLease(lease_db, owner="b", ttl=60)
+        assert first.acquire(now=1000)
+        assert second.acquire(now=1061)
+        assert not first.acquire(now=1062)
+        assert not first.held(now=1062)
+
+    def test_release_hands_over(self, lease_db):
+        """Test that a released lease is free right away"""
+        first, second = LeaderLease(lease_db, owner="a"), LeaderLease(lease_db, owner="b")
+        first.acquire()
+        first.release()
+        assert not first.held()
+        assert second.acquire()
+
+    def test_concurrent_acquire(self, lease_db):
+        """Test that exactly one of many simultaneous candidates wins"""
+        leases = [LeaderLease(lease_db, owner=f"worker-{i}") for i in range(16)]
+        barrier = threading.Barrier(len(leases))
+        results = {}
+
+        def run(lease):
+            barrier.wait()
+            results[lease.owner] = lease.acquire()
+
+        threads = [threading.Thread(target=run, args=(lease,)) for lease in leases]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sum(results.values()) == 1
+
+    def test_unmigrated_database(self, tmp_path):
+        """Test that a database without the lease table means standing by"""
+        db_path = tmp_path / "old.db"
+        sqlite3.connect(str(db_path)).close()
+        assert not LeaderLease(str(db_path)).acquire()
+
+
+class TestLeaderElection:
+    """Tests for LeaderElection"""
+
+    def test_callbacks_follow_leadership(self, lease_db):
+        """Test that elected and deposed callbacks run on changes only"""
+        events = []
+        election = LeaderElection(LeaderLease(lease_db, owner="a"),
+                                  on_elected=lambda: events.append("elected"),
+                                  on_deposed=lambda: events.append("deposed"))
+        assert election.check()
+        assert election.check()
+
+        # another process takes the lease over after a stall
+        conn = sqlite3.connect(lease_db)
+        conn.execute("UPDATE scheduler_leases SET owner = 'b', expires_at = ?", (time.time() + 60,))
+        conn.commit()
+        conn.close()
+        assert not election.check()
+
+        assert events == ["elected", "deposed"]
+
+    def test_standby_takes_over_after_stop(self, lease_db):
+        """Test that a standby process becomes leader once the leader stops"""
+        leader = LeaderElection(LeaderLease(lease_db, owner="a"), lambda: None, lambda: None, interval=0.01)
+        standby = LeaderElection(LeaderLease(lease_db, owner="b"), lambda: None, lambda: None, interval=0.01)
+        leader.start()
+        time.sleep(0.05)
+        standby.start()
+        time.sleep(0.05)
+        assert leader.is_leader and not standby.is_leader
+
+        leader.stop()
+        time.sleep(0.1)
+        try:
+            assert standby.is_leader
+        finally:
+            standby.stop()
+
+
+class TestDailyBackupJob:
+    """Tests for daily_backup_job"""
+
+    def test_snapshots_the_configured_database(self, lease_db, tmp_path, monkeypatch):
+        """Test that the job backs up the database it is given, not beevy.db in the working directory"""
+        monkeypatch.setenv("HOME", str(tmp_path / "home"))
+        monkeypatch.chdir(tmp_path)  # no beevy.db here
+        db_path = tmp_path / "data" / "other.db"
+        db_path.parent.mkdir()
+        conn = sqlite3.connect(str(db_path))
+        conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY)")
+        conn.commit()
+        conn.close()
+        lease = LeaderLease(lease_db, owner="a")
+        lease.acquire()
+
+        daily_backup_job(lease, None, str(db_path))
+
+        [snapshot] = get_snapshots_list()
+        restored = tmp_path / "restored.db"
+        restore_snapshot(snapshot, str(restored))
+        conn = sqlite3.connect(str(restored))
+        assert conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall() == [("items",)]
+        conn.close()
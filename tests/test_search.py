@@ -0,0 +1,200 @@
+"""
+Test suite for the shop search.
+Tests the FTS index triggers, filters, sorting, facet caching and the search route.
+"""
+
+import pytest
+import sqlite3
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import app
+from db_utils import ConnectionPool
+from scripts.init_db import create_schema, apply_migrations
+from search_utils import FacetCache, compute_facets, fts_query, resolve_match, search_art
+
+# (title, description, price, type, author)
+CATALOGUE = [
+    ("Včela na louce", "Kresba včely", 120, "art", "hana"),
+    ("Honey bee", "A bee in a hive", 40, "art", "hana"),
+    ("Bee portrait commission", "Your pet as a bee", 300, "commission", "tom"),
+    ("Sunset forest", "Calm evening", 80, "art", "tom"),
+    ("Dragon sketch", "Ink dragon in a forest", 60, "commission", "tom"),
+]
+
+
+@pytest.fixture
+def search_db(tmp_path):
+    """Migrated database with two authors and the CATALOGUE"""
+    db_path = tmp_path / "beevy.db"
+    create_schema(db_path)
+    apply_migrations(db_path)
+
+    conn = sqlite3.connect(str(db_path))
+    author_ids = {}
+    for username in ("hana", "tom"):
+        cursor = conn.execute(
+            "INSERT INTO users (username, email, password, dob) VALUES (?, ?, 'x', '2000-01-01')",
+            (username, f"{username}@example.com")
+        )
+        author_ids[username] = cursor.lastrowid
+    for title, description, price, art_type, author in CATALOGUE:
+        conn.execute(
+            """INSERT INTO art (author_name, title, description, tat, price, type, thumbnail_path, author_id)
+               VALUES (?, ?, ?, 1, ?, ?, 'thumb.png', ?)""",
+            (author, title, description, price, art_type, author_ids[author])
+        )
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def titles(rows):
+    return [row[1] for row in rows]
+
+
+class TestFtsQuery:
+    """Tests for turning user input into FTS5 syntax"""
+
+    def test_terms_are_quoted(self):
+        """Test that FTS operators in user input are treated as words"""
+        assert fts_query('bee OR "x') == '"bee" "OR" "x"'
+
+    def test_last_term_is_prefix(self):
+        """Test that the last word matches as a prefix once it is long enough"""
+        assert fts_query("honey dra", prefix=True) == '"honey" "dra"*'
+        assert fts_query("honey dr", prefix=True) == '"honey" "dr"'
+        assert fts_query("honey dra") == '"honey" "dra"'
+
+    def test_empty_input(self):
+        """Test that punctuation only input means no text search"""
+        assert fts_query(" -- ") is None
+        assert fts_query(None) is None
+
+
+class TestSearch:
+    """Tests for search_art filters and sorting"""
+
+    def test_text_search(self, search_db):
+        """Test that title and description are searched"""
+        assert set(titles(search_art(search_db, "bee"))) == {"Honey bee", "Bee portrait commission"}
+
+    def test_diacritics_are_folded(self, search_db):
+        """Test that searching without diacritics finds Czech titles"""
+        assert titles(search_art(search_db, "vcela")) == ["Včela na louce"]
+
+    def test_prefix_search(self, search_db):
+        """Test that a partial last word matches when whole words find nothing"""
+        assert titles(search_art(search_db, "drag")) == ["Dragon sketch"]
+        assert resolve_match(search_db, "drag") == '"drag"*'
+        assert resolve_match(search_db, "dragon") == '"dragon"'
+
+    def test_filters(self, search_db):
+        """Test type, price range and author filters together"""
+        rows = search_art(search_db, art_type="commission", min_price=50, max_price=100, author="tom")
+        assert titles(rows) == ["Dragon sketch"]
+        assert search_art(search_db, author="nobody") == []
+
+    def test_price_sort(self, search_db):
+        """Test that price sorting works with and without text"""
+        assert [row[2] for row in search_art(search_db, sort="price_asc")] == [40, 60, 80, 120, 300]
+        assert [row[2] for row in search_art(search_db, "bee", sort="price_desc")] == [300, 40]
+
+    def test_inactive_art_hidden(self, search_db):
+        """Test that hidden artworks are not found"""
+        search_db.execute("UPDATE art SET is_active = 0 WHERE title = 'Honey bee'")
+        search_db.commit()
+        assert titles(search_art(search_db, "bee")) == ["Bee portrait commission"]
+
+    def test_index_follows_updates_and_deletes(self, search_db):
+        """Test that the triggers keep art_fts in sync with art"""
+        search_db.execute("UPDATE art SET title = 'Owl at night' WHERE title = 'Sunset forest'")
+        search_db.execute("DELETE FROM art WHERE title = 'Dragon sketch'")
+        search_db.commit()
+
+        assert titles(search_art(search_db, "owl")) == ["Owl at night"]
+        assert search_art(search_db, "sunset") == []
+        assert search_art(search_db, "dragon") == []
+
+    def test_relevance_prefers_title_hits(self, search_db):
+        """Test that a title hit ranks above a newer description hit"""
+        assert titles(search_art(search_db, "forest", sort="relevance")) == ["Sunset forest", "Dragon sketch"]
+        assert titles(search_art(search_db, "forest", sort="newest")) == ["Dragon sketch", "Sunset forest"]
+
+    def test_paging(self, search_db):
+        """Test that limit and offset page through the results"""
+        first = search_art(search_db, sort="price_asc", limit=2)
+        second = search_art(search_db, sort="price_asc", limit=2, offset=2)
+        assert [row[2] for row in first + second] == [40, 60, 80, 120]
+
+
+class TestFacets:
+    """Tests for facet counts and their cache"""
+
+    def test_counts(self, search_db):
+        """Test counts per type and price bucket"""
+        facets = compute_facets(search_db)
+        assert facets["total"] == 5
+        assert facets["types"] == {"art": 3, "commission": 2}
+        assert facets["prices"] == {"0-49": 1, "50-99": 2, "100-249": 1, "250+": 1}
+
+    def test_cache_until_next_write(self, search_db):
+        """Test that cached facets are reused until art changes"""
+        cache = FacetCache()
+        first = cache.get(search_db)
+        assert cache.get(search_db) is first
+
+        search_db.execute("UPDATE art SET price = 10 WHERE title = 'Bee portrait commission'")
+        search_db.commit()
+
+        refreshed = cache.get(search_db)
+        assert refreshed is not first
+        assert refreshed["prices"]["0-49"] == 2
+        assert refreshed["prices"]["250+"] == 0
+
+
+@pytest.fixture
+def search_client(search_db):
+    """Test client whose database pool points at the search catalogue"""
+    db_path = search_db.execute("PRAGMA database_list").fetchone()[2]
+    original = app.extensions["beevy_db_pool"]
+    app.extensions["beevy_db_pool"] = ConnectionPool(db_path, max_size=2)
+    app.config["TESTING"] = True
+    try:
+        with app.test_client() as client:
+            with client.session_transaction() as session:
+                session["username"] = "hana"
+                session["user_language"] = "en"
+            yield client
+    finally:
+        app.extensions["beevy_db_pool"].close_all()
+        app.extensions["beevy_db_pool"] = original
+
+
+class TestSearchRoute:
+    """Tests for the /shop/search page"""
+
+    def test_search_page(self, search_client):
+        """Test that results and facet counts are rendered"""
+        response = search_client.get("/shop/search", query_string={"q": "bee", "sort": "price_asc"})
+
+        assert response.status_code == 200
+        html = response.get_data(as_text=True)
+        assert html.index("Honey bee") < html.index("Bee portrait commission")
+        assert "Sunset forest" not in html
+        assert "5 artworks in the shop" in html
+
+    def test_bad_parameters_fall_back(self, search_client):
+        """Test that unknown sorts and non numeric prices are ignored"""
+        response = search_client.get(
+            "/shop/search", query_string={"sort": "DROP TABLE", "min_price": "abc", "page": "-3"}
+        )
+        assert response.status_code == 200
+        assert "Dragon sketch" in response.get_data(as_text=True)
+
+    def test_requires_login(self):
+        """Test that anonymous visitors are sent to login"""
+        response = app.test_client().get("/shop/search?q=bee")
+        assert response.status_code == 302
@@ -0,0 +1,54 @@
+"""
+Startup cost tests.
+Imports app.py in a fresh interpreter and checks that heavy dependencies stay
+unloaded until first use.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).parent.parent
+
+# loaded on first use only
+LAZY_MODULES = ("PIL", "apscheduler", "flask_apscheduler", "backup_utils")
+
+PROBE = """
+import json, sys
+import app
+print(json.dumps({"loaded": [m for m in %r if m in sys.modules]}))
+""" % (LAZY_MODULES,)
+
+
+def probe_import(env_overrides):
+    env = dict(os.environ, SECRET_KEY="test-secret", **env_overrides)
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+class TestStartup:
+    """Tests for lazy initialisation of app.py"""
+
+    def test_heavy_modules_not_imported(self):
+        """Test that Pillow, APScheduler and the backup code load lazily"""
+        assert probe_import({"BEEVY_SCHEDULER": "0"})["loaded"] == []
+
+    def test_blueprints_registered(self):
+        """Test that the app is assembled from the blueprints, without the scheduler in tests"""
+        from app import app
+
+        assert {"main", "auth", "draw", "settings", "shop", "media"} <= set(app.blueprints)
+        assert "beevy_scheduler" not in app.extensions
+
+    def test_missing_secret_key(self):
+        """Test that the factory refuses to start without a secret key"""
+        from app import create_app
+
+        with pytest.raises(RuntimeError):
+            create_app({"SECRET_KEY": None, "SCHEDULER_ENABLED": False})
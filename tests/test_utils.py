@@ -14,7 +14,12 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from app import app, flash_translated, generate_deleted_username
 from translations import translations
-from backup_utils import get_backup_dir, get_backups_list
+import backup_utils
+from backup_utils import (
+    backup_database, cleanup_old_backups, get_backup_dir, get_backups_list,
+    get_blob_dir, get_snapshot_dirs, get_snapshots_list, prune_snapshots, read_snapshot_manifest,
+    restore_media, restore_snapshot, snapshot_database,
+)
 
 
 @pytest.fixture
@@ -140,6 +145,258 @@ class TestBackupUtils:
             assert 'name' in backup or len(backups) == 0
             assert 'size_mb' in backup or len(backups) == 0
 
+    def test_backup_list_error_is_logged(self, monkeypatch, capsys):
+        """Test that an unreadable backup directory gives an empty list and a logged error"""
+        def unreadable(backup_dir):
+            raise PermissionError("backup dir not readable")
+        monkeypatch.setattr(backup_utils, "_backup_files", unreadable)
+
+        assert get_backups_list() == []
+        assert "backup dir not readable" in capsys.readouterr().err
+
+
+@pytest.fixture
+def backup_home(tmp_path, monkeypatch):
+    """Point the backup directory at a temporary home and create a small WAL database"""
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    db_path = tmp_path / "live.db"
+    conn = sqlite3.connect(str(db_path))
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, data TEXT)")
+    conn.executemany("INSERT INTO items (data) VALUES (?)", [("x" * 500,) for _ in range(2000)])
+    conn.commit()
+    yield db_path, conn
+    conn.close()
+
+
+class TestOnlineBackup:
+    """Tests for backups through the SQLite backup API"""
+
+    def test_backup_is_consistent_copy(self, backup_home):
+        """Test that the backup contains all committed rows, including ones still in the WAL"""
+        db_path, conn = backup_home
+        success, backup_path, message = backup_database(str(db_path), pages=16, sleep=0)
+
+        assert success, message
+        copy = sqlite3.connect(backup_path)
+        assert copy.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 2000
+        copy.close()
+
+    def test_metrics_recorded(self, backup_home):
+        """Test that duration, size and throughput are stored and listed"""
+        db_path, _ = backup_home
+        success, backup_path, message = backup_database(str(db_path), pages=16, sleep=0)
+
+        assert "pages/s" in message
+        listed = get_backups_list()
+        assert [b["path"] for b in listed] == [backup_path]
+        metrics = listed[0]["metrics"]
+        assert metrics["integrity"] == "ok"
+        assert metrics["bytes"] == Path(backup_path).stat().st_size
+        assert metrics["pages"] > 0 and metrics["steps"] > 1
+        assert metrics["pages_per_s"] > 0
+
+    def test_writes_continue_during_backup(self, backup_home):
+        """Test that a writer is not locked out while a slow backup is running"""
+        import threading
+        db_path, conn = backup_home
+        writer = sqlite3.connect(str(db_path), timeout=1, check_same_thread=False)
+        result = {}
+
+        def run_backup():
+            result["backup"] = backup_database(str(db_path), pages=4, sleep=0.01)
+
+        thread = threading.Thread(target=run_backup)
+        thread.start()
+        for i in range(20):
+            writer.execute("INSERT INTO items (data) VALUES (?)", (f"during {i}",))
+            writer.commit()
+        thread.join()
+        writer.close()
+
+        assert result["backup"][0], result["backup"][2]
+
+    def test_missing_database(self, backup_home):
+        """Test that a missing source database is reported, not copied"""
+        success, backup_path, message = backup_database("does-not-exist.db")
+        assert not success and backup_path is None
+
+    def test_cleanup_removes_metrics(self, backup_home):
+        """Test that cleanup keeps the newest backups and removes metrics with them"""
+        db_path, _ = backup_home
+        for i in range(3):
+            backup_database(str(db_path), backup_name=f"beevy.db.bak.2024010100000{i}", pages=-1, sleep=0)
+
+        removed, _ = cleanup_old_backups(keep_count=1)
+
+        assert removed == 2
+        assert sorted(p.name for p in get_backup_dir().iterdir()) == [
+            "beevy.db.bak.20240101000002", "beevy.db.bak.20240101000002.json"
+        ]
+
+
+class TestIncrementalSnapshots:
+    """Tests for chunked, deduplicated snapshots"""
+
+    def test_restore_is_identical(self, backup_home, tmp_path):
+        """Test that a restored snapshot has the same rows as the database"""
+        db_path, _ = backup_home
+        success, manifest_path, message = snapshot_database(str(db_path), sleep=0)
+        assert success, message
+
+        name = get_snapshots_list()[0]
+        ok, restored, message = restore_snapshot(name, tmp_path / "restored.db")
+        assert ok, message
+        copy = sqlite3.connect(restored)
+        assert copy.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 2000
+        assert copy.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+        copy.close()
+
+    def test_unchanged_chunks_are_shared(self, backup_home):
+        """Test that a second snapshot after a small change stores only the changed chunks"""
+        db_path, conn = backup_home
+        conn.executemany("INSERT INTO items (data) VALUES (?)", [("y" * 500,) for _ in range(3000)])
+        conn.commit()
+        snapshot_database(str(db_path), snapshot_name="beevy.db.snap.20240101020000", sleep=0)
+        conn.execute("UPDATE items SET data = 'changed' WHERE id = 1")
+        conn.commit()
+        snapshot_database(str(db_path), snapshot_name="beevy.db.snap.20240102020000", sleep=0)
+
+        first = read_snapshot_manifest("beevy.db.snap.20240101020000")
+        second = read_snapshot_manifest("beevy.db.snap.20240102020000")
+        assert len(second["chunks"]) > 2
+        assert second["new_chunks"] < len(second["chunks"])
+        assert set(first["chunks"]) & set(second["chunks"])
+
+    def test_corrupted_chunk_is_detected(self, backup_home, tmp_path):
+        """Test that restore refuses a damaged chunk and leaves no partial file"""
+        import gzip
+        db_path, _ = backup_home
+        snapshot_database(str(db_path), sleep=0)
+        name = get_snapshots_list()[0]
+        _, chunk_dir = get_snapshot_dirs()
+        digest = read_snapshot_manifest(name)["chunks"][0]
+        (chunk_dir / digest[:2] / f"{digest}.gz").write_bytes(gzip.compress(b"garbage"))
+
+        ok, restored, message = restore_snapshot(name, tmp_path / "restored.db")
+
+        assert not ok and "corrupted" in message
+        assert list(tmp_path.glob("restored.db*")) == []
+
+    def test_prune_keeps_daily_and_weekly(self, backup_home):
+        """Test retention on manifests and that unreferenced chunks are collected"""
+        db_path, conn = backup_home
+        # three snapshots a day for two weeks, each one with new data
+        names = []
+        for day in range(1, 15):
+            for hour in (2, 12, 20):
+                conn.execute("INSERT INTO items (data) VALUES (?)", (f"{day}-{hour}" * 100,))
+                conn.commit()
+                name = f"beevy.db.snap.202401{day:02d}{hour:02d}0000"
+                snapshot_database(str(db_path), snapshot_name=name, pages=-1, sleep=0)
+                names.append(name)
+
+        removed, message = prune_snapshots(keep_daily=3, keep_weekly=2)
+
+        kept = get_snapshots_list()
+        # newest of Jan 12, 13, 14 plus the newest of the week of Jan 1-7
+        assert kept == ["beevy.db.snap.20240114200000", "beevy.db.snap.20240113200000",
+                        "beevy.db.snap.20240112200000", "beevy.db.snap.20240107200000"]
+        assert removed == len(names) - len(kept)
+
+    def test_gc_removes_unreferenced_chunks(self, backup_home):
+        """Test that chunks of pruned snapshots are deleted after the grace period"""
+        from backup_utils import gc_chunks
+        db_path, conn = backup_home
+        snapshot_database(str(db_path), snapshot_name="beevy.db.snap.20240101020000", sleep=0)
+        conn.execute("DELETE FROM items")
+        conn.commit()
+        conn.execute("VACUUM")
+        snapshot_database(str(db_path), snapshot_name="beevy.db.snap.20240102020000", sleep=0)
+        snapshot_dir, chunk_dir = get_snapshot_dirs()
+        (snapshot_dir / "beevy.db.snap.20240101020000.json").unlink()
+
+        assert gc_chunks()[0] == 0  # still within the grace period
+        removed, freed = gc_chunks(grace=-1)
+
+        referenced = set(read_snapshot_manifest("beevy.db.snap.20240102020000")["chunks"])
+        stored = {p.name[:-len(".gz")] for p in chunk_dir.glob("*/*.gz")}
+        assert removed > 0 and freed > 0
+        assert stored == referenced
+
+
+@pytest.fixture
+def media_root(tmp_path):
+    """Small upload tree shaped like static/uploads"""
+    root = tmp_path / "uploads"
+    for rel, data in {
+        "shop/thumbs/a.png": b"thumb a",
+        "shop/original/a.png": b"original a" * 1000,
+        "shop/owned/a_copy.png": b"original a" * 1000,  # same content as the original
+        "avatar/bee.png": b"avatar",
+    }.items():
+        (root / rel).parent.mkdir(parents=True, exist_ok=True)
+        (root / rel).write_bytes(data)
+    return root
+
+
+class TestMediaSnapshots:
+    """Tests for upload tree snapshots paired with database snapshots"""
+
+    def test_media_paired_with_snapshot(self, backup_home, media_root):
+        """Test that the snapshot manifest reports media and identical files share a blob"""
+        db_path, _ = backup_home
+        success, _, message = snapshot_database(str(db_path), sleep=0, media_root=media_root)
+
+        assert success, message
+        media = read_snapshot_manifest(get_snapshots_list()[0])["media"]
+        assert media["files"] == 4 and media["hashed"] == 4
+        assert media["new_files"] == 3
+        assert len(list(get_blob_dir().glob("*/*"))) == 3
+
+    def test_unchanged_files_are_not_hashed_again(self, backup_home, media_root):
+        """Test that the second snapshot only hashes new files"""
+        db_path, _ = backup_home
+        snapshot_database(str(db_path), snapshot_name="beevy.db.snap.20240101020000", sleep=0, media_root=media_root)
+        (media_root / "shop/thumbs/b.png").write_bytes(b"thumb b")
+        snapshot_database(str(db_path), snapshot_name="beevy.db.snap.20240102020000", sleep=0, media_root=media_root)
+
+        media = read_snapshot_manifest("beevy.db.snap.20240102020000")["media"]
+        assert media["files"] == 5
+        assert media["hashed"] == 1 and media["new_files"] == 1
+
+    def test_restore_media(self, backup_home, media_root, tmp_path):
+        """Test that restoring rebuilds the tree and skips files already in place"""
+        db_path, _ = backup_home
+        snapshot_database(str(db_path), sleep=0, media_root=media_root)
+        name = get_snapshots_list()[0]
+        dest = tmp_path / "restored"
+        (dest / "avatar").mkdir(parents=True)
+        (dest / "avatar/bee.png").write_bytes(b"avatar")
+
+        ok, restored, message = restore_media(name, dest)
+
+        assert ok, message
+        assert restored == 3
+        for path in media_root.rglob("*"):
+            if path.is_file():
+                assert (dest / path.relative_to(media_root)).read_bytes() == path.read_bytes()
+
+    def test_prune_collects_media_blobs(self, backup_home, media_root):
+        """Test that blobs only used by a pruned snapshot are collected"""
+        from backup_utils import gc_chunks
+        db_path, _ = backup_home
+        snapshot_database(str(db_path), snapshot_name="beevy.db.snap.20240101020000", sleep=0, media_root=media_root)
+        (media_root / "avatar/bee.png").unlink()
+        snapshot_database(str(db_path), snapshot_name="beevy.db.snap.20240102020000", sleep=0, media_root=media_root)
+        snapshot_dir, _ = get_snapshot_dirs()
+        for path in snapshot_dir.glob("beevy.db.snap.20240101020000*"):
+            path.unlink()
+
+        gc_chunks(grace=-1)
+
+        assert len(list(get_blob_dir().glob("*/*"))) == 2
+
 
 class TestDatabaseStringOperations:
     """Tests for database-related string operations"""
@@ -1,28 +1,44 @@
 import json
 import os
+import threading
 
 class Translations:
     def __init__(self, languages_dir='static/languages'):
         self.languages_dir = languages_dir
-        self.strings = {}
-        self.available_languages = {}
-        self._load_all_languages()
-    
+        self._strings = None
+        self._available_languages = None
+        self._lock = threading.Lock()
+
+    @property
+    def strings(self):
+        """Language files are read on first use, not when the app is imported"""
+        if self._strings is None:
+            with self._lock:
+                if self._strings is None:
+                    self._load_all_languages()
+        return self._strings
+
+    @property
+    def available_languages(self):
+        self.strings
+        return self._available_languages
+
     def _load_all_languages(self):
         """Load all available language files"""
-        if not os.path.exists(self.languages_dir):
-            return
-        
-        for file in os.listdir(self.languages_dir):
-            if file.endswith('.json'):
-                lang_code = file[:-5]  # Remove .json
-                try:
-                    with open(os.path.join(self.languages_dir, file), 'r', encoding='utf-8') as f:
-                        self.strings[lang_code] = json.load(f)
-                        # Store friendly names
-                        self.available_languages[lang_code] = self._get_language_name(lang_code)
-                except Exception as e:
-                    print(f"Error loading language file {file}: {e}")
+        strings, available = {}, {}
+        if os.path.exists(self.languages_dir):
+            for file in os.listdir(self.languages_dir):
+                if file.endswith('.json'):
+                    lang_code = file[:-5]  # Remove .json
+                    try:
+                        with open(os.path.join(self.languages_dir, file), 'r', encoding='utf-8') as f:
+                            strings[lang_code] = json.load(f)
+                            # Store friendly names
+                            available[lang_code] = self._get_language_name(lang_code)
+                    except Exception as e:
+                        print(f"Error loading language file {file}: {e}")
+        self._available_languages = available
+        self._strings = strings
     
     def _get_language_name(self, lang_code):
         """Get friendly name for language code"""